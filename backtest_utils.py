@@ -0,0 +1,235 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from cache_utils import NULL_CACHE, MemoCache, fingerprint
+from checkpoint_utils import INDICATOR_COLUMNS, AnalyzerSnapshot
+from config import DEFAULT_PARAMS, StrategyParams
+from indicator_utils import IndicatorSet, add_indicators, calculate_ema, calculate_rsi
+from journal_utils import TradeJournal
+from level_utils import calculate_support_resistance, find_extrema
+from pattern_utils import detect_all_head_and_shoulders
+from profile_utils import get_profiler
+from utils import MarketAnalyzer, PatternChecker, TradeExecutor, calculate_profit_or_loss, simulate_trade, \
+    trade_bounds
+
+Entry = Tuple[int, str]
+
+TRADE_COLUMNS = ['entry_index', 'exit_index', 'entry_time', 'exit_time', 'direction', 'entry_price', 'exit_price',
+                 'roi', 'exit_reason', 'unit_return']
+
+
+def prepare_signals(data: pd.DataFrame, params: StrategyParams = DEFAULT_PARAMS, cache: MemoCache = NULL_CACHE):
+    """
+    Рахує індикатори, рівні та патерни для params.
+
+    Індикатори додаються до окремого датафрейму, тому вхідні дані не змінюються.
+    З cache кожен результат зберігається з ключем (fingerprint цін закриття, його параметри),
+    тож прогони, що відрізняються лише параметрами угод, не перераховують рівні й патерни.
+    Повертає (frame, support_levels, resistance_levels, patterns, inverted_patterns).
+    """
+    profiler = get_profiler()
+    with profiler.span('indicators'):
+        frame = pd.DataFrame({'Close': data['Close']})
+        if 'timestamp' in data:
+            frame['timestamp'] = data['timestamp']
+        if cache.enabled:
+            series_key = fingerprint(frame['Close'].to_numpy(dtype=float))
+            frame['RSI'] = cache.get_or_compute(
+                'rsi', (series_key, params.window_rsi), lambda: calculate_rsi(frame, params.window_rsi).to_numpy()
+            )
+            for column, span in (('SHORT_EMA', params.ema_short_period), ('LONG_EMA', params.ema_long_period)):
+                frame[column] = cache.get_or_compute(
+                    'ema', (series_key, span), lambda: calculate_ema(frame, span).to_numpy()
+                )
+        else:
+            series_key = None
+            add_indicators(frame, params.window_rsi, params.ema_short_period, params.ema_long_period)
+    with profiler.span('extrema'):
+        support_levels, resistance_levels = cache.get_or_compute(
+            'levels', (series_key, params.window_extremum),
+            lambda: calculate_support_resistance(frame, window=params.window_extremum)
+        )
+    with profiler.span('patterns'):
+        patterns, inverted_patterns = cache.get_or_compute(
+            'patterns', (series_key, params.head_and_shoulders_threshold, params.step_for_head_and_shoulders),
+            lambda: detect_all_head_and_shoulders(
+                frame['Close'].values, params.head_and_shoulders_threshold, params.step_for_head_and_shoulders
+            )
+        )
+    return frame, support_levels, resistance_levels, patterns, inverted_patterns
+
+
+def resume_signals(data: pd.DataFrame, snapshot: AnalyzerSnapshot, params: StrategyParams = DEFAULT_PARAMS):
+    """
+    Те саме, що prepare_signals, але лише для свічок, від яких залежить продовження snapshot.
+
+    Індикатори до snapshot.candles беруться зі знімка, а для нових свічок рахуються IndicatorSet
+    з його збереженого стану (значення збігаються з calculate_rsi / calculate_ema до біта).
+    Рівні з індексом від snapshot.cursor і патерни шукаються на close[snapshot.signal_start:],
+    тож робота пропорційна довжині хвоста після першого неостаточного рівня, а не всій історії.
+    Індикатори до signal_start у frame - NaN: analyze(snapshot) їх не читає.
+    """
+    profiler = get_profiler()
+    close = np.asarray(data['Close'], dtype=float)
+    start = snapshot.signal_start
+    with profiler.span('indicators'):
+        frame = pd.DataFrame({'Close': data['Close']})
+        if 'timestamp' in data:
+            frame['timestamp'] = data['timestamp']
+        new_values = IndicatorSet.from_state(snapshot.indicator_state).update_batch(close[snapshot.candles:])
+        for position, column in enumerate(INDICATOR_COLUMNS):
+            values = np.full(len(close), np.nan)
+            values[start:snapshot.candles] = snapshot.indicators[:, position]
+            values[snapshot.candles:] = new_values[column]
+            frame[column] = values
+    with profiler.span('extrema'):
+        levels = []
+        for indices in find_extrema(close[start:], params.window_extremum):
+            indices = indices[indices + start >= snapshot.cursor] + start
+            levels.append(list(zip(indices, close[indices])))
+        support_levels, resistance_levels = levels
+    with profiler.span('patterns'):
+        patterns, inverted_patterns = (
+            [(left + start, head + start, right + start) for left, head, right in found]
+            for found in detect_all_head_and_shoulders(
+                close[start:], params.head_and_shoulders_threshold, params.step_for_head_and_shoulders
+            )
+        )
+    return frame, support_levels, resistance_levels, patterns, inverted_patterns
+
+
+def run_backtest(
+    data: pd.DataFrame,
+    params: StrategyParams = DEFAULT_PARAMS,
+    journal: Optional[TradeJournal] = None,
+    cache: MemoCache = NULL_CACHE,
+    snapshot: Optional[AnalyzerSnapshot] = None,
+    signals: Optional[Tuple] = None
+) -> MarketAnalyzer:
+    """
+    Проганяє повний бектест з параметрами params і повертає MarketAnalyzer після analyze().
+
+    Події угод пишуться в journal (TradeJournal), за замовчуванням журнал вимкнено.
+    cache передається в prepare_signals. Зі snapshot (MarketAnalyzer.snapshot() попереднього прогону
+    на початку цієї ж історії) сигнали рахуються resume_signals лише на хвості з snapshot.signal_start,
+    а симулюються лише нові свічки та рівні, що могли змінитися.
+    signals - уже пораховані prepare_signals(data, params), щоб не рахувати їх удруге.
+    """
+    if signals is None:
+        signals = prepare_signals(data, params, cache) if snapshot is None else resume_signals(data, snapshot, params)
+    frame, support_levels, resistance_levels, patterns, inverted_patterns = signals
+    market_analyzer = MarketAnalyzer(
+        support_levels, resistance_levels, patterns, inverted_patterns,
+        params.window_extremum, params.step_for_head_and_shoulders, frame, params, journal
+    )
+    with get_profiler().span('simulation'):
+        market_analyzer.analyze(snapshot)
+    return market_analyzer
+
+
+def summarize_backtest(market_analyzer: MarketAnalyzer) -> Dict[str, float]:
+    """Підсумок бектесту: фінальний баланс, кількість угод, виграшів, програшів та сума ROI."""
+    stats = market_analyzer.transactions.stats()
+    return {
+        'final_balance': float(market_analyzer.balance),
+        **{name: stats[name] for name in ('trades', 'wins', 'losses', 'roi_sum')},
+    }
+
+
+def find_entries(
+    data: pd.DataFrame,
+    params: StrategyParams = DEFAULT_PARAMS,
+    cache: MemoCache = NULL_CACHE
+) -> Tuple[pd.DataFrame, List[Entry]]:
+    """
+    Точки входу (індекс, напрям) у тому порядку, в якому їх обробляє MarketAnalyzer.
+
+    Входи залежать лише від параметрів сигналів, а не від стоп-лоссів і балансу.
+    Повертає також датафрейм з індикаторами.
+    """
+    frame, support_levels, resistance_levels, patterns, inverted_patterns = prepare_signals(data, params, cache)
+    pattern_checker = PatternChecker(params.window_extremum, params.step_for_head_and_shoulders)
+    levels = []
+    for level_type, level_list, pattern_list in (
+        ('sup', support_levels, inverted_patterns),
+        ('res', resistance_levels, patterns),
+    ):
+        found = pattern_checker.find_levels_with_pattern([idx for idx, _ in level_list], pattern_list)
+        levels += [(idx, level, level_type) for (idx, level), pattern_found in zip(level_list, found) if pattern_found]
+
+    entries = []
+    for idx, _, level_type in sorted(levels):
+        end_level_index = idx + params.window_extremum
+        if 0 <= end_level_index < len(frame):
+            entries.append((int(end_level_index), 'long' if level_type == 'sup' else 'short'))
+    return frame, entries
+
+
+def extract_trades(data: pd.DataFrame, params: StrategyParams = DEFAULT_PARAMS) -> pd.DataFrame:
+    """
+    Угоди, які відкрив би MarketAnalyzer, без прив'язки до балансу.
+
+    Вихід угоди не залежить від розміру ставки, тому кожна угода симулюється зі ставкою 1;
+    unit_return - прибуток або збиток на одиницю ставки з урахуванням комісії.
+    Рядки в тому самому порядку, що й transactions у MarketAnalyzer.
+    """
+    frame, entries = find_entries(data, params)
+    close = frame['Close'].to_numpy(dtype=float)
+    rsi, long_ema, short_ema = (frame[name].to_numpy(dtype=float) for name in ('RSI', 'LONG_EMA', 'SHORT_EMA'))
+    timestamps = data['timestamp'].to_numpy(dtype=float) if 'timestamp' in data else np.arange(len(close), dtype=float)
+
+    rows = []
+    for end_level_index, direction in entries:
+        cost = close[end_level_index]
+        stop_loss, take_profit = trade_bounds(cost, direction, params)
+        executor = TradeExecutor(1.0, cost, direction, params)
+        exit_index, exit_reason = simulate_trade(
+            executor, close, rsi, long_ema, short_ema, end_level_index, stop_loss, take_profit
+        )
+        exit_index = max(exit_index, end_level_index)
+        exit_price = close[exit_index]
+        rows.append({
+            'entry_index': int(end_level_index),
+            'exit_index': int(exit_index),
+            'entry_time': timestamps[end_level_index],
+            'exit_time': timestamps[exit_index],
+            'direction': direction,
+            'entry_price': float(cost),
+            'exit_price': float(exit_price),
+            'roi': float(executor.calculate_roi(exit_price)),
+            'exit_reason': exit_reason.name,
+            'unit_return': float(calculate_profit_or_loss(executor, exit_reason, exit_price)),
+        })
+    return pd.DataFrame(rows, columns=TRADE_COLUMNS)
+
+
+def find_fresh_signals(data: pd.DataFrame, params: StrategyParams = DEFAULT_PARAMS, lookback: int = 1) -> List[Dict]:
+    """
+    Рівні з патерном, на яких бектест відкрив би угоду протягом останніх lookback свічок.
+
+    Враховуються лише підтверджені рівні: кінець рівня (індекс + window_extremum) вже в даних.
+    """
+    frame, support_levels, resistance_levels, patterns, inverted_patterns = prepare_signals(data, params)
+    close = frame['Close'].to_numpy(dtype=float)
+    pattern_checker = PatternChecker(params.window_extremum, params.step_for_head_and_shoulders)
+    signals = []
+    for level_type, levels, pattern_list in (
+        ('sup', support_levels, inverted_patterns),
+        ('res', resistance_levels, patterns),
+    ):
+        found = pattern_checker.find_levels_with_pattern([idx for idx, _ in levels], pattern_list)
+        for (idx, level), pattern_found in zip(levels, found):
+            end_level_index = idx + params.window_extremum
+            if pattern_found and len(close) - lookback <= end_level_index < len(close):
+                signals.append({
+                    'type': level_type,
+                    'direction': 'long' if level_type == 'sup' else 'short',
+                    'level_index': int(idx),
+                    'level': float(level),
+                    'entry_index': int(end_level_index),
+                    'price': float(close[end_level_index]),
+                    'candles_ago': int(len(close) - 1 - end_level_index),
+                })
+    return sorted(signals, key=lambda signal: signal['candles_ago'])
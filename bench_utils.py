@@ -0,0 +1,188 @@
+import json
+import platform
+import statistics
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config import DEFAULT_PARAMS, OHLCV_COLUMNS, StrategyParams
+from indicator_utils import add_indicators, calculate_rsi
+from journal_utils import NULL_JOURNAL
+from level_utils import calculate_support_resistance
+from pattern_utils import detect_all_head_and_shoulders
+from utils import MarketAnalyzer, PatternChecker
+
+BENCH_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+BENCH_STAGES = ('calculate_rsi', 'calculate_support_resistance', 'detect_all_head_and_shoulders',
+                'is_pattern_found', 'analyze')
+BENCH_SEED = 42
+REGRESSION_TOLERANCE = 0.10
+
+# Режими ринку: (дрейф лог-доходності, волатильність) на свічку
+REGIMES = (
+    (0.0003, 0.004),  # Висхідний тренд
+    (-0.0003, 0.004),  # Низхідний тренд
+    (0.0, 0.002),  # Флет
+    (0.0, 0.012),  # Висока волатильність
+)
+
+
+def generate_ohlcv(
+    size: int,
+    seed: int = BENCH_SEED,
+    start_price: float = 30_000.0,
+    start_timestamp: int = 1_600_000_000_000,
+    interval_ms: int = 60_000,
+    mean_regime_length: int = 500
+) -> pd.DataFrame:
+    """
+    Синтетичні свічки: випадкове блукання, у якому режими (тренд, флет, висока волатильність)
+    змінюються в середньому кожні mean_regime_length свічок.
+
+    Однаковий seed дає однакові дані, тому результати різних запусків можна порівнювати.
+    Колонки - як у свічок з біржі (OHLCV_COLUMNS).
+    """
+    rng = np.random.default_rng(seed)
+    # Довжини режимів мають геометричний розподіл, режим для кожного відрізка вибирається випадково
+    lengths = rng.geometric(1 / mean_regime_length, size=size // mean_regime_length * 2 + 2)
+    while lengths.sum() < size:
+        lengths = np.concatenate((lengths, rng.geometric(1 / mean_regime_length, size=len(lengths))))
+    regime_ids = np.repeat(rng.integers(0, len(REGIMES), size=len(lengths)), lengths)[:size]
+    drift, volatility = np.asarray(REGIMES).T[:, regime_ids]
+
+    returns = drift + volatility * rng.standard_normal(size)
+    close = start_price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    body_high = np.maximum(open_, close)
+    body_low = np.minimum(open_, close)
+    high = body_high * np.exp(np.abs(rng.standard_normal(size)) * volatility / 2)
+    low = body_low * np.exp(-np.abs(rng.standard_normal(size)) * volatility / 2)
+    volume = rng.lognormal(mean=3.0, sigma=1.0, size=size) * (volatility / REGIMES[2][1])
+    timestamp = start_timestamp + np.arange(size, dtype=np.float64) * interval_ms
+    return pd.DataFrame(np.column_stack((timestamp, open_, high, low, close, volume)), columns=OHLCV_COLUMNS)
+
+
+def time_call(function: Callable, repeats: int) -> List[float]:
+    """Час кожного з repeats викликів function() у секундах."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def bench_stages(
+    data: pd.DataFrame,
+    params: StrategyParams = DEFAULT_PARAMS,
+    repeats: int = 3,
+    stages: Sequence[str] = BENCH_STAGES
+) -> Dict[str, List[float]]:
+    """
+    Заміряє кожен етап пайплайна окремо на одних і тих самих даних.
+
+    Вхідні дані етапу готуються заздалегідь і не входять у заміри. is_pattern_found
+    перевіряється для всіх рівнів так само, як у MarketAnalyzer, а analyze - із вимкненим журналом.
+    """
+    frame = pd.DataFrame({'Close': data['Close']})
+    add_indicators(frame, params.window_rsi, params.ema_short_period, params.ema_long_period)
+    support_levels, resistance_levels = calculate_support_resistance(frame, window=params.window_extremum)
+    patterns, inverted_patterns = detect_all_head_and_shoulders(
+        frame['Close'].values, params.head_and_shoulders_threshold, params.step_for_head_and_shoulders
+    )
+    pattern_checker = PatternChecker(params.window_extremum, params.step_for_head_and_shoulders)
+
+    def check_patterns():
+        pattern_index = pattern_checker.build_index(patterns)
+        inverted_pattern_index = pattern_checker.build_index(inverted_patterns)
+        for index, _ in support_levels:
+            pattern_checker.is_pattern_found(index, inverted_pattern_index)
+        for index, _ in resistance_levels:
+            pattern_checker.is_pattern_found(index, pattern_index)
+
+    def analyze():
+        MarketAnalyzer(
+            support_levels, resistance_levels, patterns, inverted_patterns,
+            params.window_extremum, params.step_for_head_and_shoulders, frame, params, NULL_JOURNAL
+        ).analyze()
+
+    functions = {
+        'calculate_rsi': lambda: calculate_rsi(frame, window=params.window_rsi),
+        'calculate_support_resistance': lambda: calculate_support_resistance(frame, window=params.window_extremum),
+        'detect_all_head_and_shoulders': lambda: detect_all_head_and_shoulders(
+            frame['Close'].values, params.head_and_shoulders_threshold, params.step_for_head_and_shoulders
+        ),
+        'is_pattern_found': check_patterns,
+        'analyze': analyze,
+    }
+    return {stage: time_call(functions[stage], repeats) for stage in stages}
+
+
+def run_benchmarks(
+    sizes: Iterable[int] = BENCH_SIZES,
+    params: StrategyParams = DEFAULT_PARAMS,
+    repeats: int = 3,
+    seed: int = BENCH_SEED,
+    stages: Sequence[str] = BENCH_STAGES
+) -> Dict:
+    """Проганяє bench_stages для кожного розміру і повертає результат у форматі, придатному для JSON."""
+    results = []
+    for size in sizes:
+        data = generate_ohlcv(size, seed)
+        for stage, timings in bench_stages(data, params, repeats, stages).items():
+            results.append({
+                'size': size,
+                'stage': stage,
+                'best': min(timings),
+                'median': statistics.median(timings),
+                'repeats': repeats,
+            })
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seed': seed,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+def save_benchmarks(report: Dict, path: str):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+
+def load_benchmarks(path: str) -> Dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare_benchmarks(
+    baseline: Dict,
+    current: Dict,
+    tolerance: float = REGRESSION_TOLERANCE
+) -> pd.DataFrame:
+    """
+    Порівнює найкращий час кожної пари (розмір, етап), присутньої в обох звітах.
+
+    ratio = поточний / базовий час; регресією вважається ratio > 1 + tolerance.
+    """
+    columns = ['size', 'stage', 'best']
+    baseline_frame = pd.DataFrame(baseline['results'], columns=columns)
+    current_frame = pd.DataFrame(current['results'], columns=columns)
+    frame = baseline_frame.merge(current_frame, on=['size', 'stage'], suffixes=('_baseline', '_current'))
+    frame['ratio'] = frame['best_current'] / frame['best_baseline']
+    frame['regression'] = frame['ratio'] > 1 + tolerance
+    return frame
+
+
+def format_benchmarks(report: Dict, comparison: Optional[pd.DataFrame] = None) -> str:
+    frame = pd.DataFrame(report['results'])
+    if comparison is not None:
+        frame = frame.merge(comparison[['size', 'stage', 'ratio', 'regression']], on=['size', 'stage'], how='left')
+    return frame.to_string(index=False)
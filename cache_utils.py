@@ -0,0 +1,130 @@
+import hashlib
+import os
+import pickle
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def fingerprint(values) -> str:
+    """Хеш вмісту масиву (разом з dtype і формою): однакові ряди дають однаковий ключ незалежно від об'єкта."""
+    values = np.ascontiguousarray(values)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{values.dtype.str}{values.shape}'.encode())
+    digest.update(values.data)
+    return digest.hexdigest()
+
+
+def estimate_size(value) -> int:
+    """Приблизний розмір значення в байтах для обмеження LRU."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return int(np.sum(value.memory_usage(deep=False)))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class MemoCache:
+    """
+    Кеш результатів обчислень із ключем (простір імен, ключ).
+
+    Перший рівень - LRU у пам'яті, обмежений max_bytes; другий (необов'язковий) - pickle-файли
+    в directory, спільні для процесів і повторних запусків. Ключ має містити fingerprint вхідного
+    ряду та всі параметри, від яких залежить результат. Значення повертаються без копіювання,
+    тому змінювати їх не можна.
+    """
+
+    enabled = True
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES, directory: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries: OrderedDict = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, namespace: str, key: Hashable) -> str:
+        name = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, namespace, f'{name}.pkl')
+
+    def _remember(self, full_key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        self._entries[full_key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def get_or_compute(self, namespace: str, key: Hashable, compute: Callable[[], Any]):
+        full_key = (namespace, key)
+        entry = self._entries.get(full_key)
+        if entry is not None:
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return entry[0]
+
+        if self.directory is not None:
+            path = self._path(namespace, key)
+            if os.path.exists(path):
+                with open(path, 'rb') as file:
+                    value = pickle.load(file)
+                self.disk_hits += 1
+                self._remember(full_key, value)
+                return value
+
+        self.misses += 1
+        value = compute()
+        self._remember(full_key, value)
+        if self.directory is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Пишемо через тимчасовий файл, щоб паралельні процеси не прочитали файл наполовину
+            temporary_path = f'{path}.{os.getpid()}.tmp'
+            with open(temporary_path, 'wb') as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, path)
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        requests = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.disk_hits) / requests if requests else 0.0,
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'evictions': self.evictions,
+        }
+
+    def clear(self):
+        """Очищає рівень у пам'яті; файли на диску залишаються."""
+        self._entries.clear()
+        self.bytes = 0
+
+
+class NullCache(MemoCache):
+    """Вимкнений кеш: завжди обчислює і нічого не зберігає."""
+
+    enabled = False
+
+    def __init__(self):
+        super().__init__(max_bytes=0)
+
+    def get_or_compute(self, namespace: str, key: Hashable, compute: Callable[[], Any]):
+        return compute()
+
+
+NULL_CACHE = NullCache()
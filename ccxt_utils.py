@@ -1,33 +1,342 @@
+import asyncio
 import random
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 import ccxt.async_support as ccxt
-from ccxt import RequestTimeout, ExchangeError
+from ccxt import ArgumentsRequired, AuthenticationError, BadRequest, ExchangeError, InsufficientFunds, InvalidOrder, \
+    NetworkError, NotSupported
 
+from config import EXCHANGE_IDS, MAX_CONCURRENT_REQUESTS_PER_EXCHANGE, MAX_FETCH_RETRIES, \
+    RETRY_BACKOFF_BASE_SECONDS, RETRY_BACKOFF_CAP_SECONDS, LIMIT_CANDLES, SYNC_EXCHANGE_ID
 
-def get_random_exchange():
-    return random.choice([
-        ccxt.binance(),
-        ccxt.bingx(),
-    ])
+Candle = List[float]
 
+# Помилки запиту, а не біржі чи мережі: повтор нічого не змінить (BadSymbol - підклас BadRequest,
+# PermissionDenied - AuthenticationError). NetworkError охоплює таймаути, rate limit і недоступність біржі.
+NON_RETRYABLE_ERRORS = (
+    BadRequest, AuthenticationError, InvalidOrder, NotSupported, InsufficientFunds, ArgumentsRequired
+)
 
-async def get_ohlcv(symbol, timeframe, limit):
-    exchange = get_random_exchange()
+# Підміна клієнтів бірж (set_exchange_factories); None - справжні біржі ccxt
+_sync_exchange_factory: Optional[Callable] = None
+_async_exchange_factory: Optional[Callable] = None
+
+
+def create_async_exchange(exchange_id: str):
+    if _async_exchange_factory is not None:
+        return _async_exchange_factory(exchange_id)
+    return getattr(ccxt, exchange_id)()
+
+
+def backoff_delay(
+    attempt: int,
+    backoff_base: float = RETRY_BACKOFF_BASE_SECONDS,
+    backoff_cap: float = RETRY_BACKOFF_CAP_SECONDS
+) -> float:
+    """Затримка перед повтором: повний джитер у межах min(cap, base * 2^attempt)."""
+    return random.uniform(0, min(backoff_cap, backoff_base * 2 ** attempt))
+
+
+class RateLimiter:
+    """
+    Розносить початки запитів до однієї біржі щонайменше на interval секунд.
+
+    Запити проходять по черзі під замком, тому навіть після затримки циклу подій
+    (наприклад, через обчислення в ньому) вони не вириваються пачкою.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._last_start = -float('inf')
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._last_start + self.interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_start = loop.time()
+
+
+class ExchangePool:
+    """
+    Пул асинхронних клієнтів бірж.
+
+    Кожна біржа створюється один раз і перевикористовується разом зі своєю HTTP-сесією
+    та завантаженими ринками. Кількість одночасних запитів до однієї біржі обмежена
+    семафором, а невдалі запити (зокрема через перевищення ліміту) повторюються з обмеженою
+    експоненційною затримкою та випадковим джитером. З rate_limit=True пул сам розносить запити
+    до біржі на її rateLimit (мс) замість вбудованого тротлінгу ccxt.
+    Пул прив'язаний до циклу подій, у якому його використовують.
+    """
+
+    def __init__(
+        self,
+        exchange_ids: Sequence[str] = EXCHANGE_IDS,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS_PER_EXCHANGE,
+        max_retries: int = MAX_FETCH_RETRIES,
+        backoff_base: float = RETRY_BACKOFF_BASE_SECONDS,
+        backoff_cap: float = RETRY_BACKOFF_CAP_SECONDS,
+        exchange_factory: Callable = create_async_exchange,
+        rate_limit: bool = False
+    ):
+        self.exchange_ids = tuple(exchange_ids)
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.exchange_factory = exchange_factory
+        self.rate_limit = rate_limit
+        self._exchanges = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def get(self, exchange_id: str):
+        if exchange_id not in self._exchanges:
+            exchange = self.exchange_factory(exchange_id)
+            self._exchanges[exchange_id] = exchange
+            self._semaphores[exchange_id] = asyncio.Semaphore(self.max_concurrent)
+            if self.rate_limit:
+                self._limiters[exchange_id] = RateLimiter(getattr(exchange, 'rateLimit', 0) / 1000)
+                exchange.enableRateLimit = False
+        return self._exchanges[exchange_id]
+
+    def backoff_delay(self, attempt: int) -> float:
+        return backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+
+    async def request(self, call: Callable, exchange_id: Optional[str] = None):
+        """
+        Виконує call(exchange) з повторами під семафором і rate limit біржі. Якщо exchange_id не задано,
+        біржа обирається випадково на кожній спробі. Після max_retries повторів помилка прокидається далі,
+        а помилки з NON_RETRYABLE_ERRORS - одразу.
+        """
+        for attempt in range(self.max_retries + 1):
+            current_id = exchange_id or random.choice(self.exchange_ids)
+            exchange = self.get(current_id)
+            try:
+                async with self._semaphores[current_id]:
+                    if current_id in self._limiters:
+                        await self._limiters[current_id].acquire()
+                    return await call(exchange)
+            except NON_RETRYABLE_ERRORS:
+                raise
+            except (NetworkError, ExchangeError):
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(self.backoff_delay(attempt))
+
+    async def fetch_ohlcv(self, symbol, timeframe, limit, since=None, exchange_id: Optional[str] = None):
+        """Завантажує свічки з повторами (див. request); без exchange_id біржа випадкова, як і раніше."""
+        return await self.request(
+            lambda exchange: exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit), exchange_id
+        )
+
+    async def load_markets(self, exchange_id: str):
+        """Ринки біржі з тими самими повторами й обмеженням темпу, що й для свічок."""
+        return await self.request(lambda exchange: exchange.load_markets(), exchange_id)
+
+    async def fetch_many(
+        self,
+        requests: Iterable[Tuple[str, str]],
+        limit,
+        exchange_id: Optional[str] = None
+    ) -> Dict[Tuple[str, str], object]:
+        """
+        Паралельно завантажує свічки для багатьох пар (символ, таймфрейм).
+
+        Повертає словник {(символ, таймфрейм): свічки}; для пар, які так і не вдалося
+        завантажити, значенням буде виняток.
+        """
+        requests = list(requests)
+        results = await asyncio.gather(
+            *(self.fetch_ohlcv(symbol, timeframe, limit, exchange_id=exchange_id) for symbol, timeframe in requests),
+            return_exceptions=True
+        )
+        return dict(zip(requests, results))
+
+    async def close(self):
+        exchanges, self._exchanges = self._exchanges, {}
+        self._semaphores = {}
+        self._limiters = {}
+        await asyncio.gather(*(exchange.close() for exchange in exchanges.values()), return_exceptions=True)
+
+
+_default_pool: Optional[ExchangePool] = None
+_default_pool_loop = None
+# Пули, які закриє задача _default_pool_closer: поточний і, можливо, пул циклу, що завершився без asyncio.run
+_default_pools: List[ExchangePool] = []
+_default_pool_closer: Optional[asyncio.Task] = None
+# Цикл подій тримає лише слабкі посилання на задачі, тож задачі, що закривають пули, зберігаємо тут
+_pool_closers: Set[asyncio.Task] = set()
+
+
+def set_exchange_factories(sync_factory: Optional[Callable] = None, async_factory: Optional[Callable] = None):
+    """
+    Підміняє клієнти, які створюють create_sync_exchange і create_async_exchange (а отже й пули),
+    наприклад, на replay_utils.replay_factories(). Без аргументів повертає справжні біржі.
+    """
+    global _sync_exchange_factory, _async_exchange_factory, _default_pool, _default_pool_loop, _default_pools, \
+        _default_pool_closer
+    _sync_exchange_factory, _async_exchange_factory = sync_factory, async_factory
+    # Наявний пул тримає старі клієнти; його закриє задача з кінцем його циклу, а новий пул створиться з новою фабрикою
+    _default_pool, _default_pool_loop, _default_pools, _default_pool_closer = None, None, [], None
+
+
+async def _close_pools(pools: List[ExchangePool]):
+    await asyncio.gather(*(pool.close() for pool in pools))
+
+
+async def _close_at_shutdown(pools: List[ExchangePool]):
+    """
+    Чекає до завершення циклу: asyncio.run скасовує незавершені задачі, і пули закриваються ще в живому циклі
+    (задачі, створені під час цього скасування, вже не скасовуються).
+    """
     try:
-        data = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-    except (RequestTimeout, ExchangeError):
-        return await get_ohlcv(symbol, timeframe, limit)
-    else:
-        await exchange.close()
-        return data
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await _close_pools(pools)
+
+
+def get_default_pool() -> ExchangePool:
+    """
+    Спільний пул для поточного циклу подій. Для нового циклу створюється новий пул.
+
+    Пул закривається разом із циклом (у кінці asyncio.run) або раніше через close_default_pool().
+    Пул циклу, що завершився інакше, закривається разом із пулом, який його замінив.
+    """
+    global _default_pool, _default_pool_loop, _default_pools, _default_pool_closer
+    loop = asyncio.get_running_loop()
+    if _default_pool is None or _default_pool_loop is not loop:
+        # Після asyncio.run попередній пул уже порожній, і його close() нічого не робить
+        stale = [_default_pool] if _default_pool is not None else []
+        _default_pool, _default_pool_loop = ExchangePool(), loop
+        _default_pools = [_default_pool, *stale]
+        _default_pool_closer = loop.create_task(_close_at_shutdown(_default_pools))
+        _pool_closers.add(_default_pool_closer)
+        _default_pool_closer.add_done_callback(_pool_closers.discard)
+    return _default_pool
 
 
-def get_ohlcv_sync(symbol, timeframe, limit):
+async def close_default_pool():
+    """Закриває спільний пул поточного циклу; наступний get_default_pool() створить новий."""
+    global _default_pool, _default_pool_loop, _default_pools, _default_pool_closer
+    pools, closer = _default_pools, _default_pool_closer
+    _default_pool, _default_pool_loop, _default_pools, _default_pool_closer = None, None, [], None
+    if closer is not None:
+        closer.cancel()
+        await asyncio.gather(closer, return_exceptions=True)
+    # Задачу могли скасувати ще до старту, тож закриваємо й тут (повторний close() нічого не робить)
+    await _close_pools(pools)
+
+
+async def get_ohlcv(symbol, timeframe, limit):
+    """Свічки через спільний пул; клієнти пулу закриваються в кінці asyncio.run або close_default_pool()."""
+    return await get_default_pool().fetch_ohlcv(symbol, timeframe, limit)
+
+
+def create_sync_exchange(exchange_id: str = SYNC_EXCHANGE_ID):
+    if _sync_exchange_factory is not None:
+        return _sync_exchange_factory(exchange_id)
     import ccxt
-    exchange = random.choice([
-        # ccxt.binance(),
-        ccxt.bingx(),
-    ])
-    data = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+    return getattr(ccxt, exchange_id)()
+
+
+def request_sync(call: Callable, exchange, max_retries: int = MAX_FETCH_RETRIES):
+    """
+    Синхронний аналог ExchangePool.request для одного клієнта: call(exchange) повторюється після
+    NetworkError / ExchangeError з тією самою затримкою, а помилки з NON_RETRYABLE_ERRORS прокидаються одразу.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return call(exchange)
+        except NON_RETRYABLE_ERRORS:
+            raise
+        except (NetworkError, ExchangeError):
+            if attempt == max_retries:
+                raise
+        time.sleep(backoff_delay(attempt))
+
+
+def fetch_ohlcv_sync(exchange, symbol: str, timeframe: str, since=None, limit=None) -> List[Candle]:
+    """exchange.fetch_ohlcv синхронного клієнта з повторами request_sync."""
+    return request_sync(lambda client: client.fetch_ohlcv(symbol, timeframe, since=since, limit=limit), exchange)
+
+
+def get_ohlcv_sync(symbol, timeframe, limit, since=None):
+    exchange = create_sync_exchange()
+    data = fetch_ohlcv_sync(exchange, symbol, timeframe, since=since, limit=limit)
     print(symbol, timeframe)
     return data
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+
+def _next_page(
+    page: List[Candle],
+    since: int,
+    until: Optional[int],
+    timeframe_ms: int
+) -> Tuple[List[Candle], Optional[int]]:
+    """Обрізає сторінку по until і повертає (свічки, курсор наступної сторінки або None, якщо це кінець)."""
+    page = [candle for candle in page if candle[0] >= since and (until is None or candle[0] <= until)]
+    if not page:
+        return page, None
+    next_since = int(page[-1][0]) + 1
+    # Остання свічка ще не закрилася - це поточна свічка, тож новіших на біржі немає
+    if (until is not None and next_since > until) or page[-1][0] + timeframe_ms > time.time() * 1000:
+        return page, None
+    return page, next_since
+
+
+def iter_ohlcv_history(
+    exchange,
+    symbol: str,
+    timeframe: str,
+    since: int,
+    until: Optional[int] = None,
+    page_limit: int = LIMIT_CANDLES
+) -> Iterator[List[Candle]]:
+    """
+    Посторінково завантажує історію свічок від since до until (мс, включно) синхронним клієнтом ccxt.
+
+    Сторінки віддаються по одній у хронологічному порядку, тому вся історія ніколи не
+    тримається в пам'яті одним списком. Невдалі запити сторінок повторюються (див. request_sync).
+    """
+    timeframe_ms = timeframe_to_ms(timeframe)
+    cursor = since
+    while cursor is not None:
+        page = fetch_ohlcv_sync(exchange, symbol, timeframe, since=cursor, limit=page_limit)
+        page, cursor = _next_page(page, cursor, until, timeframe_ms)
+        if page:
+            yield page
+
+
+async def aiter_ohlcv_history(
+    symbol: str,
+    timeframe: str,
+    since: int,
+    until: Optional[int] = None,
+    page_limit: int = LIMIT_CANDLES,
+    pool: Optional[ExchangePool] = None,
+    exchange_id: Optional[str] = None
+) -> AsyncIterator[List[Candle]]:
+    """Асинхронний аналог iter_ohlcv_history через ExchangePool з повторами запитів."""
+    pool = pool or get_default_pool()
+    exchange_id = exchange_id or pool.exchange_ids[0]
+    timeframe_ms = timeframe_to_ms(timeframe)
+    cursor = since
+    while cursor is not None:
+        page = await pool.fetch_ohlcv(symbol, timeframe, page_limit, since=cursor, exchange_id=exchange_id)
+        page, cursor = _next_page(page, cursor, until, timeframe_ms)
+        if page:
+            yield page
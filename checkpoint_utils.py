@@ -0,0 +1,90 @@
+import pickle
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+
+from cache_utils import fingerprint
+from config import StrategyParams
+from records_utils import TRADE_RECORD_DTYPE
+
+# Угоди після курсора знімка: шлях угоди не залежить від балансу, тому його можна продовжити,
+# а ставку й прибуток перерахувати вже з актуальним балансом
+PENDING_TRADE_DTYPE = np.dtype([
+    ('level_index', 'i8'),
+    ('entry_index', 'i8'),
+    ('direction', 'i1'),  # 1 - long, -1 - short
+    ('entry_price', 'f8'),
+    ('trailing_stop_loss', 'f8'),  # NaN - тейк-профіт ще не досягнуто
+    ('max_roi', 'f8'),
+    ('state', 'u1'),  # Код з STATE_CODES
+    ('exit_index', 'i8'),  # -1 - угода ще відкрита на останній свічці знімка
+    ('exit_reason', 'u1'),  # Код з EXIT_REASON_CODES
+])
+
+# Колонки індикаторів у AnalyzerSnapshot.indicators - у тому ж порядку, що й у IndicatorSet
+INDICATOR_COLUMNS = ('RSI', 'SHORT_EMA', 'LONG_EMA')
+
+
+def signal_start(cursor: int, window_extremum: int, step_for_head_and_shoulders: int) -> int:
+    """
+    Перша свічка, від якої залежать рівні з індексом cursor і далі.
+
+    Екстремуму потрібне ліве вікно window_extremum, а патерну з головою в cursor - ліве плече
+    за step_for_head_and_shoulders свічок.
+    """
+    return max(cursor - max(window_extremum, step_for_head_and_shoulders), 0)
+
+
+@dataclass
+class AnalyzerSnapshot:
+    """
+    Стан MarketAnalyzer після analyze() для продовження на довшій історії.
+
+    Рівні з індексом менше cursor остаточні: їхні угоди вже в transactions, а balance, stake_multiplier,
+    last_cost і last_level - стан одразу після них. Рівні з cursor і далі обробляються заново, але для
+    угод з pending симуляція продовжується з candles, а не з входу.
+
+    Щоб не рахувати сигнали на всій історії, знімок зберігає індикатори для свічок з signal_start
+    і стан IndicatorSet на останній свічці: рівні й патерни з cursor і далі залежать лише від цін
+    з signal_start, тож продовження рахує сигнали тільки на цьому хвості.
+    """
+
+    candles: int
+    first_timestamp: float  # NaN, якщо в даних немає колонки timestamp
+    signal_start: int
+    close_fingerprint: str  # Лише ціни close[signal_start:candles], від яких залежить продовження
+    params: StrategyParams
+    cursor: int
+    balance: float
+    stake_multiplier: float
+    last_cost: float
+    last_level: object
+    transactions: np.ndarray
+    pending: np.ndarray
+    indicators: np.ndarray  # (candles - signal_start, len(INDICATOR_COLUMNS))
+    indicator_state: Dict  # IndicatorSet.get_state() після свічки candles - 1
+
+    def __post_init__(self):
+        self.transactions = np.asarray(self.transactions, dtype=TRADE_RECORD_DTYPE)
+        self.pending = np.asarray(self.pending, dtype=PENDING_TRADE_DTYPE)
+        self.indicators = np.asarray(self.indicators, dtype=float).reshape(-1, len(INDICATOR_COLUMNS))
+
+    def matches(self, close: np.ndarray, params: StrategyParams) -> bool:
+        """Чи продовжують ціни закриття close історію знімка і чи ті самі параметри."""
+        close = np.asarray(close, dtype=float)
+        return (
+            params == self.params
+            and len(close) >= self.candles
+            and fingerprint(close[self.signal_start:self.candles]) == self.close_fingerprint
+        )
+
+
+def save_snapshot(snapshot: AnalyzerSnapshot, path: str):
+    with open(path, 'wb') as file:
+        pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_snapshot(path: str) -> AnalyzerSnapshot:
+    with open(path, 'rb') as file:
+        return pickle.load(file)
@@ -1,3 +1,5 @@
+from dataclasses import dataclass
+
 # Конфігурація для патернів
 WINDOW_EXTREMUM = 20  # Вікно для екстремумів - 20
 STEP_FOR_HEAD_AND_SHOULDERS = 1  # Крок для голови і плечей
@@ -25,3 +27,46 @@ RSI_FOR_CLOSING_SHORT = 50
 # Інші чарівні значення можуть бути додані тут у майбутньому
 TIMEFRAME = '2h'
 LIMIT_CANDLES = 1000
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'Close', 'volume']
+CANDLE_STORE_DIR = 'candles'  # Локальне сховище свічок
+
+# Запити до бірж
+EXCHANGE_IDS = ('binance', 'bingx')
+SYNC_EXCHANGE_ID = 'bingx'  # Біржа синхронного клієнта, з якої беруться свічки для main.py
+MAX_CONCURRENT_REQUESTS_PER_EXCHANGE = 5
+MAX_FETCH_RETRIES = 5
+RETRY_BACKOFF_BASE_SECONDS = 0.5
+RETRY_BACKOFF_CAP_SECONDS = 10.0
+
+
+@dataclass(frozen=True)
+class StrategyParams:
+    """Набір параметрів стратегії для одного прогону. Значення за замовчуванням беруться з констант вище."""
+    window_extremum: int = WINDOW_EXTREMUM
+    step_for_head_and_shoulders: int = STEP_FOR_HEAD_AND_SHOULDERS
+    head_and_shoulders_threshold: float = HEAD_AND_SHOULDERS_THRESHOLD
+    window_rsi: int = WINDOW_RSI
+    ema_short_period: int = EMA_SHORT_PERIOD
+    ema_long_period: int = EMA_LONG_PERIOD
+
+    initial_balance: float = INITIAL_BALANCE
+    stake_multiplier_start: float = STAKE_MULTIPLIER_START
+    percent_of_balance_for_bet: float = PERCENT_OF_BALANCE_FOR_BET
+    percent_stop_loss: float = PERCENT_STOP_LOSS
+    percent_take_profit: float = PERCENT_TAKE_PROFIT
+    trailing_stop_loss_percent: float = TRAILING_STOP_LOSS_PERCENT
+    trailing_stop_loss_percent_for_positive_filter: float = TRAILING_STOP_LOSS_PERCENT_FOR_POSITIVE_FILTER
+    trailing_stop_loss_percent_for_negative_filter: float = TRAILING_STOP_LOSS_PERCENT_FOR_NEGATIVE_FILTER
+    rsi_for_increase_trailing_percent_on_long: float = RSI_FOR_INCREASE_TRAILING_PERCENT_ON_LONG
+    rsi_for_decrease_trailing_percent_on_long: float = RSI_FOR_DECREASE_TRAILING_PERCENT_ON_LONG
+    rsi_for_increase_trailing_percent_on_short: float = RSI_FOR_INCREASE_TRAILING_PERCENT_ON_SHORT
+    rsi_for_decrease_trailing_percent_on_short: float = RSI_FOR_DECREASE_TRAILING_PERCENT_ON_SHORT
+    rsi_for_closing_long: float = RSI_FOR_CLOSING_LONG
+    rsi_for_closing_short: float = RSI_FOR_CLOSING_SHORT
+
+    @property
+    def minimum_trailing_stop_loss_percent(self) -> float:
+        return self.percent_take_profit * (100 - self.trailing_stop_loss_percent) / 100
+
+
+DEFAULT_PARAMS = StrategyParams()
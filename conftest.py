@@ -0,0 +1 @@
+# Корінь репозиторію в sys.path, щоб тести в tests/ імпортували модулі верхнього рівня
@@ -0,0 +1,227 @@
+import math
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Обчислення RSI
+def calculate_rsi(data, window=14):
+    """Функція для обчислення RSI."""
+    delta = data['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+
+    rs = gain / loss
+    rsi = 100 - (100 / (1 + rs))
+    return rsi
+
+
+def calculate_ema(data, span):
+    """Експоненціальне ковзне середнє ціни закриття."""
+    return data['Close'].ewm(span=span, adjust=False).mean()
+
+
+def add_indicators(data: pd.DataFrame, window_rsi, ema_short_period, ema_long_period) -> pd.DataFrame:
+    """Додає до датафрейму колонки RSI, SHORT_EMA та LONG_EMA, які використовує MarketAnalyzer."""
+    data['RSI'] = calculate_rsi(data, window=window_rsi)
+    data['SHORT_EMA'] = calculate_ema(data, ema_short_period)
+    data['LONG_EMA'] = calculate_ema(data, ema_long_period)
+    return data
+
+
+class RollingMean:
+    """
+    Ковзне середнє з оновленням за O(1), що відтворює алгоритм pandas rolling(window).mean():
+    сумування Кахана окремо для доданих і видалених значень, лічильник від'ємних значень
+    і точне значення для серії однакових чисел.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.sum = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.negative_count = 0
+        self.same_count = 0
+        self.previous = math.nan
+
+    def update(self, value: float) -> float:
+        if len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        self._add(value)
+        self.values.append(value)
+        return self.value
+
+    def _add(self, value: float):
+        y = value - self.compensation_add
+        t = self.sum + y
+        self.compensation_add = t - self.sum - y
+        self.sum = t
+        if math.copysign(1.0, value) < 0:
+            self.negative_count += 1
+        self.same_count = self.same_count + 1 if value == self.previous else 1
+        self.previous = value
+
+    def _remove(self, value: float):
+        y = -value - self.compensation_remove
+        t = self.sum + y
+        self.compensation_remove = t - self.sum - y
+        self.sum = t
+        if math.copysign(1.0, value) < 0:
+            self.negative_count -= 1
+
+    @property
+    def value(self) -> float:
+        count = len(self.values)
+        if count < self.window:
+            return math.nan
+        if self.same_count >= count:
+            return self.previous
+        result = self.sum / count
+        if self.negative_count == 0 and result < 0:
+            return 0.0
+        if self.negative_count == count and result > 0:
+            return 0.0
+        return result
+
+    def get_state(self) -> Dict:
+        return {
+            'window': self.window,
+            'values': list(self.values),
+            'sum': self.sum,
+            'compensation_add': self.compensation_add,
+            'compensation_remove': self.compensation_remove,
+            'negative_count': self.negative_count,
+            'same_count': self.same_count,
+            'previous': self.previous,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'RollingMean':
+        rolling_mean = cls(state['window'])
+        rolling_mean.values = deque(state['values'])
+        for name in ('sum', 'compensation_add', 'compensation_remove', 'negative_count', 'same_count', 'previous'):
+            setattr(rolling_mean, name, state[name])
+        return rolling_mean
+
+
+class RSIIndicator:
+    """Інкрементальний RSI, що дає ті самі значення, що й calculate_rsi, за O(1) на свічку."""
+
+    def __init__(self, window: int = 14):
+        self.window = window
+        self.gain = RollingMean(window)
+        self.loss = RollingMean(window)
+        self.last_price: Optional[float] = None
+        self.value = math.nan
+
+    def update(self, price: float) -> float:
+        # Перша різниця в calculate_rsi - NaN, яку where() перетворює на 0 (а втрату - на -0.0)
+        delta = 0.0 if self.last_price is None else price - self.last_price
+        self.last_price = price
+        gain = self.gain.update(delta if delta > 0 else 0.0)
+        loss = self.loss.update(-delta if delta < 0 else -0.0)
+        if math.isnan(gain) or math.isnan(loss) or (gain == 0 and loss == 0):
+            self.value = math.nan
+        elif loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100 - (100 / (1 + gain / loss))
+        return self.value
+
+    def update_batch(self, prices) -> np.ndarray:
+        return np.array([self.update(price) for price in np.asarray(prices, dtype=float).tolist()])
+
+    def get_state(self) -> Dict:
+        return {
+            'window': self.window,
+            'gain': self.gain.get_state(),
+            'loss': self.loss.get_state(),
+            'last_price': self.last_price,
+            'value': self.value,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'RSIIndicator':
+        indicator = cls(state['window'])
+        indicator.gain = RollingMean.from_state(state['gain'])
+        indicator.loss = RollingMean.from_state(state['loss'])
+        indicator.last_price = state['last_price']
+        indicator.value = state['value']
+        return indicator
+
+
+class EMAIndicator:
+    """Інкрементальне EMA, що відтворює ewm(span=span, adjust=False).mean() з pandas."""
+
+    def __init__(self, span: int):
+        self.span = span
+        # pandas переводить span в alpha через com, тож рахуємо так само для збігу до біта
+        self.alpha = 1.0 / (1.0 + (span - 1) / 2.0)
+        self.value = math.nan
+
+    def update(self, price: float) -> float:
+        if math.isnan(self.value):
+            self.value = price
+        elif self.value != price:
+            old_weight = 1.0 - self.alpha
+            self.value = (old_weight * self.value + self.alpha * price) / (old_weight + self.alpha)
+        return self.value
+
+    def update_batch(self, prices) -> np.ndarray:
+        return np.array([self.update(price) for price in np.asarray(prices, dtype=float).tolist()])
+
+    def get_state(self) -> Dict:
+        return {'span': self.span, 'value': self.value}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'EMAIndicator':
+        indicator = cls(state['span'])
+        indicator.value = state['value']
+        return indicator
+
+
+class IndicatorSet:
+    """Усі індикатори, які використовує MarketAnalyzer (RSI, SHORT_EMA, LONG_EMA), з одним оновленням на свічку."""
+
+    def __init__(self, window_rsi: int, ema_short_period: int, ema_long_period: int):
+        self.rsi = RSIIndicator(window_rsi)
+        self.short_ema = EMAIndicator(ema_short_period)
+        self.long_ema = EMAIndicator(ema_long_period)
+
+    @classmethod
+    def from_params(cls, params) -> 'IndicatorSet':
+        return cls(params.window_rsi, params.ema_short_period, params.ema_long_period)
+
+    def update(self, price: float) -> Dict[str, float]:
+        return {
+            'RSI': self.rsi.update(price),
+            'SHORT_EMA': self.short_ema.update(price),
+            'LONG_EMA': self.long_ema.update(price),
+        }
+
+    def update_batch(self, prices) -> Dict[str, np.ndarray]:
+        prices = np.asarray(prices, dtype=float)
+        return {
+            'RSI': self.rsi.update_batch(prices),
+            'SHORT_EMA': self.short_ema.update_batch(prices),
+            'LONG_EMA': self.long_ema.update_batch(prices),
+        }
+
+    def get_state(self) -> Dict:
+        return {
+            'rsi': self.rsi.get_state(),
+            'short_ema': self.short_ema.get_state(),
+            'long_ema': self.long_ema.get_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'IndicatorSet':
+        indicators = cls.__new__(cls)
+        indicators.rsi = RSIIndicator.from_state(state['rsi'])
+        indicators.short_ema = EMAIndicator.from_state(state['short_ema'])
+        indicators.long_ema = EMAIndicator.from_state(state['long_ema'])
+        return indicators
@@ -0,0 +1,127 @@
+from enum import IntEnum
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class EventLevel(IntEnum):
+    debug = 10
+    info = 20
+    warning = 30
+
+
+class EventKind(IntEnum):
+    level = 1  # Обробка рівня: state = 1, якщо знайдено патерн
+    skipped = 2  # Угоду пропущено через некоректний індекс
+    entry = 3  # Вхід: amount - ставка, stop - стоп-лос, aux - тейк-профіт
+    take_profit = 4  # Досягнуто тейк-профіт, вмикається трейлінг стоп-лос
+    trailing_update = 5  # Оновлення трейлінг стоп-лосса: stop - новий рівень, aux - відсоток
+    trailing_state = 6  # Зміна стану трейлінг стоп-лосса: state - код StateTrailingStopLoss
+    exit = 7  # Вихід: amount - прибуток/збиток, aux - баланс, state - код ExitReason
+
+
+JOURNAL_DTYPE = np.dtype([
+    ('kind', 'u1'),
+    ('level', 'u1'),
+    ('state', 'u1'),
+    ('direction', 'i1'),  # 1 - long, -1 - short, 0 - не стосується
+    ('index', 'i8'),  # Індекс свічки
+    ('trade', 'i8'),  # Індекс входу угоди, до якої належить подія
+    ('price', 'f8'),
+    ('roi', 'f8'),
+    ('amount', 'f8'),
+    ('stop', 'f8'),
+    ('aux', 'f8'),
+])
+
+DIRECTIONS = {'long': 1, 'short': -1}
+
+
+class TradeJournal:
+    """
+    Журнал подій бектесту з типізованими записами у кільцевому буфері (NumPy structured array).
+
+    Записи нижче min_level відкидаються, а з подій рівня debug (оновлення трейлінг
+    стоп-лосса на кожній свічці) зберігається лише кожна debug_sample_every-та.
+    Коли буфер заповнено, найстаріші записи перезаписуються; їх кількість - у dropped.
+    Місця виклику перевіряють enabled перед записом, тому вимкнений журнал нічого не коштує.
+    """
+
+    enabled = True
+
+    def __init__(self, capacity: int = 1 << 16, min_level: EventLevel = EventLevel.info, debug_sample_every: int = 1):
+        self.capacity = capacity
+        self.min_level = min_level
+        self.debug_sample_every = debug_sample_every
+        self.buffer = np.zeros(capacity, dtype=JOURNAL_DTYPE)
+        self.count = 0
+        self._debug_seen = 0
+
+    @property
+    def dropped(self) -> int:
+        return max(self.count - self.capacity, 0)
+
+    def accepts(self, level: EventLevel) -> bool:
+        return level >= self.min_level
+
+    def record(
+        self,
+        kind: EventKind,
+        level: EventLevel = EventLevel.info,
+        index: int = -1,
+        trade: int = -1,
+        direction: Optional[str] = None,
+        price: float = np.nan,
+        roi: float = np.nan,
+        amount: float = np.nan,
+        stop: float = np.nan,
+        aux: float = np.nan,
+        state: int = 0
+    ):
+        if level < self.min_level:
+            return
+        if level == EventLevel.debug and self.debug_sample_every > 1:
+            self._debug_seen += 1
+            if self._debug_seen % self.debug_sample_every:
+                return
+        self.buffer[self.count % self.capacity] = (
+            kind, level, state, DIRECTIONS.get(direction, 0), index, trade, price, roi, amount, stop, aux
+        )
+        self.count += 1
+
+    def records(self, kind: Optional[EventKind] = None) -> np.ndarray:
+        """Збережені записи в хронологічному порядку (копія), за потреби лише одного типу."""
+        if self.count <= self.capacity:
+            records = self.buffer[:self.count].copy()
+        else:
+            start = self.count % self.capacity
+            records = np.concatenate((self.buffer[start:], self.buffer[:start]))
+        return records if kind is None else records[records['kind'] == kind]
+
+    def to_frame(self, kind: Optional[EventKind] = None) -> pd.DataFrame:
+        frame = pd.DataFrame(self.records(kind))
+        frame['kind'] = [EventKind(value).name for value in frame['kind']]
+        return frame
+
+    def clear(self):
+        self.count = 0
+        self._debug_seen = 0
+
+
+class NullJournal(TradeJournal):
+    """Вимкнений журнал: нічого не зберігає і не виділяє пам'ять під буфер."""
+
+    enabled = False
+
+    def __init__(self):
+        super().__init__(capacity=0)
+
+    def accepts(self, level: EventLevel) -> bool:
+        return False
+
+    def record(self, *args, **kwargs):
+        pass
+
+
+NULL_JOURNAL = NullJournal()
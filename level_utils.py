@@ -0,0 +1,232 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+LevelPoint = Tuple[int, float]
+
+
+def window_extreme(values: np.ndarray, width: int, reduce=np.minimum) -> np.ndarray:
+    """
+    Мінімум (або максимум при reduce=np.maximum) кожного вікна values[i:i + width].
+
+    Рахується подвоєнням діапазонів (як у sparse table) за O(n log width) без циклу
+    по вікну. Повертає масив довжиною len(values) - width + 1.
+    """
+    table = values
+    span = 1
+    while span * 2 <= width:
+        table = reduce(table[:-span], table[span:])
+        span *= 2
+    return reduce(table[:len(values) - width + 1], table[width - span:])
+
+
+def find_extrema(close, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Векторний аналог argrelextrema(close, np.less / np.greater, order=window).
+
+    Точка є екстремумом, якщо вона строго менша (більша) за всі сусідні в межах window
+    з кожного боку; біля країв вікно обрізається, а перша й остання точки не розглядаються.
+    Повертає індекси мінімумів і максимумів.
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    if n < 3:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    padding = np.full(window, np.inf)
+    padded = np.concatenate((padding, close, padding))
+    window_min = window_extreme(padded, window, np.minimum)
+    padded = np.concatenate((-padding, close, -padding))
+    window_max = window_extreme(padded, window, np.maximum)
+
+    # window_*[i] - вікно зліва від точки i, window_*[i + window + 1] - вікно справа
+    is_min = (close < window_min[:n]) & (close < window_min[window + 1:window + 1 + n])
+    is_max = (close > window_max[:n]) & (close > window_max[window + 1:window + 1 + n])
+    is_min[[0, -1]] = False
+    is_max[[0, -1]] = False
+    return np.flatnonzero(is_min), np.flatnonzero(is_max)
+
+
+# Визначення рівнів підтримки та опору в межах локального інтервалу
+def calculate_support_resistance(data, window=5):
+    """
+    Визначає рівні підтримки та опору, обмежуючи їх в межах вказаного інтервалу.
+
+    Рівнем є сама ціна екстремуму: вона строго менша (більша) за всі ціни в інтервалі.
+    """
+    close = np.asarray(data['Close'], dtype=float)
+    min_indices, max_indices = find_extrema(close, window)
+    support_levels = list(zip(min_indices, close[min_indices]))
+    resistance_levels = list(zip(max_indices, close[max_indices]))
+    return support_levels, resistance_levels
+
+
+def _doubling_tables(values: np.ndarray, levels: int, reduce) -> List[np.ndarray]:
+    """tables[k][j] = reduce(values[j:j + 2 ** k]) для k = 0..levels."""
+    tables = [values]
+    for k in range(levels):
+        span = 1 << k
+        tables.append(reduce(tables[-1][:-span], tables[-1][span:]))
+    return tables
+
+
+def _window_reduce(table: np.ndarray, start: int, window: int, span: int, count: int, reduce) -> np.ndarray:
+    """reduce вікон довжиною window, що починаються з start, start + 1, ... (два відрізки span, що перекриваються)."""
+    return reduce(table[start:start + count], table[start + window - span:start + window - span + count])
+
+
+@dataclass
+class LevelPyramid:
+    """
+    Рівні підтримки та опору для кількох вікон одночасно.
+
+    scales - бітова маска: біт j встановлено, якщо рівень підтверджує вікно windows[j].
+    Індекси відсортовані, рівень - ціна закриття в точці екстремуму.
+    """
+    windows: np.ndarray
+    support_index: np.ndarray
+    support_level: np.ndarray
+    support_scales: np.ndarray
+    resistance_index: np.ndarray
+    resistance_level: np.ndarray
+    resistance_scales: np.ndarray
+
+    def mask(self, window: int) -> int:
+        positions = np.flatnonzero(self.windows == window)
+        if not positions.size:
+            raise ValueError(f'Вікно {window} не входить у піраміду: {self.windows.tolist()}')
+        return 1 << int(positions[0])
+
+    def levels(self, window: int) -> Tuple[List[LevelPoint], List[LevelPoint]]:
+        """Рівні одного вікна в тому ж форматі, що й calculate_support_resistance(data, window)."""
+        bit = self.mask(window)
+        support = (self.support_scales & bit) != 0
+        resistance = (self.resistance_scales & bit) != 0
+        return (
+            list(zip(self.support_index[support], self.support_level[support])),
+            list(zip(self.resistance_index[resistance], self.resistance_level[resistance])),
+        )
+
+
+def support_resistance_pyramid(data, windows: Sequence[int] = (5, 10, 20, 50, 100)) -> LevelPyramid:
+    """
+    Рівні підтримки та опору для всіх windows за один прохід.
+
+    Таблиці мінімумів і максимумів на відрізках довжиною 2 ** k будуються один раз для найбільшого
+    вікна, а мінімум (максимум) вікна будь-якої ширини w - це дві таблиці рівня floor(log2(w)),
+    що перекриваються. Результат для кожного вікна збігається з calculate_support_resistance.
+    """
+    close = np.asarray(data['Close'] if hasattr(data, 'columns') else data, dtype=float)
+    windows = np.asarray(sorted(set(windows)), dtype=np.int64)
+    if windows.size > 63:
+        raise ValueError('Піраміда підтримує не більше 63 вікон')
+    n = len(close)
+    max_window = int(windows[-1])
+    padding = np.full(max_window, np.inf)
+
+    scales = []
+    for sign, reduce, beats in ((1, np.minimum, np.less), (-1, np.maximum, np.greater)):
+        tables = _doubling_tables(
+            np.concatenate((sign * padding, close, sign * padding)), max_window.bit_length() - 1, reduce
+        )
+        point_scales = np.zeros(n, dtype=np.int64)
+        for bit, window in enumerate(windows.tolist()):
+            span = 1 << (window.bit_length() - 1)
+            table = tables[window.bit_length() - 1]
+            # Точка i стоїть у доповненому масиві на позиції i + max_window; вікна - [i - window, i) і (i, i + window]
+            left = _window_reduce(table, max_window - window, window, span, n, reduce)
+            right = _window_reduce(table, max_window + 1, window, span, n, reduce)
+            point_scales |= (beats(close, left) & beats(close, right)).astype(np.int64) << bit
+        if n:
+            point_scales[[0, -1]] = 0
+        scales.append(point_scales)
+
+    support_index = np.flatnonzero(scales[0])
+    resistance_index = np.flatnonzero(scales[1])
+    return LevelPyramid(
+        windows, support_index, close[support_index], scales[0][support_index],
+        resistance_index, close[resistance_index], scales[1][resistance_index]
+    )
+
+
+class ExtremumDetector:
+    """
+    Потоковий пошук рівнів підтримки та опору.
+
+    Локальний мінімум або максимум підтверджується, коли після нього минуло window свічок.
+    Для цього тримаються дві монотонні черги за вікном [t - 2 * window, t], тому кожна свічка
+    обробляється за амортизовано O(1). update() повертає нові підтверджені рівні,
+    flush() - рівні біля кінця даних, які пакетний calculate_support_resistance
+    знаходить за обрізаним правим вікном.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.count = 0
+        self._min_queue = deque()
+        self._max_queue = deque()
+        self._recent = deque(maxlen=2 * window + 1)
+
+    def update(self, price: float) -> Tuple[List[LevelPoint], List[LevelPoint]]:
+        index = self.count
+        self.count += 1
+        self._recent.append(price)
+
+        # У чергах залишаємо рівні значення: саме вони показують, що екстремум не строгий
+        while self._min_queue and self._min_queue[-1][1] > price:
+            self._min_queue.pop()
+        self._min_queue.append((index, price))
+        while self._max_queue and self._max_queue[-1][1] < price:
+            self._max_queue.pop()
+        self._max_queue.append((index, price))
+
+        oldest = index - 2 * self.window
+        for queue in (self._min_queue, self._max_queue):
+            while queue[0][0] < oldest:
+                queue.popleft()
+
+        candidate = index - self.window
+        if candidate < 1:
+            return [], []
+        return self._confirmed(self._min_queue, candidate), self._confirmed(self._max_queue, candidate)
+
+    @staticmethod
+    def _confirmed(queue, candidate: int) -> List[LevelPoint]:
+        index, level = queue[0]
+        if index == candidate and (len(queue) == 1 or queue[1][1] != level):
+            return [(index, level)]
+        return []
+
+    def flush(self) -> Tuple[List[LevelPoint], List[LevelPoint]]:
+        """Рівні, підтверджені лише кінцем даних. Стан детектора не змінюється."""
+        support_levels, resistance_levels = [], []
+        recent = list(self._recent)
+        offset = self.count - len(recent)
+        for candidate in range(max(self.count - self.window, 1), self.count - 1):
+            position = candidate - offset
+            level = recent[position]
+            neighbours = recent[max(position - self.window, 0):position] + recent[position + 1:]
+            if all(level < price for price in neighbours):
+                support_levels.append((candidate, level))
+            if all(level > price for price in neighbours):
+                resistance_levels.append((candidate, level))
+        return support_levels, resistance_levels
+
+
+def stream_support_resistance(prices: Iterable[float], window: int) -> Iterator[Tuple[str, int, float]]:
+    """Віддає рівні ('sup' або 'res', індекс, рівень) в міру їх підтвердження, включно з кінцем даних."""
+    detector = ExtremumDetector(window)
+    for price in prices:
+        support_levels, resistance_levels = detector.update(price)
+        for idx, level in support_levels:
+            yield 'sup', idx, level
+        for idx, level in resistance_levels:
+            yield 'res', idx, level
+    support_levels, resistance_levels = detector.flush()
+    for idx, level in support_levels:
+        yield 'sup', idx, level
+    for idx, level in resistance_levels:
+        yield 'res', idx, level
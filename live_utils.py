@@ -0,0 +1,242 @@
+import asyncio
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import DEFAULT_PARAMS, StrategyParams
+from indicator_utils import IndicatorSet
+from level_utils import ExtremumDetector
+from pattern_utils import classify_head_and_shoulders
+from storage_utils import CandleStore
+from utils import ExitReason, TradeExecutor, calculate_profit_or_loss, step_trade, trade_bounds
+
+Candle = Sequence[float]
+
+
+@dataclass
+class TradeEvent:
+    kind: str  # 'entry' або 'exit'
+    symbol: str
+    index: int
+    timestamp: float
+    price: float
+    direction: str
+    stake_amount: float
+    profit_or_loss: float = 0.0
+    roi: float = 0.0
+    reason: Optional[str] = None
+
+
+@dataclass
+class Position:
+    executor: TradeExecutor
+    entry_index: int
+    stop_loss: float
+    take_profit: float
+
+
+class SymbolState:
+    """
+    Інкрементальний стан одного символу: індикатори, рівні, патерни та відкриті позиції.
+
+    Рівень підтверджується через window_extremum свічок - саме на свічці end_level_index,
+    де бектест відкриває угоду. На відміну від бектесту, тут видно лише патерни, праве плече
+    яких уже закрилося, тому голови з останніх step_for_head_and_shoulders свічок не враховуються.
+    """
+
+    def __init__(self, symbol: str, params: StrategyParams = DEFAULT_PARAMS):
+        self.symbol = symbol
+        self.params = params
+        self.index = -1
+        self.indicators = IndicatorSet.from_params(params)
+        self.levels = ExtremumDetector(params.window_extremum)
+        self.prices = deque(maxlen=2 * params.step_for_head_and_shoulders + 1)
+        self.pattern_heads = deque()
+        self.inverted_pattern_heads = deque()
+        self.positions: List[Position] = []
+
+    def update_patterns(self, price: float):
+        self.prices.append(price)
+        if len(self.prices) == self.prices.maxlen:
+            step = self.params.step_for_head_and_shoulders
+            kind = classify_head_and_shoulders(
+                self.prices[0], self.prices[step], self.prices[-1], self.params.head_and_shoulders_threshold
+            )
+            if kind == 'normal':
+                self.pattern_heads.append(self.index - step)
+            elif kind == 'inverted':
+                self.inverted_pattern_heads.append(self.index - step)
+        oldest = self.index - self.params.window_extremum
+        for heads in (self.pattern_heads, self.inverted_pattern_heads):
+            while heads and heads[0] < oldest:
+                heads.popleft()
+
+    def has_pattern(self, level_index: int, heads: deque) -> bool:
+        upper = level_index + self.params.window_extremum
+        return any(level_index <= head <= upper for head in heads)
+
+
+class PaperTrader:
+    """
+    Подієве паперове торгування на основі логіки MarketAnalyzer.
+
+    Кожна закрита свічка проходить через інкрементальні індикатори, рівні та патерни,
+    а відкриті позиції - через ту саму логіку трейлінг стоп-лосса, що й у бектесті.
+    Баланс спільний для всіх символів. Події входу та виходу потрапляють у чергу events
+    і, якщо задано, в on_event.
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        params: StrategyParams = DEFAULT_PARAMS,
+        on_event: Optional[Callable[[TradeEvent], None]] = None
+    ):
+        self.params = params
+        self.balance = params.initial_balance
+        self.states: Dict[str, SymbolState] = {symbol: SymbolState(symbol, params) for symbol in symbols}
+        self.on_event = on_event
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.history: List[TradeEvent] = []
+
+    def on_candle(self, symbol: str, candle: Candle) -> List[TradeEvent]:
+        """Обробляє закриття однієї свічки і повертає події, що відбулися на ній."""
+        state = self.states[symbol]
+        state.index += 1
+        timestamp, price = candle[0], candle[4]
+        values = state.indicators.update(price)
+        events = []
+
+        for position in list(state.positions):
+            exit_reason = step_trade(
+                position.executor, price, values['RSI'], values['LONG_EMA'], values['SHORT_EMA'],
+                position.stop_loss, position.take_profit
+            )
+            if exit_reason is not None:
+                events.append(self._close(state, position, exit_reason, timestamp, price))
+
+        state.update_patterns(price)
+        support_levels, resistance_levels = state.levels.update(price)
+        for idx, _ in support_levels:
+            if state.has_pattern(idx, state.inverted_pattern_heads):
+                events.append(self._open(state, 'long', timestamp, price))
+        for idx, _ in resistance_levels:
+            if state.has_pattern(idx, state.pattern_heads):
+                events.append(self._open(state, 'short', timestamp, price))
+
+        for event in events:
+            self._emit(event)
+        return events
+
+    def close_all(self, timestamps: Optional[Dict[str, float]] = None) -> List[TradeEvent]:
+        """Закриває всі відкриті позиції за останньою ціною, як бектест у кінці даних."""
+        events = []
+        for state in self.states.values():
+            if not state.positions:
+                continue
+            price = state.prices[-1]
+            timestamp = (timestamps or {}).get(state.symbol, 0.0)
+            for position in list(state.positions):
+                events.append(self._close(state, position, ExitReason.end_of_data, timestamp, price))
+        for event in events:
+            self._emit(event)
+        return events
+
+    async def run(self, feed: AsyncIterator[Tuple[str, Candle]], close_at_end: bool = False):
+        """Споживає потік (символ, свічка) до його завершення."""
+        last_timestamps = {}
+        async for symbol, candle in feed:
+            last_timestamps[symbol] = candle[0]
+            self.on_candle(symbol, candle)
+        if close_at_end:
+            self.close_all(last_timestamps)
+
+    def _open(self, state: SymbolState, direction: str, timestamp: float, price: float) -> TradeEvent:
+        params = self.params
+        stake_amount = self.balance * params.percent_of_balance_for_bet / 100 * params.stake_multiplier_start
+        stop_loss, take_profit = trade_bounds(price, direction, params)
+        executor = TradeExecutor(stake_amount, price, direction, params)
+        state.positions.append(Position(executor, state.index, stop_loss, take_profit))
+        return TradeEvent('entry', state.symbol, state.index, timestamp, price, direction, stake_amount)
+
+    def _close(
+        self,
+        state: SymbolState,
+        position: Position,
+        exit_reason: ExitReason,
+        timestamp: float,
+        price: float
+    ) -> TradeEvent:
+        executor = position.executor
+        profit_or_loss = calculate_profit_or_loss(executor, exit_reason, price)
+        self.balance += profit_or_loss
+        state.positions.remove(position)
+        return TradeEvent(
+            'exit', state.symbol, state.index, timestamp, price, executor.direction, executor.stake_amount,
+            profit_or_loss, executor.calculate_roi(price), exit_reason.value
+        )
+
+    def _emit(self, event: TradeEvent):
+        self.history.append(event)
+        self.events.put_nowait(event)
+        if self.on_event is not None:
+            self.on_event(event)
+
+
+async def replay_candles(
+    symbols: Iterable[str],
+    timeframe: str,
+    exchange_id: str,
+    store: Optional[CandleStore] = None,
+    speedup: Optional[float] = None,
+    limit: Optional[int] = None
+) -> AsyncIterator[Tuple[str, Candle]]:
+    """
+    Відтворює записані у CandleStore свічки кількох символів у порядку часу закриття.
+
+    speedup=None віддає свічки без пауз; інакше пауза між свічками дорівнює реальному
+    інтервалу, поділеному на speedup.
+    """
+    store = store or CandleStore()
+
+    def stream(symbol):
+        for candle in store.load(exchange_id, symbol, timeframe, limit).tolist():
+            yield candle[0], symbol, tuple(candle)
+
+    streams = [stream(symbol) for symbol in symbols]
+    previous = None
+    for timestamp, symbol, candle in heapq.merge(*streams):
+        if speedup and previous is not None and timestamp > previous:
+            await asyncio.sleep((timestamp - previous) / 1000 / speedup)
+        previous = timestamp
+        yield symbol, candle
+
+
+async def poll_candles(
+    symbols: Iterable[str],
+    timeframe: str,
+    pool=None,
+    exchange_id: Optional[str] = None,
+    poll_interval: float = 5.0
+) -> AsyncIterator[Tuple[str, Candle]]:
+    """
+    Стежить за закриттям свічок на біржі через ExchangePool.
+
+    Остання свічка у відповіді біржі ще формується, тому закритою вважається передостання.
+    """
+    from ccxt_utils import get_default_pool
+
+    pool = pool or get_default_pool()
+    symbols = list(symbols)
+    last_seen: Dict[str, float] = {}
+    while True:
+        results = await pool.fetch_many([(symbol, timeframe) for symbol in symbols], 2, exchange_id)
+        for (symbol, _), ohlcv in results.items():
+            if isinstance(ohlcv, Exception) or len(ohlcv) < 2:
+                continue
+            candle = ohlcv[-2]
+            if candle[0] > last_seen.get(symbol, float('-inf')):
+                last_seen[symbol] = candle[0]
+                yield symbol, candle
+        await asyncio.sleep(poll_interval)
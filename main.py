@@ -1,238 +1,313 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from scipy.signal import argrelextrema
-import matplotlib.cm as cm  # Для роботи з кольоровими картами
+import argparse
+import dataclasses
+import math
+import os
 
-from ccxt_utils import get_ohlcv_sync
-from config import WINDOW_EXTREMUM, STEP_FOR_HEAD_AND_SHOULDERS, TIMEFRAME, LIMIT_CANDLES, HEAD_AND_SHOULDERS_THRESHOLD, \
-    WINDOW_RSI, EMA_LONG_PERIOD, EMA_SHORT_PERIOD
-from plt_utils import plot_visualization
-from utils import PatternChecker, MarketAnalyzer
+from config import DEFAULT_PARAMS, LIMIT_CANDLES, TIMEFRAME, StrategyParams
 
-# 1. Завантаження даних
-ohlcv = get_ohlcv_sync('BTC-USDT', TIMEFRAME, LIMIT_CANDLES)
-data = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'Close', 'volume'])
-pattern_checker = PatternChecker(WINDOW_EXTREMUM, STEP_FOR_HEAD_AND_SHOULDERS)
+# Важкі модулі (ccxt, matplotlib, pandas) імпортуються лише тими командами, яким вони потрібні
 
 
-# Обчислення RSI
-def calculate_rsi(data, window=14):
-    """Функція для обчислення RSI."""
-    delta = data['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+def parse_params(overrides) -> StrategyParams:
+    """Перетворює список 'назва=значення' на StrategyParams поверх параметрів із config.py."""
+    fields = {field.name: field for field in dataclasses.fields(StrategyParams)}
+    values = {}
+    for override in overrides or []:
+        name, _, value = override.partition('=')
+        if name not in fields:
+            raise SystemExit(f'Невідомий параметр: {name}')
+        values[name] = fields[name].type(value)
+    return dataclasses.replace(DEFAULT_PARAMS, **values)
 
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
 
-
-data['RSI'] = calculate_rsi(data, window=WINDOW_RSI)
-print(data)
-
-
-# Визначення рівнів підтримки та опору в межах локального інтервалу
-def calculate_support_resistance(data, window=5):
+def get_frame(args, symbol: str, since=None):
     """
-    Визначає рівні підтримки та опору, обмежуючи їх в межах вказаного інтервалу.
+    Свічки symbol з локального сховища: останні --limit або, з since, усі від since (мс).
+    З --base-timeframe вони будуються з молодшого таймфрейму.
     """
-    support_levels = []
-    resistance_levels = []
-
-    # Локальні мінімуми (підтримка)
-    min_indices = argrelextrema(data['Close'].values, np.less, order=window)[0]
-    for idx in min_indices:
-        start = max(idx - window, 0)
-        end = min(idx + window, len(data))
-        support_levels.append((idx, data['Close'][start:end].min()))
-
-    # Локальні максимуми (опір)
-    max_indices = argrelextrema(data['Close'].values, np.greater, order=window)[0]
-    for idx in max_indices:
-        start = max(idx - window, 0)
-        end = min(idx + window, len(data))
-        resistance_levels.append((idx, data['Close'][start:end].max()))
-
-    return support_levels, resistance_levels
-
-
-support_levels, resistance_levels = calculate_support_resistance(data, window=WINDOW_EXTREMUM)
-
-
-# Функція для виявлення всіх патернів "Голова та плечі" та їх інверсії
-def detect_all_head_and_shoulders(prices, threshold=HEAD_AND_SHOULDERS_THRESHOLD):
-    patterns = []
-    inverted_patterns = []
-    for i in range(len(prices) - 5):
-        left_shoulder = prices[i]
-        head = prices[i + STEP_FOR_HEAD_AND_SHOULDERS]
-        right_shoulder = prices[i + STEP_FOR_HEAD_AND_SHOULDERS * 2]
-
-        # Звичайний патерн: "Голова та плечі"
-        if (
-            left_shoulder < head
-            and right_shoulder < head
-            and abs(left_shoulder - right_shoulder) < threshold * head
-        ):
-            patterns.append((i, i + STEP_FOR_HEAD_AND_SHOULDERS,
-                             i + STEP_FOR_HEAD_AND_SHOULDERS * 2))  # Додаємо індекси плечей і голови
-
-        # Інверсія: "Зворотна голова та плечі"
-        if (
-            left_shoulder > head
-            and right_shoulder > head
-            and abs(left_shoulder - right_shoulder) < threshold * head
-        ):
-            inverted_patterns.append((i, i + STEP_FOR_HEAD_AND_SHOULDERS,
-                                      i + STEP_FOR_HEAD_AND_SHOULDERS * 2))  # Додаємо індекси плечей і голови
-
-    return patterns, inverted_patterns
-
-
-# Знаходимо всі патерни
-patterns, inverted_patterns = detect_all_head_and_shoulders(data['Close'].values)
-
-# 5. Візуалізація
-plt.figure(figsize=(12, 6))
-plt.plot(data['Close'], label='Ціна закриття', color='blue')
-
-# Кольорова карта
-colormap = cm.get_cmap('tab10')
-num_patterns = len(patterns) + len(inverted_patterns)
-
-# Фільтрація сигналів на основі RSI
-rsi_threshold_lower = 30  # Перепроданість
-rsi_threshold_upper = 70  # Перекупленість
-
-# Обчислення EMA (експоненціального ковзного середнього)
-ema_short_period = EMA_SHORT_PERIOD  # Період long EMA
-data['SHORT_EMA'] = data['Close'].ewm(span=ema_short_period, adjust=False).mean()
-plt.plot(data['SHORT_EMA'], label=f'SHORT_EMA({ema_short_period})', color='red', linestyle='dashed')
-
-ema_long_period = EMA_LONG_PERIOD  # Період long EMA
-data['LONG_EMA'] = data['Close'].ewm(span=ema_long_period, adjust=False).mean()
-plt.plot(data['LONG_EMA'], label=f'LONG_EMA({ema_long_period})', color='green', linestyle='dashed')
-
-# Відфільтровуємо патерни на основі значень RSI
-# patterns = [
-#     pattern for pattern in patterns if
-#     data['RSI'].iloc[pattern[1]] < rsi_threshold_lower
-# ]
-# inverted_patterns = [
-#     pattern for pattern in inverted_patterns if
-#     data['RSI'].iloc[pattern[1]] > rsi_threshold_upper
-# ]
-
-# patterns = [pattern for pattern in patterns if
-#             data['RSI'].iloc[pattern[1]] < rsi_threshold_lower and
-#             data['SHORT_EMA'].iloc[pattern[1]] > data['LONG_EMA'].iloc[pattern[1]]]
-# inverted_patterns = [pattern for pattern in inverted_patterns if
-#                      data['RSI'].iloc[pattern[1]] > rsi_threshold_upper and
-#                      data['SHORT_EMA'].iloc[pattern[1]] < data['LONG_EMA'].iloc[pattern[1]]]
-
-# Позначення звичайних патернів
-# for idx, pattern in enumerate(patterns):
-#     color = colormap(idx / num_patterns)
-#     plt.scatter(list(pattern), data['Close'].iloc[list(pattern)], color=color)
-
-# Позначення інверсії
-# for idx, pattern in enumerate(inverted_patterns):
-#     color = colormap((idx + len(patterns)) / num_patterns)
-#     plt.scatter(list(pattern), data['Close'].iloc[list(pattern)], color=color, marker='x')
-
-# Рівні підтримки
-for idx, level in support_levels:
-    plt.hlines(level, xmin=max(idx - WINDOW_EXTREMUM, 0), xmax=min(idx + WINDOW_EXTREMUM, len(data)),
-               colors='green', linestyles='solid', label='Локальна підтримка' if idx == support_levels[0][0] else "")
-    bet_made = pattern_checker.is_pattern_found(idx, inverted_patterns)
-    vline_style = 'solid' if bet_made else 'dashed'
-    if vline_style == 'solid':
-        ...
-        plt.vlines(
-            x=min(idx + WINDOW_EXTREMUM, len(data)),
-            colors='green',
-            ymin=data['Close'].min(),
-            ymax=data['Close'].max(),
-            linestyles=vline_style
-        )
+    if args.base_timeframe:
+        from resample_utils import get_resampled_frame
 
-# Рівні опору
-for idx, level in resistance_levels:
-    plt.hlines(level, xmin=max(idx - WINDOW_EXTREMUM, 0), xmax=min(idx + WINDOW_EXTREMUM, len(data)),
-               colors='red', linestyles='solid', label='Локальний опір' if idx == resistance_levels[0][0] else "")
-
-    bet_made = pattern_checker.is_pattern_found(idx, patterns)
-    vline_style = 'solid' if bet_made else 'dashed'
-    if vline_style == 'solid':
-        ...
-        plt.vlines(
-            min(idx + WINDOW_EXTREMUM, len(data)),
-            colors='red',
-            ymin=data['Close'].min(),
-            ymax=data['Close'].max(),
-            linestyles=vline_style
+        return get_resampled_frame(
+            symbol, args.timeframe, args.limit, args.base_timeframe, refresh=not args.offline, since=since
         )
-
-market_analyzer = MarketAnalyzer(support_levels, resistance_levels, patterns, inverted_patterns,
-                                 WINDOW_EXTREMUM, STEP_FOR_HEAD_AND_SHOULDERS, data)
-transactions = market_analyzer.analyze()
-print(transactions)
-num_transactions = len(transactions)
-for i, transaction in enumerate(transactions):
-    color = colormap(i / num_transactions)
-    # Додаємо число біля лінії для початку транзакції
-    plt.text(
-        transaction[0][0],  # X-координата (час)
-        data['Close'].max(),  # Y-координата (на верхній межі графіка)
-        str(i),  # Текст (номер транзакції)
-        color=color,
-        fontsize=7,
-        horizontalalignment='center',
-    )
-
-    # Додаємо вертикальну лінію для кінця транзакції
-    plt.vlines(
-        transaction[1][0],
-        ymin=data['Close'].min(),
-        ymax=data['Close'].max(),
-        colors=color,
-        linestyles='dashed'
-    )
-    # Додаємо число біля лінії для кінця транзакції
-    plt.text(
-        transaction[1][0],  # X-координата (час)
-        data['Close'].max(),  # Y-координата (на верхній межі графіка)
-        str(i),  # Текст (номер транзакції)
-        color=color,
-        fontsize=7,
-        horizontalalignment='center'
-    )
-
-# Лінія RSI
-min_close = data['Close'].min()
-max_close = data['Close'].max()
-diff = max_close - min_close
-level_rsi_70 = min_close + diff * 70 / 100
-level_rsi_30 = min_close + diff * 30 / 100
-data['RSI'] = min_close + diff * data['RSI'] / 100
-# plt.plot(data['RSI'], label='RSI', color='orange', linestyle='solid')
-
-# # Рівні перекупленості та перепроданості
-plt.axhline(level_rsi_70, color='red', linestyle='dotted', label='Перекупленість (70)')
-plt.axhline(level_rsi_30, color='green', linestyle='dotted', label='Перепроданість (30)')
-
-# # Заголовок і легенда
-plt.title('Ціна закриття з рівнями підтримки, опору та RSI')
-plt.xlabel('Час')
-plt.ylabel('Ціна / RSI')
-plt.legend()
-
-plt.show()
-# plot_visualization(data, support_levels,resistance_levels,patterns, inverted_patterns,transactions, WINDOW_EXTREMUM, STEP_FOR_HEAD_AND_SHOULDERS)
-rois = [transaction[1][-1] for transaction in transactions]
-print(rois)
-print(len(rois))
-print(sum(rois))
-print(len([roi for roi in rois if roi > 0]))
-print(len([roi for roi in rois if roi < 0]))
+    from storage_utils import get_ohlcv_frame
+
+    return get_ohlcv_frame(symbol, args.timeframe, args.limit, refresh=not args.offline, since=since)
+
+
+def load_candles(args, since=None):
+    from profile_utils import get_profiler
+
+    with get_profiler().span('fetch'):
+        return get_frame(args, args.symbol, since)
+
+
+def command_fetch(args):
+    if args.since is None:
+        data = load_candles(args)
+        print(f'{args.symbol} {args.timeframe}: {len(data)} свічок')
+        return
+    from ccxt_utils import create_sync_exchange
+    from storage_utils import download_history
+
+    exchange = create_sync_exchange()
+    timeframe = args.base_timeframe or args.timeframe
+    added = download_history(exchange, args.symbol, timeframe, args.since, page_limit=args.limit)
+    print(f'{args.symbol} {timeframe}: додано {added} свічок')
+    if args.base_timeframe:
+        from resample_utils import update_resampled
+        from storage_utils import CandleStore
+
+        update_resampled(CandleStore(), exchange.id, args.symbol, args.timeframe, args.base_timeframe)
+
+
+def command_backtest(args):
+    from backtest_utils import run_backtest, summarize_backtest
+    from journal_utils import NULL_JOURNAL, EventLevel, TradeJournal
+
+    if args.journal:
+        journal = TradeJournal(min_level=EventLevel.debug if args.journal == 'debug' else EventLevel.info)
+    else:
+        journal = NULL_JOURNAL
+    params = parse_params(args.set)
+    snapshot = None
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        from checkpoint_utils import load_snapshot
+
+        snapshot = load_snapshot(args.checkpoint)
+    if snapshot is None or math.isnan(snapshot.first_timestamp):
+        data = load_candles(args)
+    else:
+        # Вікно --limit зсувається з новими свічками, тому історію беремо з першої свічки знімка
+        data = load_candles(args, since=snapshot.first_timestamp)
+    if snapshot is not None and not snapshot.matches(data['Close'], params):
+        print(f'Знімок {args.checkpoint} не відповідає свічкам або параметрам - повний прогін')
+        snapshot = None
+        data = load_candles(args)
+    market_analyzer = run_backtest(data, params, journal, snapshot=snapshot)
+    if args.checkpoint:
+        from checkpoint_utils import save_snapshot
+
+        save_snapshot(market_analyzer.snapshot(), args.checkpoint)
+    print(market_analyzer.transactions.column('roi').tolist())
+    for name, value in summarize_backtest(market_analyzer).items():
+        print(f'{name}: {value}')
+    if args.journal:
+        print(journal.to_frame().to_string())
+        if journal.dropped:
+            print(f'Журнал переповнено: {journal.dropped} найстаріших записів з {journal.count} перезаписано')
+    if args.export:
+        market_analyzer.transactions.export(args.export)
+    if args.monte_carlo or args.block_bootstrap:
+        robustness(args, market_analyzer)
+
+
+def robustness(args, market_analyzer):
+    from robustness_utils import resample_candles, resample_trades, summarize_distribution, trade_returns
+
+    params = market_analyzer.params
+    if args.monte_carlo:
+        returns, rois = trade_returns(market_analyzer.transactions, params.initial_balance)
+        simulations = resample_trades(returns, rois, args.monte_carlo, args.method, params.initial_balance, args.seed)
+        print(f'\nМонте-Карло по угодах ({args.method}, {args.monte_carlo}):')
+        print(summarize_distribution(simulations).to_string())
+    if args.block_bootstrap:
+        simulations = resample_candles(
+            market_analyzer.data, params, args.block_bootstrap, args.block_size, args.seed
+        )
+        print(f'\nБлоковий бутстреп свічок ({args.block_bootstrap}, блок {args.block_size}):')
+        print(summarize_distribution(simulations).to_string())
+
+
+def command_scan(args):
+    from backtest_utils import find_fresh_signals
+
+    params = parse_params(args.set)
+    for symbol in args.symbols:
+        data = get_frame(args, symbol)
+        for signal in find_fresh_signals(data, params, args.lookback):
+            print(symbol, signal)
+
+
+def command_market_scan(args):
+    import asyncio
+
+    from scanner_utils import scan_market_ranked
+
+    errors = {}
+    signals = asyncio.run(scan_market_ranked(
+        args.exchanges, args.processes, on_signal=lambda signal: print(signal['exchange'], signal['symbol'], signal),
+        timeframe=args.timeframe, limit=args.limit, params=parse_params(args.set), lookback=args.lookback,
+        quote=args.quote, max_distance=args.max_distance, errors=errors
+    ))
+    print(f'\nРейтинг ({len(signals)} сигналів, помилок завантаження: {len(errors)}):')
+    for signal in signals[:args.top]:
+        print(f"{signal['exchange']:8} {signal['symbol']:16} {signal['direction']:5} "
+              f"{signal['candles_ago']:3} {signal['distance']:.4f}")
+
+
+def command_portfolio(args):
+    from portfolio_utils import run_portfolio, summarize_portfolio
+    from profile_utils import get_profiler
+
+    params = parse_params(args.set)
+    with get_profiler().span('fetch'):
+        frames = {symbol: get_frame(args, symbol) for symbol in args.symbols}
+    portfolio = run_portfolio(frames, params, args.processes)
+    for name, value in summarize_portfolio(portfolio, params).items():
+        print(f'{name}: {value}')
+
+
+def command_plot(args):
+    from backtest_utils import run_backtest, prepare_signals
+    from profile_utils import get_profiler
+
+    params = parse_params(args.set)
+    data = load_candles(args)
+    signals = prepare_signals(data, params)
+    frame, support_levels, resistance_levels, patterns, inverted_patterns = signals
+    transactions = run_backtest(data, params, signals=signals).transactions
+    if args.output:
+        from plt_utils import render_chart
+
+        with get_profiler().span('plot'):
+            render_chart(args.output, frame, support_levels, resistance_levels, transactions, params.window_extremum)
+        print(args.output)
+    else:
+        from plt_utils import plot_visualization
+
+        with get_profiler().span('plot'):
+            plot_visualization(frame, support_levels, resistance_levels, patterns, inverted_patterns, transactions,
+                               params.window_extremum, params.step_for_head_and_shoulders)
+
+
+def command_bench(args):
+    from bench_utils import BENCH_SIZES, compare_benchmarks, format_benchmarks, load_benchmarks, run_benchmarks, \
+        save_benchmarks
+
+    report = run_benchmarks(args.sizes or BENCH_SIZES, parse_params(args.set), args.repeats, args.seed)
+    comparison = None
+    if args.compare:
+        comparison = compare_benchmarks(load_benchmarks(args.compare), report, args.tolerance)
+    print(format_benchmarks(report, comparison))
+    if args.output:
+        save_benchmarks(report, args.output)
+    if comparison is not None and comparison['regression'].any():
+        raise SystemExit(f'Регресії продуктивності: {int(comparison["regression"].sum())}')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Рівні підтримки/опору та патерни "Голова і плечі"')
+    parser.add_argument('--profile', action='store_true', help='Вивести час етапів і лічильники')
+    parser.add_argument('--trace', metavar='PATH', help='Зберегти профіль у форматі Chrome trace (JSON)')
+    parser.add_argument('--replay', metavar='DIR', help='Брати свічки з локального сховища DIR замість бірж')
+    parser.add_argument('--replay-start', type=float, metavar='MS', help='Віртуальний час початку відтворення (мс)')
+    parser.add_argument('--replay-speedup', type=float, default=1.0, help='Прискорення віртуального годинника')
+    parser.add_argument('--replay-latency', type=float, default=0.0, help='Затримка кожного запиту (с)')
+    parser.add_argument('--replay-timeout-rate', type=float, default=0.0, help='Частка запитів з таймаутом')
+    parser.add_argument('--replay-error-rate', type=float, default=0.0, help='Частка запитів з помилкою біржі')
+    parser.add_argument('--replay-seed', type=int)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_market_arguments(subparser, many_symbols=False):
+        if many_symbols:
+            subparser.add_argument('symbols', nargs='+')
+        else:
+            subparser.add_argument('symbol', nargs='?', default='BTC-USDT')
+        subparser.add_argument('--timeframe', default=TIMEFRAME)
+        subparser.add_argument('--base-timeframe', help='Будувати --timeframe локально з цього таймфрейму (напр. 15m)')
+        subparser.add_argument('--limit', type=int, default=LIMIT_CANDLES)
+        subparser.add_argument('--offline', action='store_true', help='Не звертатися до біржі, якщо свічки вже є')
+        subparser.add_argument('--set', action='append', metavar='NAME=VALUE', help='Перевизначити параметр стратегії')
+
+    fetch = subparsers.add_parser('fetch', help='Завантажити свічки в локальне сховище')
+    add_market_arguments(fetch)
+    fetch.add_argument('--since', type=int, help='Завантажити історію від цього часу (мс)')
+    fetch.set_defaults(handler=command_fetch)
+
+    backtest = subparsers.add_parser('backtest', help='Бектест стратегії')
+    add_market_arguments(backtest)
+    backtest.add_argument('--journal', choices=('info', 'debug'), help='Вивести журнал подій угод')
+    backtest.add_argument('--export', metavar='PATH', help='Зберегти угоди у .csv або .parquet')
+    backtest.add_argument('--monte-carlo', type=int, metavar='N', help='Кількість симуляцій Монте-Карло по угодах')
+    backtest.add_argument('--method', choices=('bootstrap', 'shuffle'), default='bootstrap')
+    backtest.add_argument('--block-bootstrap', type=int, metavar='N', help='Кількість бектестів на перемішаних свічках')
+    backtest.add_argument('--block-size', type=int, default=50)
+    backtest.add_argument('--seed', type=int)
+    backtest.add_argument('--checkpoint', metavar='PATH',
+                          help='Продовжити зі знімка стану (якщо файл є), перерахувавши сигнали й угоди лише для '
+                               'свічок після першого неостаточного рівня, і зберегти новий знімок')
+    backtest.set_defaults(handler=command_backtest)
+
+    scan = subparsers.add_parser('scan', help='Свіжі сигнали для кількох символів')
+    add_market_arguments(scan, many_symbols=True)
+    scan.add_argument('--lookback', type=int, default=1, help='Скільки останніх свічок вважати свіжими')
+    scan.set_defaults(handler=command_scan)
+
+    market_scan = subparsers.add_parser('market-scan', help='Свіжі сигнали по всіх парах бірж')
+    market_scan.add_argument('--exchanges', nargs='+', default=['binance', 'bingx'])
+    market_scan.add_argument('--quote', default='USDT')
+    market_scan.add_argument('--timeframe', default=TIMEFRAME)
+    market_scan.add_argument('--limit', type=int, default=LIMIT_CANDLES)
+    market_scan.add_argument('--lookback', type=int, default=1, help='Скільки останніх свічок вважати свіжими')
+    market_scan.add_argument('--max-distance', type=float, help='Максимальна відносна відстань ціни від рівня')
+    market_scan.add_argument('--top', type=int, default=20, help='Скільки сигналів показати в рейтингу')
+    market_scan.add_argument('--processes', type=int, help='Процеси для детекції (0 - без пулу процесів)')
+    market_scan.add_argument('--set', action='append', metavar='NAME=VALUE', help='Перевизначити параметр стратегії')
+    market_scan.set_defaults(handler=command_market_scan)
+
+    portfolio = subparsers.add_parser('portfolio', help='Бектест кількох символів зі спільним балансом')
+    add_market_arguments(portfolio, many_symbols=True)
+    portfolio.add_argument('--processes', type=int, help='Кількість процесів (за замовчуванням - усі ядра)')
+    portfolio.set_defaults(handler=command_portfolio)
+
+    plot = subparsers.add_parser('plot', help='Графік рівнів і угод')
+    add_market_arguments(plot)
+    plot.add_argument('--output', help='Зберегти у файл (.png, .svg) без інтерактивного вікна')
+    plot.set_defaults(handler=command_plot)
+
+    bench = subparsers.add_parser('bench', help='Заміри продуктивності на синтетичних свічках')
+    bench.add_argument('--sizes', type=int, nargs='+', help='Кількість свічок (за замовчуванням 1k - 1M, до 10M)')
+    bench.add_argument('--repeats', type=int, default=3)
+    bench.add_argument('--seed', type=int, default=42)
+    bench.add_argument('--set', action='append', metavar='NAME=VALUE', help='Перевизначити параметр стратегії')
+    bench.add_argument('--output', help='Зберегти результати у JSON')
+    bench.add_argument('--compare', metavar='BASELINE',
+                       help='Порівняти з попереднім JSON і завершитися з помилкою при регресії')
+    bench.add_argument('--tolerance', type=float, default=0.10, help='Допустиме сповільнення (частка)')
+    bench.set_defaults(handler=command_bench)
+    return parser
+
+
+def use_replay(args):
+    """Підміняє біржі на локальне відтворення свічок з --replay (без мережі)."""
+    from ccxt_utils import set_exchange_factories
+    from replay_utils import replay_factories
+
+    set_exchange_factories(*replay_factories(
+        args.replay, args.replay_start, args.replay_speedup, latency=args.replay_latency,
+        timeout_rate=args.replay_timeout_rate, error_rate=args.replay_error_rate, seed=args.replay_seed
+    ))
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.replay:
+        use_replay(args)
+    if not (args.profile or args.trace):
+        args.handler(args)
+        return
+
+    from profile_utils import profiling
+
+    with profiling() as profiler:
+        with profiler.span(f'command:{args.command}'):
+            args.handler(args)
+    print(profiler.format_summary())
+    if args.trace:
+        profiler.save_chrome_trace(args.trace)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import STEP_FOR_HEAD_AND_SHOULDERS, HEAD_AND_SHOULDERS_THRESHOLD
+
+Pattern = Tuple[int, int, int]
+PatternStarts = Tuple[np.ndarray, np.ndarray]
+
+
+def _pattern_points(prices: np.ndarray, step: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Повертає ліве плече, голову та праве плече для кожного стартового індексу.
+
+    Кількість стартів обмежена так само, як у попередньому циклі `range(len(prices) - 5)`,
+    і додатково не виходить за межі масиву для великих кроків.
+    """
+    if step < 1:
+        raise ValueError(f'Крок для голови і плечей має бути додатним: {step}')
+    count = min(len(prices) - 5, len(prices) - 2 * step)
+    if count <= 0:
+        empty = np.empty(0, dtype=prices.dtype)
+        return empty, empty, empty
+    # Вікна довжиною 2 * step + 1, з яких беремо кожен step-й елемент: (ліве плече, голова, праве плече)
+    points = sliding_window_view(prices, 2 * step + 1)[:count, ::step]
+    return points[:, 0], points[:, 1], points[:, 2]
+
+
+def classify_head_and_shoulders(left: float, head: float, right: float, threshold: float) -> Optional[str]:
+    """Скалярна перевірка однієї трійки цін: 'normal', 'inverted' або None."""
+    if not abs(left - right) < threshold * head:
+        return None
+    if left < head and right < head:
+        return 'normal'
+    if left > head and right > head:
+        return 'inverted'
+    return None
+
+
+def find_head_and_shoulders(
+    prices,
+    step: int = STEP_FOR_HEAD_AND_SHOULDERS,
+    threshold: float = HEAD_AND_SHOULDERS_THRESHOLD
+) -> PatternStarts:
+    """Знаходить стартові індекси звичайних та інверсних патернів "Голова та плечі" за один прохід."""
+    prices = np.asarray(prices, dtype=float)
+    left, head, right = _pattern_points(prices, step)
+    similar_shoulders = np.abs(left - right) < threshold * head
+    normal = np.flatnonzero(similar_shoulders & (left < head) & (right < head))
+    inverted = np.flatnonzero(similar_shoulders & (left > head) & (right > head))
+    return normal, inverted
+
+
+def scan_head_and_shoulders(
+    prices,
+    steps: Iterable[int],
+    thresholds: Iterable[float]
+) -> Dict[Tuple[int, float], PatternStarts]:
+    """
+    Сканує одразу всю сітку кроків і порогів.
+
+    Для кожного кроку плечі й голова беруться один раз, а всі пороги перевіряються
+    однією матричною операцією. Ключ результату - пара (крок, поріг).
+    """
+    prices = np.asarray(prices, dtype=float)
+    thresholds = np.asarray(list(thresholds), dtype=float)
+    result = {}
+    for step in steps:
+        left, head, right = _pattern_points(prices, step)
+        similar_shoulders = np.abs(left - right) < thresholds[:, None] * head
+        normal_mask = similar_shoulders & ((left < head) & (right < head))
+        inverted_mask = similar_shoulders & ((left > head) & (right > head))
+        for row, threshold in enumerate(thresholds):
+            result[(step, float(threshold))] = (
+                np.flatnonzero(normal_mask[row]),
+                np.flatnonzero(inverted_mask[row])
+            )
+    return result
+
+
+def starts_to_patterns(starts: np.ndarray, step: int = STEP_FOR_HEAD_AND_SHOULDERS) -> List[Pattern]:
+    """Перетворює стартові індекси на кортежі (ліве плече, голова, праве плече)."""
+    return [(start, start + step, start + 2 * step) for start in starts.tolist()]
+
+
+# Функція для виявлення всіх патернів "Голова та плечі" та їх інверсії
+def detect_all_head_and_shoulders(
+    prices,
+    threshold: float = HEAD_AND_SHOULDERS_THRESHOLD,
+    step: int = STEP_FOR_HEAD_AND_SHOULDERS
+) -> Tuple[List[Pattern], List[Pattern]]:
+    normal, inverted = find_head_and_shoulders(prices, step, threshold)
+    return starts_to_patterns(normal, step), starts_to_patterns(inverted, step)
@@ -1,5 +1,12 @@
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm  # Для роботи з кольоровими картами
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List
+
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 
 
 def plot_visualization(data, support_levels, resistance_levels, patterns, inverted_patterns, transactions,
@@ -17,11 +24,14 @@ def plot_visualization(data, support_levels, resistance_levels, patterns, invert
         - window_extremum: int - розмір вікна для екстремумів.
         - step_for_head_and_shoulders: int - крок для патернів "Голова і плечі".
     """
+    # pyplot потрібен лише для інтерактивного вікна, тому імпортується тут
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(12, 6))
     plt.plot(data['Close'], label='Ціна закриття', color='blue')
 
     # Кольорова карта
-    colormap = cm.get_cmap('tab10')
+    colormap = matplotlib.colormaps['tab10']
     num_patterns = len(patterns) + len(inverted_patterns)
 
     # Фільтрація сигналів на основі RSI
@@ -106,4 +116,79 @@ def plot_visualization(data, support_levels, resistance_levels, patterns, invert
     plt.show()
     print(data['Close'])
 
-# INCORRECT
\ No newline at end of file
+# INCORRECT
+
+
+def _level_segments(levels, window_extremum, length) -> np.ndarray:
+    """Горизонтальні відрізки рівнів у форматі LineCollection: (n, 2, 2)."""
+    if not len(levels):
+        return np.empty((0, 2, 2))
+    indices, values = (np.asarray(column, dtype=float) for column in zip(*levels))
+    xmin = np.maximum(indices - window_extremum, 0)
+    xmax = np.minimum(indices + window_extremum, length)
+    return np.stack([np.column_stack([xmin, values]), np.column_stack([xmax, values])], axis=1)
+
+
+def render_chart(path: str, data, support_levels, resistance_levels, transactions, window_extremum: int,
+                 title: str = 'Ціна закриття з рівнями підтримки, опору та RSI') -> str:
+    """
+    Малює графік без інтерактивного вікна (Agg) і зберігає його у path; формат - за розширенням (.png, .svg).
+
+    Усі рівні та позначки угод малюються кількома колекціями замість окремого артиста
+    на кожен рівень чи угоду, тому час рендеру майже не залежить від їх кількості.
+    """
+    close = np.asarray(data['Close'], dtype=float)
+    min_close, max_close = close.min(), close.max()
+    figure = Figure(figsize=(12, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.plot(close, label='Ціна закриття', color='blue')
+
+    axes.add_collection(LineCollection(
+        _level_segments(support_levels, window_extremum, len(close)), colors='green', label='Локальна підтримка'
+    ))
+    axes.add_collection(LineCollection(
+        _level_segments(resistance_levels, window_extremum, len(close)), colors='red', label='Локальний опір'
+    ))
+
+    if transactions:
+        colors = matplotlib.colormaps['tab10'](np.linspace(0, 1, len(transactions), endpoint=False))
+        entries = transactions.column('entry_index').astype(float)
+        exits = transactions.column('exit_index').astype(float)
+        axes.scatter(entries, np.full(len(entries), max_close), color=colors, marker='v', s=12, label='Вхід')
+        exit_segments = np.stack([
+            np.column_stack([exits, np.full(len(exits), min_close)]),
+            np.column_stack([exits, np.full(len(exits), max_close)]),
+        ], axis=1)
+        axes.add_collection(LineCollection(exit_segments, colors=colors, linestyles='dashed', linewidths=0.8))
+
+    # Рівні перекупленості та перепроданості в масштабі ціни
+    diff = max_close - min_close
+    axes.axhline(min_close + diff * 70 / 100, color='red', linestyle='dotted', label='Перекупленість (70)')
+    axes.axhline(min_close + diff * 30 / 100, color='green', linestyle='dotted', label='Перепроданість (30)')
+
+    axes.set_title(title)
+    axes.set_xlabel('Час')
+    axes.set_ylabel('Ціна / RSI')
+    axes.legend()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    figure.savefig(path)
+    return path
+
+
+def _render_job(job: Dict) -> str:
+    return render_chart(**job)
+
+
+def render_charts(jobs: Iterable[Dict], processes: int = None) -> List[str]:
+    """
+    Рендерить багато графіків паралельно в окремих процесах.
+
+    Кожне завдання - словник аргументів render_chart (path, data, рівні, транзакції, ...).
+    Повертає шляхи до збережених файлів.
+    """
+    jobs = list(jobs)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_render_job, jobs))
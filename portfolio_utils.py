@@ -0,0 +1,112 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest_utils import TRADE_COLUMNS, extract_trades
+from config import DEFAULT_PARAMS, StrategyParams
+
+PORTFOLIO_COLUMNS = ['symbol', *TRADE_COLUMNS, 'taken', 'stake_amount', 'profit_or_loss', 'balance']
+
+
+def _symbol_trades(job: Tuple[str, pd.DataFrame, StrategyParams]) -> pd.DataFrame:
+    symbol, data, params = job
+    trades = extract_trades(data, params)
+    trades.insert(0, 'symbol', symbol)
+    return trades
+
+
+def collect_trades(
+    frames: Dict[str, pd.DataFrame],
+    params: StrategyParams = DEFAULT_PARAMS,
+    processes: Optional[int] = None
+) -> pd.DataFrame:
+    """Сигнали та угоди для кожного символу окремо, паралельно в пулі процесів."""
+    jobs = [(symbol, data, params) for symbol, data in frames.items()]
+    if processes == 1:
+        results = list(map(_symbol_trades, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_symbol_trades, jobs))
+    results = [trades for trades in results if len(trades)]
+    if not results:
+        return pd.DataFrame(columns=['symbol', *TRADE_COLUMNS])
+    return pd.concat(results, ignore_index=True)
+
+
+def allocate_portfolio(trades: pd.DataFrame, params: StrategyParams = DEFAULT_PARAMS) -> pd.DataFrame:
+    """
+    Проводить угоди всіх символів через спільний баланс у хронологічному порядку.
+
+    Ставка - PERCENT_OF_BALANCE_FOR_BET від реалізованого балансу на момент входу (для першої
+    угоди помножена на STAKE_MULTIPLIER_START). Ставка резервується до виходу; якщо вільних
+    коштів не вистачає, угода пропускається (taken = False). Прибуток додається до балансу
+    на свічці виходу, виходи обробляються раніше за входи з тим самим часом.
+    """
+    trades = trades.reset_index(drop=True)
+    count = len(trades)
+    entry_time = trades['entry_time'].to_numpy(dtype=float)
+    exit_time = trades['exit_time'].to_numpy(dtype=float)
+    unit_return = trades['unit_return'].to_numpy(dtype=float)
+
+    # Події: (час, порядок, угода); порядок 0 - вихід, 1 - вхід, 2 - вихід угоди, що закрилася на свічці входу
+    exit_order = np.where(exit_time > entry_time, 0, 2)
+    times = np.concatenate((exit_time, entry_time))
+    orders = np.concatenate((exit_order, np.ones(count, dtype=int)))
+    trade_ids = np.concatenate((np.arange(count), np.arange(count)))
+    is_entry = np.concatenate((np.zeros(count, dtype=bool), np.ones(count, dtype=bool)))
+    events = np.lexsort((trade_ids, orders, times))
+
+    taken = np.zeros(count, dtype=bool)
+    stakes = np.zeros(count)
+    profits = np.zeros(count)
+    balances = np.full(count, np.nan)
+    balance = params.initial_balance
+    committed = 0.0
+    stake_multiplier = params.stake_multiplier_start
+    for event in events.tolist():
+        trade = trade_ids[event]
+        if is_entry[event]:
+            stake_amount = balance * params.percent_of_balance_for_bet / 100 * stake_multiplier
+            if committed + stake_amount > balance:
+                continue
+            taken[trade] = True
+            stakes[trade] = stake_amount
+            committed += stake_amount
+            stake_multiplier = 1.0
+        elif taken[trade]:
+            profits[trade] = stakes[trade] * unit_return[trade]
+            balance += profits[trade]
+            committed -= stakes[trade]
+            balances[trade] = balance
+
+    result = trades.copy()
+    result['taken'] = taken
+    result['stake_amount'] = stakes
+    result['profit_or_loss'] = profits
+    result['balance'] = balances
+    return result[PORTFOLIO_COLUMNS].sort_values(['entry_time', 'symbol'], kind='stable', ignore_index=True)
+
+
+def run_portfolio(
+    frames: Dict[str, pd.DataFrame],
+    params: StrategyParams = DEFAULT_PARAMS,
+    processes: Optional[int] = None
+) -> pd.DataFrame:
+    """Бектест портфеля: угоди по символах паралельно, потім спільний баланс (allocate_portfolio)."""
+    return allocate_portfolio(collect_trades(frames, params, processes), params)
+
+
+def summarize_portfolio(portfolio: pd.DataFrame, params: StrategyParams = DEFAULT_PARAMS) -> Dict[str, float]:
+    """Підсумок портфеля в тому ж форматі, що й summarize_backtest, плюс пропущені угоди."""
+    taken = portfolio[portfolio['taken']]
+    return {
+        'final_balance': float(params.initial_balance + taken['profit_or_loss'].sum()),
+        'trades': len(taken),
+        'wins': int((taken['roi'] > 0).sum()),
+        'losses': int((taken['roi'] < 0).sum()),
+        'roi_sum': float(taken['roi'].sum()),
+        'skipped': int(len(portfolio) - len(taken)),
+        'symbols': int(taken['symbol'].nunique()),
+    }
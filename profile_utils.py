@@ -0,0 +1,177 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Методи, які profiling() обгортає спанами: (модуль, клас, методи)
+INSTRUMENTED_METHODS = (
+    ('utils', 'MarketAnalyzer', ('analyze', '_process_level', '_execute_trade')),
+    ('utils', 'TradeExecutor', ('calculate_roi', 'update_trailing_stop_loss', 'update_state_trailing_stop_loss',
+                                'is_stop_loss_hit', 'is_take_profit_hit', 'is_close_position')),
+    ('utils', None, ('simulate_trade', 'step_trade', 'find_first_crossing')),
+)
+
+
+class Profiler:
+    """
+    Збирає тривалість спанів і лічильники.
+
+    Для кожного імені спану завжди ведеться агрегат (кількість викликів, сумарний і максимальний час),
+    а окремі спани для Chrome trace зберігаються лише до max_spans; решта рахується в dropped_spans.
+    """
+
+    enabled = True
+
+    def __init__(self, max_spans: int = 1 << 20):
+        self.max_spans = max_spans
+        self.spans: List[Tuple[str, int, int, int]] = []  # (ім'я, початок нс, тривалість нс, потік)
+        self.dropped_spans = 0
+        self.totals: Dict[str, List[int]] = {}  # ім'я -> [кількість, сумарно нс, максимум нс]
+        self.counters: Dict[str, float] = {}
+        self.origin = time.perf_counter_ns()
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_span(name, started, time.perf_counter_ns() - started)
+
+    def add_span(self, name: str, started: int, duration: int):
+        total = self.totals.get(name)
+        if total is None:
+            self.totals[name] = [1, duration, duration]
+        else:
+            total[0] += 1
+            total[1] += duration
+            if duration > total[2]:
+                total[2] = duration
+        if len(self.spans) < self.max_spans:
+            self.spans.append((name, started, duration, threading.get_ident()))
+        else:
+            self.dropped_spans += 1
+
+    def count(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> 'pd.DataFrame':
+        """Таблиця спанів, відсортована за сумарним часом (секунди)."""
+        import pandas as pd  # Лише тут, щоб main.py міг імпортувати модуль без важких залежностей
+
+        rows = [
+            {'name': name, 'calls': calls, 'total': total / 1e9, 'mean': total / calls / 1e9, 'max': longest / 1e9}
+            for name, (calls, total, longest) in self.totals.items()
+        ]
+        frame = pd.DataFrame(rows, columns=['name', 'calls', 'total', 'mean', 'max'])
+        return frame.sort_values('total', ascending=False, ignore_index=True)
+
+    def format_summary(self) -> str:
+        lines = [self.summary().to_string(index=False)]
+        lines += [f'{name}: {value:g}' for name, value in sorted(self.counters.items())]
+        if self.dropped_spans:
+            lines.append(f'Спанів не збережено для trace: {self.dropped_spans}')
+        return '\n'.join(lines)
+
+    def chrome_trace(self) -> Dict:
+        """Події у форматі Chrome trace (chrome://tracing, Perfetto): спани як 'X', лічильники як 'C'."""
+        pid = os.getpid()
+        events = [
+            {'name': name, 'ph': 'X', 'ts': (started - self.origin) / 1000, 'dur': duration / 1000,
+             'pid': pid, 'tid': tid}
+            for name, started, duration, tid in self.spans
+        ]
+        end = (time.perf_counter_ns() - self.origin) / 1000
+        events += [
+            {'name': name, 'ph': 'C', 'ts': end, 'pid': pid, 'args': {name: float(value)}}
+            for name, value in self.counters.items()
+        ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path: str):
+        with open(path, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+
+
+class NullProfiler(Profiler):
+    """Вимкнений профайлер: спани й лічильники нічого не роблять."""
+
+    enabled = False
+    _null_span = nullcontext()
+
+    def __init__(self):
+        super().__init__(max_spans=0)
+
+    def span(self, name: str):
+        return self._null_span
+
+    def add_span(self, name: str, started: int, duration: int):
+        pass
+
+    def count(self, name: str, value: float = 1):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+_active_profiler: Profiler = NULL_PROFILER
+
+
+def get_profiler() -> Profiler:
+    """Активний профайлер; поза profiling() - NULL_PROFILER."""
+    return _active_profiler
+
+
+def _timed(function, name: str, profiler: Profiler):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.add_span(name, started, time.perf_counter_ns() - started)
+
+    return wrapper
+
+
+def _patch_targets(targets: Iterable) -> List[Tuple[object, str, object, str]]:
+    """(власник, атрибут, оригінал, ім'я спану) для кожного методу чи функції з targets."""
+    import importlib
+
+    patches = []
+    for module_name, class_name, names in targets:
+        module = importlib.import_module(module_name)
+        owner = module if class_name is None else getattr(module, class_name)
+        prefix = module_name if class_name is None else class_name
+        for name in names:
+            patches.append((owner, name, owner.__dict__[name], f'{prefix}.{name}'))
+    return patches
+
+
+@contextmanager
+def profiling(profiler: Optional[Profiler] = None, targets: Iterable = INSTRUMENTED_METHODS):
+    """
+    Вмикає профілювання на час блоку with і повертає профайлер.
+
+    Методи з targets обгортаються спанами лише всередині блоку, а після нього відновлюються,
+    тому без profiling() код працює без жодних обгорток. Функції, імпортовані в інші модулі
+    через from ... import, обгортаються лише у своєму модулі.
+    """
+    global _active_profiler
+    profiler = profiler if profiler is not None else Profiler()
+    patches = _patch_targets(targets)
+    previous = _active_profiler
+    _active_profiler = profiler
+    for owner, name, original, span_name in patches:
+        setattr(owner, name, _timed(original, span_name, profiler))
+    try:
+        yield profiler
+    finally:
+        for owner, name, original, _ in patches:
+            setattr(owner, name, original)
+        _active_profiler = previous
@@ -0,0 +1,150 @@
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from journal_utils import DIRECTIONS
+
+TRADE_RECORD_DTYPE = np.dtype([
+    ('entry_index', 'i8'),
+    ('exit_index', 'i8'),
+    ('entry_time', 'f8'),  # Timestamp свічки входу (мс), NaN - якщо в даних немає колонки timestamp
+    ('exit_time', 'f8'),
+    ('entry_price', 'f8'),
+    ('exit_price', 'f8'),
+    ('direction', 'i1'),  # 1 - long, -1 - short
+    ('stake_amount', 'f8'),
+    ('profit_or_loss', 'f8'),
+    ('roi', 'f8'),
+    ('exit_reason', 'u1'),  # Код з EXIT_REASON_CODES
+])
+
+LegacyTransaction = Tuple[Tuple[int, float], Tuple[int, float, float, float]]
+
+
+class TradeRecords:
+    """
+    Закриті угоди в одному NumPy structured array (74 байти на угоду) замість вкладених списків.
+
+    Буфер росте подвоєнням, колонки доступні без копіювання через column() або records.
+    Для сумісності зі старим форматом transactions[i] повертає
+    ((entry_index, entry_price), (exit_index, exit_price, profit_or_loss, roi)),
+    тому код, що індексує угоди позиційно, працює без змін.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._buffer = np.zeros(max(capacity, 1), dtype=TRADE_RECORD_DTYPE)
+        self._count = 0
+
+    def append(
+        self,
+        entry_index: int,
+        exit_index: int,
+        entry_price: float,
+        exit_price: float,
+        direction: str,
+        stake_amount: float,
+        profit_or_loss: float,
+        roi: float,
+        exit_reason: int,
+        entry_time: float = np.nan,
+        exit_time: float = np.nan
+    ):
+        if self._count == len(self._buffer):
+            self._buffer = np.resize(self._buffer, 2 * len(self._buffer))
+        self._buffer[self._count] = (
+            entry_index, exit_index, entry_time, exit_time, entry_price, exit_price, DIRECTIONS[direction],
+            stake_amount, profit_or_loss, roi, exit_reason
+        )
+        self._count += 1
+
+    @classmethod
+    def from_records(cls, records: np.ndarray) -> 'TradeRecords':
+        trade_records = cls(len(records))
+        trade_records._buffer[:len(records)] = records
+        trade_records._count = len(records)
+        return trade_records
+
+    @classmethod
+    def concatenate(cls, parts: Iterable['TradeRecords']) -> 'TradeRecords':
+        return cls.from_records(np.concatenate([part.records for part in parts] or [np.empty(0, TRADE_RECORD_DTYPE)]))
+
+    @property
+    def records(self) -> np.ndarray:
+        """Заповнена частина буфера (view, без копіювання)."""
+        return self._buffer[:self._count]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.records[name]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> LegacyTransaction:
+        record = self.records[position]
+        return (
+            (int(record['entry_index']), float(record['entry_price'])),
+            (int(record['exit_index']), float(record['exit_price']), float(record['profit_or_loss']),
+             float(record['roi'])),
+        )
+
+    def __iter__(self) -> Iterator[LegacyTransaction]:
+        for position in range(self._count):
+            yield self[position]
+
+    def __getstate__(self):
+        # Для pickle (пул процесів) передаємо лише заповнену частину буфера
+        return {'records': self.records.copy()}
+
+    def __setstate__(self, state):
+        self._buffer = state['records'] if len(state['records']) else np.zeros(1, dtype=TRADE_RECORD_DTYPE)
+        self._count = len(state['records'])
+
+    def stats(self, initial_balance: Optional[float] = None) -> Dict[str, float]:
+        """
+        Агрегати по колонках: кількість угод, виграшів і програшів, сума та середнє ROI, частка виграшів,
+        сумарний прибуток; з initial_balance - ще фінальний баланс і максимальна просадка.
+        """
+        roi = self.column('roi')
+        profit_or_loss = self.column('profit_or_loss')
+        wins = int((roi > 0).sum())
+        stats = {
+            'trades': self._count,
+            'wins': wins,
+            'losses': int((roi < 0).sum()),
+            'roi_sum': float(roi.sum()),
+            'roi_mean': float(roi.mean()) if self._count else np.nan,
+            'win_rate': wins / self._count if self._count else np.nan,
+            'profit_or_loss': float(profit_or_loss.sum()),
+        }
+        if initial_balance is not None:
+            equity = initial_balance + np.concatenate(([0.0], np.cumsum(profit_or_loss)))
+            peaks = np.maximum.accumulate(equity)
+            stats['final_balance'] = float(equity[-1])
+            stats['max_drawdown'] = float((1 - equity / peaks).max())
+        return stats
+
+    def to_frame(self) -> pd.DataFrame:
+        """Датафрейм з назвами напрямів і причин закриття замість кодів."""
+        from utils import ExitReason
+
+        frame = pd.DataFrame(self.records)
+        frame['direction'] = np.where(frame['direction'] > 0, 'long', 'short')
+        frame['exit_reason'] = np.array([reason.name for reason in ExitReason])[frame['exit_reason']]
+        return frame
+
+    def to_csv(self, path: str):
+        self.to_frame().to_csv(path, index=False)
+
+    def to_parquet(self, path: str):
+        """Потребує pyarrow або fastparquet (як і pandas.DataFrame.to_parquet)."""
+        self.to_frame().to_parquet(path, index=False)
+
+    def export(self, path: str):
+        """Зберігає угоди у CSV або Parquet - за розширенням файлу."""
+        if path.endswith('.parquet'):
+            self.to_parquet(path)
+        elif path.endswith('.csv'):
+            self.to_csv(path)
+        else:
+            raise ValueError(f'Невідомий формат експорту: {path} (потрібно .csv або .parquet)')
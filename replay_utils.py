@@ -0,0 +1,182 @@
+import asyncio
+import math
+import os
+import random
+import re
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from ccxt import BadSymbol, ExchangeError, RequestTimeout
+
+from config import CANDLE_STORE_DIR, LIMIT_CANDLES, SYNC_EXCHANGE_ID
+from resample_utils import parse_timeframe
+from storage_utils import CandleStore
+
+
+class ReplayClock:
+    """
+    Віртуальний час біржі (мс): стартує з start_time і йде в speedup разів швидше за реальний.
+
+    speedup=0 - годинник стоїть і рухається лише через advance(), що робить прогін детермінованим.
+    Один годинник можна передати кільком біржам, щоб вони відтворювали ту саму мить.
+    """
+
+    def __init__(self, start_time: float, speedup: float = 1.0):
+        self.start_time = start_time
+        self.speedup = speedup
+        self._started = time.monotonic()
+
+    def now(self) -> float:
+        return self.start_time + (time.monotonic() - self._started) * 1000 * self.speedup
+
+    def advance(self, milliseconds: float):
+        self.start_time += milliseconds
+
+
+class ReplayExchange:
+    """
+    Локальна біржа з інтерфейсом fetch_ohlcv синхронного клієнта ccxt, що віддає свічки з CandleStore.
+
+    Без clock видно всі записані свічки, з clock - лише ті, що вже закрилися на віртуальному годиннику.
+    Кожен запит чекає latency + uniform(0, latency_jitter) секунд і з імовірностями timeout_rate / error_rate
+    завершується RequestTimeout / ExchangeError. Випадковість задається seed (або спільним rng кількох
+    бірж), тож прогін відтворюваний. Такі помилки повторюють і ExchangePool, і синхронні завантаження
+    (ccxt_utils.request_sync).
+    """
+
+    def __init__(
+        self,
+        exchange_id: str = SYNC_EXCHANGE_ID,
+        store: Optional[CandleStore] = None,
+        clock: Optional[ReplayClock] = None,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        timeout_rate: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        rate_limit: int = 0,
+        rng: Optional[random.Random] = None
+    ):
+        self.id = exchange_id
+        self.store = store or CandleStore()
+        self.clock = clock
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.timeout_rate = timeout_rate
+        self.error_rate = error_rate
+        # Ті самі атрибути, що читають ExchangePool і код поверх ccxt
+        self.rateLimit = rate_limit
+        self.enableRateLimit = False
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._random = rng if rng is not None else random.Random(seed)
+        self._series: Dict[tuple, np.ndarray] = {}
+
+    def now(self) -> float:
+        """Віртуальний час біржі (мс); inf - якщо годинника немає і видно всю історію."""
+        return math.inf if self.clock is None else self.clock.now()
+
+    def _plan_request(self) -> tuple:
+        """Затримка та помилка (або None) для чергового запиту - в порядку надходження запитів."""
+        self.calls += 1
+        delay = self.latency + self._random.uniform(0, self.latency_jitter)
+        draw = self._random.random()
+        if draw < self.timeout_rate:
+            self.timeouts += 1
+            return delay, RequestTimeout(f'{self.id}: імітований таймаут')
+        if draw < self.timeout_rate + self.error_rate:
+            self.errors += 1
+            return delay, ExchangeError(f'{self.id}: імітована помилка біржі')
+        return delay, None
+
+    def _candles(self, symbol: str, timeframe: str) -> np.ndarray:
+        key = (symbol, timeframe)
+        if key not in self._series:
+            candles = self.store.load(self.id, symbol, timeframe)
+            if not len(candles):
+                raise BadSymbol(f'{self.id}: немає записаних свічок {symbol} {timeframe}')
+            self._series[key] = candles
+        return self._series[key]
+
+    def _serve(self, symbol: str, timeframe: str, since: Optional[int], limit: Optional[int]) -> List[list]:
+        candles = self._candles(symbol, timeframe)
+        limit = limit or LIMIT_CANDLES
+        # Свічка закрита, якщо її кінець (timestamp + тривалість) не пізніше віртуального часу
+        visible = np.searchsorted(candles[:, 0], self.now() - parse_timeframe(timeframe), side='right')
+        if since is None:
+            start = max(visible - limit, 0)
+        else:
+            start = np.searchsorted(candles[:, 0], since, side='left')
+        return candles[start:min(start + limit, visible)].tolist()
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since=None, limit=None, params=None) -> List[list]:
+        delay, error = self._plan_request()
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            raise error
+        return self._serve(symbol, timeframe, since, limit)
+
+    def _markets(self) -> Dict[str, dict]:
+        root = os.path.join(self.store.root, self.id)
+        symbols = sorted(os.listdir(root)) if os.path.isdir(root) else []
+        markets = {}
+        for symbol in symbols:
+            parts = re.split(r'[-_/]', symbol)
+            markets[symbol] = {'symbol': symbol, 'base': parts[0], 'quote': parts[-1], 'spot': True, 'active': True}
+        return markets
+
+    def load_markets(self, reload: bool = False) -> Dict[str, dict]:
+        """Ринки - символи, для яких у сховищі є свічки цієї біржі (у вигляді імен каталогів сховища)."""
+        return self._markets()
+
+    def close(self):
+        pass
+
+
+class AsyncReplayExchange(ReplayExchange):
+    """Асинхронний варіант ReplayExchange з інтерфейсом ccxt.async_support: затримки не блокують цикл подій."""
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since=None, limit=None, params=None):
+        delay, error = self._plan_request()
+        if delay:
+            await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return self._serve(symbol, timeframe, since, limit)
+
+    async def load_markets(self, reload: bool = False) -> Dict[str, dict]:
+        return self._markets()
+
+    async def close(self):
+        pass
+
+
+def replay_factories(
+    root: str = CANDLE_STORE_DIR,
+    start_time: Optional[float] = None,
+    speedup: float = 1.0,
+    **options
+) -> tuple:
+    """
+    Фабрики (sync, async) для ccxt_utils.set_exchange_factories і ExchangePool(exchange_factory=...).
+
+    Усі біржі читають свічки з CandleStore(root) і, якщо задано start_time, ділять один ReplayClock,
+    тому клієнти, створені на кожен запит (як у get_ohlcv_sync), бачать ту саму мить. Так само всі
+    клієнти беруть затримки й помилки з одного генератора random.Random(seed): інакше кожен новий
+    клієнт повторював би ту саму послідовність збоїв від початку.
+    Решта options передається в ReplayExchange.
+    """
+    store = CandleStore(root)
+    clock = ReplayClock(start_time, speedup) if start_time is not None else None
+    options['rng'] = random.Random(options.pop('seed', None))
+
+    def create_sync(exchange_id: str = SYNC_EXCHANGE_ID) -> ReplayExchange:
+        return ReplayExchange(exchange_id, store, clock, **options)
+
+    def create_async(exchange_id: str) -> AsyncReplayExchange:
+        return AsyncReplayExchange(exchange_id, store, clock, **options)
+
+    return create_sync, create_async
@@ -0,0 +1,117 @@
+import re
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from config import LIMIT_CANDLES, SYNC_EXCHANGE_ID
+from storage_utils import CANDLE_DTYPE, CANDLE_WIDTH, CandleStore, download_history
+
+TIMEFRAME_UNITS_MS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+# 1970-01-01 - четвер, а тижневі свічки на біржах починаються з понеділка
+WEEK_OFFSET_MS = 4 * TIMEFRAME_UNITS_MS['d']
+
+
+def parse_timeframe(timeframe: str) -> int:
+    """Тривалість таймфрейму ('15m', '4h', '1d', '1w') у мілісекундах без звернення до ccxt."""
+    match = re.fullmatch(r'(\d+)([mhdw])', timeframe)
+    if not match:
+        raise ValueError(f'Непідтримуваний таймфрейм: {timeframe}')
+    return int(match.group(1)) * TIMEFRAME_UNITS_MS[match.group(2)]
+
+
+def bucket_starts(timestamps: np.ndarray, timeframe: str) -> np.ndarray:
+    """Початок свічки таймфрейму timeframe, до якої належить кожен timestamp (UTC, як на біржах)."""
+    duration = parse_timeframe(timeframe)
+    offset = WEEK_OFFSET_MS if timeframe.endswith('w') else 0
+    return (timestamps - offset) // duration * duration + offset
+
+
+def resample_ohlcv(candles: np.ndarray, timeframe: str) -> np.ndarray:
+    """
+    Агрегує свічки (n, 6) у старший таймфрейм: open - перший, high - максимум, low - мінімум,
+    close - останній, volume - сума. Остання свічка може бути незакритою, як і на біржі.
+    """
+    candles = np.asarray(candles, dtype=CANDLE_DTYPE).reshape(-1, CANDLE_WIDTH)
+    if not len(candles):
+        return np.empty((0, CANDLE_WIDTH), dtype=CANDLE_DTYPE)
+    buckets = bucket_starts(candles[:, 0], timeframe)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], len(candles)) - 1
+    return np.column_stack((
+        buckets[starts],
+        candles[starts, 1],
+        np.maximum.reduceat(candles[:, 2], starts),
+        np.minimum.reduceat(candles[:, 3], starts),
+        candles[ends, 4],
+        np.add.reduceat(candles[:, 5], starts),
+    ))
+
+
+def derived_timeframe(timeframe: str, base_timeframe: str) -> str:
+    """Ключ похідного ряду в CandleStore, щоб він не змішувався зі свічками, завантаженими з біржі."""
+    return f'{timeframe}@{base_timeframe}'
+
+
+def update_resampled(
+    store: CandleStore,
+    exchange_id: str,
+    symbol: str,
+    timeframe: str,
+    base_timeframe: str
+) -> int:
+    """
+    Оновлює похідний ряд timeframe з базових свічок сховища.
+
+    Перераховується лише остання похідна свічка (вона могла бути незакритою) і все, що новіше,
+    тому оновлення коштує пропорційно кількості нових базових свічок.
+    Повертає кількість доданих похідних свічок.
+    """
+    if parse_timeframe(timeframe) % parse_timeframe(base_timeframe):
+        raise ValueError(f'Таймфрейм {timeframe} не ділиться на базовий {base_timeframe}')
+    key = derived_timeframe(timeframe, base_timeframe)
+    base = store.load(exchange_id, symbol, base_timeframe)
+    last = store.last_timestamp(exchange_id, symbol, key)
+    if last is not None:
+        base = base[np.searchsorted(base[:, 0], last):]
+    return store.write(exchange_id, symbol, key, resample_ohlcv(base, timeframe))
+
+
+def get_resampled_frame(
+    symbol: str,
+    timeframe: str,
+    limit: int,
+    base_timeframe: str,
+    refresh: bool = True,
+    store: Optional[CandleStore] = None,
+    exchange=None,
+    since: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    Аналог get_ohlcv_frame, що будує timeframe з локальних свічок base_timeframe.
+
+    З біржі довантажуються лише базові свічки (при refresh=True або якщо їх ще немає),
+    після чого похідний ряд оновлюється інкрементально. Як і в get_ohlcv_frame, since (мс)
+    замість останніх limit свічок повертає всі свічки від since.
+    """
+    store = store or CandleStore()
+    exchange_id = exchange.id if exchange is not None else SYNC_EXCHANGE_ID
+    if refresh or not store.count(exchange_id, symbol, base_timeframe):
+        if exchange is None:
+            from ccxt_utils import create_sync_exchange
+
+            exchange = create_sync_exchange()
+        exchange_id = exchange.id
+        if store.count(exchange_id, symbol, base_timeframe):
+            store.refresh(exchange, symbol, base_timeframe, LIMIT_CANDLES)
+        else:
+            # Базових свічок потрібно в рази більше, ніж limit, тому завантажуємо історію посторінково
+            download_since = int(time.time() * 1000) - limit * parse_timeframe(timeframe)
+            if since is not None:
+                download_since = min(download_since, int(since))
+            # Старт з межі свічки timeframe, інакше перша похідна свічка зібралася б з частини базових
+            download_since = int(bucket_starts(download_since, timeframe))
+            download_history(exchange, symbol, base_timeframe, download_since, store=store)
+    update_resampled(store, exchange_id, symbol, timeframe, base_timeframe)
+    return store.load_frame(exchange_id, symbol, derived_timeframe(timeframe, base_timeframe), limit, since)
@@ -0,0 +1,141 @@
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest_utils import run_backtest
+from config import DEFAULT_PARAMS, StrategyParams
+from journal_utils import NULL_JOURNAL
+from records_utils import TradeRecords
+
+RESAMPLE_METHODS = ('bootstrap', 'shuffle')
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def trade_returns(
+    transactions: TradeRecords,
+    initial_balance: float = DEFAULT_PARAMS.initial_balance
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Дохідність кожної угоди відносно балансу перед нею та ROI угод з MarketAnalyzer.transactions (TradeRecords).
+
+    Баланс після угод - initial_balance * prod(1 + returns), тому угоди можна переставляти
+    і вибирати з поверненням, не перераховуючи розмір ставок.
+    """
+    profits = transactions.column('profit_or_loss')
+    rois = transactions.column('roi')
+    balances = initial_balance + np.concatenate(([0.0], np.cumsum(profits)[:-1]))
+    return profits / balances, rois
+
+
+def max_drawdown(equity: np.ndarray) -> np.ndarray:
+    """Максимальна просадка (частка від піку) кожного рядка матриці кривих капіталу."""
+    peaks = np.maximum.accumulate(equity, axis=-1)
+    return (1 - equity / peaks).max(axis=-1)
+
+
+def resample_trades(
+    returns: np.ndarray,
+    rois: np.ndarray,
+    simulations: int = 10_000,
+    method: str = 'bootstrap',
+    initial_balance: float = DEFAULT_PARAMS.initial_balance,
+    seed: Optional[int] = None,
+    batch_size: int = 4096
+) -> pd.DataFrame:
+    """
+    Монте-Карло по угодах: 'bootstrap' - вибірка з поверненням, 'shuffle' - перестановка.
+
+    Усі симуляції пачки рахуються однією матрицею (симуляції x угоди). При перестановці
+    фінальний баланс не змінюється, змінюється лише просадка.
+    Повертає по рядку на симуляцію: final_balance, max_drawdown, win_rate.
+    """
+    if method not in RESAMPLE_METHODS:
+        raise ValueError(f'Невідомий метод: {method}, доступні: {RESAMPLE_METHODS}')
+    rng = np.random.default_rng(seed)
+    count = len(returns)
+    if count == 0:
+        return pd.DataFrame({'final_balance': np.full(simulations, initial_balance),
+                             'max_drawdown': np.zeros(simulations), 'win_rate': np.full(simulations, np.nan)})
+
+    results = []
+    for start in range(0, simulations, batch_size):
+        size = min(batch_size, simulations - start)
+        if method == 'bootstrap':
+            picks = rng.integers(0, count, size=(size, count))
+        else:
+            picks = np.argsort(rng.random((size, count)), axis=1)
+        equity = initial_balance * np.cumprod(1 + returns[picks], axis=1)
+        # Початковий баланс теж входить у криву, інакше перша збиткова угода не дає просадки
+        equity = np.concatenate((np.full((size, 1), initial_balance), equity), axis=1)
+        results.append(pd.DataFrame({
+            'final_balance': equity[:, -1],
+            'max_drawdown': max_drawdown(equity),
+            'win_rate': (rois[picks] > 0).mean(axis=1),
+        }))
+    return pd.concat(results, ignore_index=True)
+
+
+def block_bootstrap_closes(
+    close: np.ndarray,
+    simulations: int,
+    block_size: int = 50,
+    seed: Optional[int] = None
+) -> np.ndarray:
+    """
+    Нові ряди цін закриття з блоків лог-доходностей вихідного ряду (moving block bootstrap).
+
+    Блоки зберігають короткострокову структуру (тренди, кластери волатильності), від якої
+    залежать рівні й патерни. Повертає матрицю (simulations, len(close)), що починається з close[0].
+    """
+    close = np.asarray(close, dtype=float)
+    if len(close) < 2:
+        # Немає доходностей для вибірки - кожна симуляція збігається з вихідним рядом
+        return np.tile(close, (simulations, 1))
+    log_returns = np.diff(np.log(close))
+    count = len(log_returns)
+    block_size = max(min(block_size, count), 1)
+    rng = np.random.default_rng(seed)
+    blocks = -(-count // block_size)
+    starts = rng.integers(0, count - block_size + 1, size=(simulations, blocks))
+    picks = (starts[:, :, None] + np.arange(block_size)).reshape(simulations, -1)[:, :count]
+    paths = np.cumsum(log_returns[picks], axis=1)
+    return close[0] * np.exp(np.concatenate((np.zeros((simulations, 1)), paths), axis=1))
+
+
+def resample_candles(
+    data: pd.DataFrame,
+    params: StrategyParams = DEFAULT_PARAMS,
+    simulations: int = 100,
+    block_size: int = 50,
+    seed: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Монте-Карло по свічках: повний бектест на кожному ряді з block_bootstrap_closes.
+
+    Ряди генеруються однією матрицею, бектести проганяються по черзі з вимкненим журналом.
+    Повертає по рядку на симуляцію: final_balance, max_drawdown, win_rate, trades.
+    """
+    closes = block_bootstrap_closes(data['Close'].to_numpy(dtype=float), simulations, block_size, seed)
+    rows = []
+    for close in closes:
+        market_analyzer = run_backtest(pd.DataFrame({'Close': close}), params, NULL_JOURNAL)
+        stats = market_analyzer.transactions.stats(params.initial_balance)
+        rows.append({
+            'final_balance': float(market_analyzer.balance),
+            'max_drawdown': stats['max_drawdown'],
+            'win_rate': stats['win_rate'],
+            'trades': stats['trades'],
+        })
+    return pd.DataFrame(rows)
+
+
+def summarize_distribution(simulations: pd.DataFrame, percentiles=PERCENTILES) -> pd.DataFrame:
+    """Середнє, стандартне відхилення та перцентилі кожної метрики симуляцій."""
+    summary = pd.DataFrame({
+        'mean': simulations.mean(),
+        'std': simulations.std(),
+        **{f'p{percentile}': simulations.quantile(percentile / 100) for percentile in percentiles},
+    })
+    summary.index.name = 'metric'
+    return summary
@@ -0,0 +1,135 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest_utils import find_fresh_signals
+from ccxt_utils import ExchangePool
+from config import DEFAULT_PARAMS, EXCHANGE_IDS, LIMIT_CANDLES, OHLCV_COLUMNS, TIMEFRAME, StrategyParams
+
+
+async def list_symbols(pool: ExchangePool, exchange_id: str, quote: str = 'USDT') -> List[str]:
+    """Уніфіковані символи (напр. 'BTC/USDT') усіх активних спотових пар біржі з котируванням quote."""
+    markets = await pool.load_markets(exchange_id)
+    return sorted(
+        market['symbol'] for market in markets.values()
+        if market.get('quote') == quote and market.get('spot') and market.get('active') is not False
+    )
+
+
+def assign_symbols(listings: Dict[str, Sequence[str]]) -> List[Tuple[str, str]]:
+    """
+    Розподіляє символи між біржами: кожен символ завантажується один раз, а спільні для кількох
+    бірж символи віддаються біржі з найменшою на цей момент чергою.
+    Повертає пари (символ, біржа).
+    """
+    owners = {}
+    for exchange_id, symbols in listings.items():
+        for symbol in symbols:
+            owners.setdefault(symbol, []).append(exchange_id)
+    load = {exchange_id: 0 for exchange_id in listings}
+    # Спершу символи, доступні лише на одній біржі, - вони визначають мінімальне навантаження
+    assignments = []
+    for symbol, exchange_ids in sorted(owners.items(), key=lambda item: (len(item[1]), item[0])):
+        exchange_id = min(exchange_ids, key=lambda exchange: load[exchange])
+        load[exchange_id] += 1
+        assignments.append((symbol, exchange_id))
+    return assignments
+
+
+def detect_signals(
+    symbol: str,
+    exchange_id: str,
+    candles: List[List[float]],
+    params: StrategyParams = DEFAULT_PARAMS,
+    lookback: int = 1
+) -> List[Dict]:
+    """Свіжі сигнали одного символу; distance - відносна відстань ціни входу від рівня."""
+    data = pd.DataFrame(np.asarray(candles, dtype=float).reshape(-1, len(OHLCV_COLUMNS)), columns=OHLCV_COLUMNS)
+    signals = find_fresh_signals(data, params, lookback)
+    for signal in signals:
+        signal['symbol'] = symbol
+        signal['exchange'] = exchange_id
+        signal['distance'] = abs(signal['price'] - signal['level']) / signal['level']
+    return signals
+
+
+def rank_signals(signals: Iterable[Dict]) -> List[Dict]:
+    """Найсвіжіші сигнали першими, серед однаково свіжих - найближчі до рівня."""
+    return sorted(signals, key=lambda signal: (signal['candles_ago'], signal['distance']))
+
+
+async def scan_market(
+    pool: ExchangePool,
+    exchange_ids: Sequence[str] = EXCHANGE_IDS,
+    timeframe: str = TIMEFRAME,
+    limit: int = LIMIT_CANDLES,
+    params: StrategyParams = DEFAULT_PARAMS,
+    lookback: int = 1,
+    quote: str = 'USDT',
+    max_distance: Optional[float] = None,
+    executor: Optional[Executor] = None,
+    errors: Optional[Dict[str, BaseException]] = None
+) -> AsyncIterator[Dict]:
+    """
+    Сканує всі пари з котируванням quote на біржах exchange_ids і віддає сигнали в міру надходження свічок.
+
+    Запити ставляться в чергу одразу, а темп і кількість одночасних запитів до кожної біржі визначає
+    пул (для rate limit біржі - ExchangePool(rate_limit=True)). Детекція виконується в executor
+    (пул процесів), тож поки воркери рахують, завантаження продовжуються; без executor - у поточному потоці.
+    Символи, які не вдалося завантажити чи обробити, пропускаються й записуються в errors.
+    """
+    listings = await asyncio.gather(*(list_symbols(pool, exchange_id, quote) for exchange_id in exchange_ids))
+    loop = asyncio.get_running_loop()
+
+    async def scan_symbol(symbol: str, exchange_id: str) -> List[Dict]:
+        try:
+            candles = await pool.fetch_ohlcv(symbol, timeframe, limit, exchange_id=exchange_id)
+            if executor is None:
+                return detect_signals(symbol, exchange_id, candles, params, lookback)
+            return await loop.run_in_executor(executor, detect_signals, symbol, exchange_id, candles, params, lookback)
+        except Exception as error:
+            if errors is not None:
+                errors[symbol] = error
+            return []
+
+    tasks = [
+        asyncio.ensure_future(scan_symbol(symbol, exchange_id))
+        for symbol, exchange_id in assign_symbols(dict(zip(exchange_ids, listings)))
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            for signal in await task:
+                if max_distance is None or signal['distance'] <= max_distance:
+                    yield signal
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def scan_market_ranked(
+    exchange_ids: Sequence[str] = EXCHANGE_IDS,
+    processes: Optional[int] = None,
+    on_signal=None,
+    **kwargs
+) -> List[Dict]:
+    """
+    Повне сканування з власним пулом бірж (з rate limit) і пулом процесів.
+
+    on_signal викликається для кожного сигналу одразу після його появи; результат - рейтинг усіх сигналів.
+    processes=0 - детекція без пулу процесів.
+    """
+    signals = []
+    executor = ProcessPoolExecutor(max_workers=processes) if processes != 0 else None
+    try:
+        async with ExchangePool(exchange_ids, rate_limit=True) as pool:
+            async for signal in scan_market(pool, exchange_ids, executor=executor, **kwargs):
+                signals.append(signal)
+                if on_signal is not None:
+                    on_signal(signal)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return rank_signals(signals)
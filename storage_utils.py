@@ -0,0 +1,241 @@
+import os
+import re
+import shutil
+from typing import AsyncIterable, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import CANDLE_STORE_DIR, LIMIT_CANDLES, OHLCV_COLUMNS, SYNC_EXCHANGE_ID
+
+CANDLE_DTYPE = np.dtype('<f8')
+CANDLE_WIDTH = len(OHLCV_COLUMNS)
+CANDLE_SIZE = CANDLE_DTYPE.itemsize * CANDLE_WIDTH
+
+
+class CandleStore:
+    """
+    Локальне сховище свічок з ключем (біржа, символ, таймфрейм).
+
+    Кожен ключ - це окремий файл із рядками float64 [timestamp, open, high, low, close, volume],
+    відсортованими за часом. Такий файл читається через np.memmap без копіювання,
+    а нові свічки дописуються в кінець. Timestamp у мілісекундах зберігається як float64,
+    що точно для будь-яких реальних дат.
+    """
+
+    def __init__(self, root: str = CANDLE_STORE_DIR):
+        self.root = root
+
+    def path(self, exchange_id: str, symbol: str, timeframe: str) -> str:
+        safe_symbol = re.sub(r'[^A-Za-z0-9_.-]', '_', symbol)
+        return os.path.join(self.root, exchange_id, safe_symbol, f'{timeframe}.f64')
+
+    def count(self, exchange_id: str, symbol: str, timeframe: str) -> int:
+        path = self.path(exchange_id, symbol, timeframe)
+        return os.path.getsize(path) // CANDLE_SIZE if os.path.exists(path) else 0
+
+    def load(
+        self,
+        exchange_id: str,
+        symbol: str,
+        timeframe: str,
+        limit: Optional[int] = None,
+        since: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Повертає масив (n, 6), відображений з диска тільки для читання. limit - кількість останніх свічок,
+        since - усі свічки з timestamp >= since (тоді limit ігнорується).
+        """
+        rows = self.count(exchange_id, symbol, timeframe)
+        if rows == 0:
+            return np.empty((0, CANDLE_WIDTH), dtype=CANDLE_DTYPE)
+        candles = np.memmap(
+            self.path(exchange_id, symbol, timeframe), dtype=CANDLE_DTYPE, mode='r', shape=(rows, CANDLE_WIDTH)
+        )
+        if since is not None:
+            return candles[np.searchsorted(candles[:, 0], since, side='left'):]
+        return candles if limit is None else candles[-limit:]
+
+    def load_frame(
+        self,
+        exchange_id: str,
+        symbol: str,
+        timeframe: str,
+        limit: Optional[int] = None,
+        since: Optional[float] = None
+    ) -> pd.DataFrame:
+        """Датафрейм у форматі main.py, що дивиться на файл без копіювання."""
+        return pd.DataFrame(self.load(exchange_id, symbol, timeframe, limit, since), columns=OHLCV_COLUMNS, copy=False)
+
+    def first_timestamp(self, exchange_id: str, symbol: str, timeframe: str) -> Optional[int]:
+        candles = self.load(exchange_id, symbol, timeframe)
+        return int(candles[0, 0]) if len(candles) else None
+
+    def last_timestamp(self, exchange_id: str, symbol: str, timeframe: str) -> Optional[int]:
+        candles = self.load(exchange_id, symbol, timeframe, limit=1)
+        return int(candles[0, 0]) if len(candles) else None
+
+    def write(self, exchange_id: str, symbol: str, timeframe: str, ohlcv: List[list]) -> int:
+        """
+        Дописує свічки новіші за останню збережену.
+
+        Свічка з тим самим timestamp, що й остання збережена, перезаписує її: остання свічка
+        на біржі могла бути ще не закритою. Повертає кількість доданих свічок.
+        """
+        candles = np.asarray(ohlcv, dtype=CANDLE_DTYPE).reshape(-1, CANDLE_WIDTH)
+        if not len(candles):
+            return 0
+        candles = candles[np.argsort(candles[:, 0], kind='stable')]
+        path = self.path(exchange_id, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        last = self.last_timestamp(exchange_id, symbol, timeframe)
+        if last is not None:
+            same = candles[candles[:, 0] == last]
+            if len(same):
+                with open(path, 'r+b') as file:
+                    file.seek(-CANDLE_SIZE, os.SEEK_END)
+                    file.write(same[-1].tobytes())
+            candles = candles[candles[:, 0] > last]
+        # Дублікати всередині однієї порції залишаємо останніми
+        keep = np.append(candles[1:, 0] != candles[:-1, 0], True) if len(candles) else np.empty(0, dtype=bool)
+        candles = candles[keep]
+        with open(path, 'ab') as file:
+            file.write(np.ascontiguousarray(candles).tobytes())
+        return len(candles)
+
+    def backfill(self, exchange_id: str, symbol: str, timeframe: str, pages: Iterable[List[list]]) -> int:
+        """
+        Додає свічки, старіші за першу збережену.
+
+        Сторінки по черзі пишуться в тимчасовий файл, після чого до нього дописується
+        існуючий файл і тимчасовий атомарно його замінює. Повертає кількість доданих свічок.
+        """
+        path = self.path(exchange_id, symbol, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        first = self.first_timestamp(exchange_id, symbol, timeframe)
+        temporary_path = path + '.tmp'
+        added = 0
+        last_written = None
+        with open(temporary_path, 'wb') as file:
+            for page in pages:
+                candles = np.asarray(page, dtype=CANDLE_DTYPE).reshape(-1, CANDLE_WIDTH)
+                if first is not None:
+                    candles = candles[candles[:, 0] < first]
+                if last_written is not None:
+                    candles = candles[candles[:, 0] > last_written]
+                if len(candles):
+                    file.write(np.ascontiguousarray(candles).tobytes())
+                    last_written = candles[-1, 0]
+                    added += len(candles)
+            if os.path.exists(path):
+                with open(path, 'rb') as existing:
+                    shutil.copyfileobj(existing, file)
+        os.replace(temporary_path, path)
+        return added
+
+    def refresh(self, exchange, symbol: str, timeframe: str, limit: int) -> int:
+        """
+        Довантажує з біржі лише свічки, новіші за останню збережену.
+
+        exchange - синхронний клієнт ccxt. Якщо сховище порожнє, завантажуються останні limit свічок.
+        """
+        from ccxt_utils import fetch_ohlcv_sync, iter_ohlcv_history
+
+        since = self.last_timestamp(exchange.id, symbol, timeframe)
+        if since is None:
+            candles = fetch_ohlcv_sync(exchange, symbol, timeframe, limit=limit)
+            return self.write(exchange.id, symbol, timeframe, candles)
+        return sum(
+            self.write(exchange.id, symbol, timeframe, page)
+            for page in iter_ohlcv_history(exchange, symbol, timeframe, since, page_limit=limit)
+        )
+
+
+def download_history(
+    exchange,
+    symbol: str,
+    timeframe: str,
+    since: int,
+    until: Optional[int] = None,
+    page_limit: int = LIMIT_CANDLES,
+    store: Optional[CandleStore] = None
+) -> int:
+    """
+    Завантажує глибоку історію [since, until] у сховище посторінково: кожна сторінка
+    одразу пишеться на диск. Частина, старіша за вже збережені свічки, додається через backfill.
+    """
+    from ccxt_utils import iter_ohlcv_history
+
+    store = store or CandleStore()
+    first = store.first_timestamp(exchange.id, symbol, timeframe)
+    added = 0
+    if first is not None and since < first:
+        older_until = first - 1 if until is None else min(until, first - 1)
+        added += store.backfill(
+            exchange.id, symbol, timeframe,
+            iter_ohlcv_history(exchange, symbol, timeframe, since, older_until, page_limit)
+        )
+    last = store.last_timestamp(exchange.id, symbol, timeframe)
+    if last is not None:
+        since = max(since, last)
+    if until is None or since <= until:
+        for page in iter_ohlcv_history(exchange, symbol, timeframe, since, until, page_limit):
+            added += store.write(exchange.id, symbol, timeframe, page)
+    return added
+
+
+async def adownload_history(
+    exchange_id: str,
+    symbol: str,
+    timeframe: str,
+    since: int,
+    until: Optional[int] = None,
+    page_limit: int = LIMIT_CANDLES,
+    store: Optional[CandleStore] = None,
+    pool=None
+) -> int:
+    """
+    Асинхронний аналог download_history через ExchangePool.
+
+    Дописує лише свічки, новіші за вже збережені; для дозавантаження старішої історії
+    використовуйте download_history.
+    """
+    from ccxt_utils import aiter_ohlcv_history
+
+    store = store or CandleStore()
+    last = store.last_timestamp(exchange_id, symbol, timeframe)
+    if last is not None:
+        since = max(since, last)
+    added = 0
+    pages: AsyncIterable = aiter_ohlcv_history(symbol, timeframe, since, until, page_limit, pool, exchange_id)
+    async for page in pages:
+        added += store.write(exchange_id, symbol, timeframe, page)
+    return added
+
+
+def get_ohlcv_frame(
+    symbol: str,
+    timeframe: str,
+    limit: int,
+    refresh: bool = True,
+    store: Optional[CandleStore] = None,
+    exchange=None,
+    since: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    Повертає останні limit свічок із локального сховища (з since - усі свічки від since).
+
+    При refresh=True спершу довантажуються лише нові свічки. При refresh=False мережа
+    (і сам ccxt) використовується тільки тоді, коли для ключа ще немає жодної свічки.
+    """
+    store = store or CandleStore()
+    exchange_id = exchange.id if exchange is not None else SYNC_EXCHANGE_ID
+    if refresh or not store.count(exchange_id, symbol, timeframe):
+        if exchange is None:
+            from ccxt_utils import create_sync_exchange
+
+            exchange = create_sync_exchange()
+        store.refresh(exchange, symbol, timeframe, limit)
+        exchange_id = exchange.id
+    return store.load_frame(exchange_id, symbol, timeframe, limit, since)
@@ -0,0 +1,74 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, replace
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtest_utils import run_backtest, summarize_backtest
+from cache_utils import NULL_CACHE, MemoCache
+from config import DEFAULT_PARAMS, OHLCV_COLUMNS, StrategyParams
+from journal_utils import NULL_JOURNAL
+
+# Стан процесу-воркера: спільна пам'ять, датафрейм, що дивиться на неї без копіювання, і кеш сигналів
+_worker_memory: Optional[SharedMemory] = None
+_worker_data: Optional[pd.DataFrame] = None
+_worker_cache: MemoCache = NULL_CACHE
+
+
+def expand_grid(grid: Dict[str, Iterable], base: StrategyParams = DEFAULT_PARAMS) -> List[StrategyParams]:
+    """Розгортає сітку {назва параметра: значення} у список StrategyParams (декартовий добуток)."""
+    names = list(grid)
+    return [
+        replace(base, **dict(zip(names, values)))
+        for values in itertools.product(*(list(grid[name]) for name in names))
+    ]
+
+
+def _init_worker(memory_name: str, shape, use_cache: bool = True, cache_dir: Optional[str] = None):
+    global _worker_memory, _worker_data, _worker_cache
+    _worker_cache = MemoCache(directory=cache_dir) if use_cache else NULL_CACHE
+    _worker_memory = SharedMemory(name=memory_name)
+    candles = np.ndarray(shape, dtype=np.float64, buffer=_worker_memory.buf)
+    _worker_data = pd.DataFrame(candles, columns=OHLCV_COLUMNS, copy=False)
+
+
+def _run_params(params: StrategyParams) -> Dict:
+    return {**asdict(params), **summarize_backtest(run_backtest(_worker_data, params, NULL_JOURNAL, _worker_cache))}
+
+
+def run_sweep(
+    data: pd.DataFrame,
+    grid: Dict[str, Iterable],
+    base: StrategyParams = DEFAULT_PARAMS,
+    processes: Optional[int] = None,
+    use_cache: bool = True,
+    cache_dir: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Проганяє бектести для всієї сітки параметрів у пулі процесів.
+
+    OHLCV-дані один раз копіюються у спільну пам'ять, воркери підключаються до неї
+    замість того, щоб отримувати датафрейм через pickle. Кожен воркер кешує індикатори,
+    рівні та патерни (MemoCache); з cache_dir кеш спільний для воркерів і наступних запусків.
+    Повертає таблицю, відсортовану за фінальним балансом.
+    """
+    params_list = expand_grid(grid, base)
+    candles = np.ascontiguousarray(data[OHLCV_COLUMNS].to_numpy(dtype=np.float64))
+    memory = SharedMemory(create=True, size=max(candles.nbytes, 1))
+    try:
+        np.ndarray(candles.shape, dtype=np.float64, buffer=memory.buf)[:] = candles
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(memory.name, candles.shape, use_cache, cache_dir)
+        ) as executor:
+            results = list(executor.map(_run_params, params_list, chunksize=max(len(params_list) // 64, 1)))
+    finally:
+        memory.close()
+        memory.unlink()
+
+    table = pd.DataFrame(results)
+    return table.sort_values(['final_balance', 'wins', 'roi_sum'], ascending=False).reset_index(drop=True)
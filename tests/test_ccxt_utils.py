@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from ccxt_utils import close_default_pool, get_default_pool, get_ohlcv, iter_ohlcv_history, set_exchange_factories, \
+    timeframe_to_ms
+
+
+class ListExchange:
+    """Синхронна біржа зі списку свічок, що, як і справжня, віддає й поточну незакриту свічку."""
+
+    id = 'list'
+
+    def __init__(self, candles):
+        self.candles = candles
+        self.calls = 0
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        self.calls += 1
+        return [candle for candle in self.candles if candle[0] >= since][:limit]
+
+
+def test_history_stops_after_the_page_with_the_current_candle():
+    duration = timeframe_to_ms('1h')
+    current = int(time.time() * 1000) // duration * duration
+    candles = [[current - offset * duration, 1.0, 1.0, 1.0, 1.0, 1.0] for offset in range(119, -1, -1)]
+    exchange = ListExchange(candles)
+
+    pages = list(iter_ohlcv_history(exchange, 'BTC/USDT', '1h', candles[0][0], page_limit=50))
+
+    assert [candle for page in pages for candle in page] == candles
+    # Три сторінки (50, 50, 20) без зайвого запиту, що повернув би порожню сторінку
+    assert exchange.calls == 3
+
+
+class ClosingExchange:
+    """Асинхронна біржа, що запам'ятовує, чи її закрили."""
+
+    rateLimit = 0
+
+    def __init__(self, exchange_id):
+        self.id = exchange_id
+        self.enableRateLimit = True
+        self.closed = False
+
+    async def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        return [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def closing_exchanges():
+    created = []
+
+    def create(exchange_id):
+        created.append(ClosingExchange(exchange_id))
+        return created[-1]
+
+    set_exchange_factories(async_factory=create)
+    yield created
+    set_exchange_factories()
+
+
+def test_default_pool_is_closed_at_the_end_of_asyncio_run(closing_exchanges):
+    for _ in range(2):
+        assert asyncio.run(get_ohlcv('BTC/USDT', '1h', 1))
+        assert closing_exchanges and all(exchange.closed for exchange in closing_exchanges)
+
+
+def test_close_default_pool_closes_clients_and_resets_the_pool(closing_exchanges):
+    async def fetch_and_close():
+        first = get_default_pool()
+        await get_ohlcv('BTC/USDT', '1h', 1)
+        await close_default_pool()
+        return first, get_default_pool()
+
+    first, second = asyncio.run(fetch_and_close())
+    assert first is not second
+    assert all(exchange.closed for exchange in closing_exchanges)
+
+
+def test_pool_of_a_stopped_loop_is_closed_when_replaced(closing_exchanges):
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(get_ohlcv('BTC/USDT', '1h', 1))
+    finally:
+        # Цикл зупинено без asyncio.run, тож задача, що закриває пул, так і не завершилася
+        loop.close()
+    stale = list(closing_exchanges)
+    asyncio.run(get_ohlcv('BTC/USDT', '1h', 1))
+    assert stale and all(exchange.closed for exchange in stale)
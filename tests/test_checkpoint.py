@@ -0,0 +1,83 @@
+import numpy as np
+
+import main
+from backtest_utils import prepare_signals, resume_signals, run_backtest
+from bench_utils import generate_ohlcv
+from checkpoint_utils import INDICATOR_COLUMNS
+from config import DEFAULT_PARAMS, SYNC_EXCHANGE_ID
+from journal_utils import NULL_JOURNAL
+from storage_utils import CandleStore
+
+SYMBOL = 'BTC-USDT'
+TIMEFRAME = '2h'
+BACKTEST_ARGS = ['backtest', '--offline', '--timeframe', TIMEFRAME, '--limit', '1000']
+
+
+def final_balance(output: str) -> float:
+    line = next(line for line in output.splitlines() if line.startswith('final_balance:'))
+    return float(line.split(':')[1])
+
+
+def test_cli_resumes_checkpoint_after_new_candles(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    store = CandleStore()
+    candles = generate_ohlcv(2010, seed=7, interval_ms=7_200_000).to_numpy()
+    store.write(SYNC_EXCHANGE_ID, SYMBOL, TIMEFRAME, candles[:2000])
+    checkpoint = str(tmp_path / 'checkpoint.pkl')
+
+    main.main([*BACKTEST_ARGS, '--checkpoint', checkpoint])
+    capsys.readouterr()
+
+    store.write(SYNC_EXCHANGE_ID, SYMBOL, TIMEFRAME, candles[2000:])
+    main.main([*BACKTEST_ARGS, '--checkpoint', checkpoint])
+    output = capsys.readouterr().out
+    assert 'не відповідає' not in output
+
+    # Знімок продовжує історію з першої свічки першого прогону, тобто охоплює 1010 свічок
+    history = store.load_frame(SYNC_EXCHANGE_ID, SYMBOL, TIMEFRAME, since=candles[1000, 0])
+    expected = run_backtest(history, journal=NULL_JOURNAL)
+    assert final_balance(output) == expected.balance
+    assert len(expected.transactions)
+
+
+def test_cli_falls_back_to_full_run_on_mismatched_checkpoint(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    candles = generate_ohlcv(2000, seed=3, interval_ms=7_200_000).to_numpy()
+    CandleStore().write(SYNC_EXCHANGE_ID, SYMBOL, TIMEFRAME, candles)
+    checkpoint = str(tmp_path / 'checkpoint.pkl')
+
+    main.main([*BACKTEST_ARGS, '--checkpoint', checkpoint])
+    capsys.readouterr()
+    main.main([*BACKTEST_ARGS, '--checkpoint', checkpoint, '--set', 'window_rsi=12'])
+    output = capsys.readouterr().out
+    assert 'не відповідає' in output
+    assert np.isfinite(final_balance(output))
+
+
+def test_resume_signals_match_full_signals_on_the_tail():
+    data = generate_ohlcv(4000, seed=5)
+    snapshot = run_backtest(data.iloc[:3500], journal=NULL_JOURNAL).snapshot()
+    assert snapshot.signal_start > 0
+
+    frame, *levels_and_patterns = resume_signals(data, snapshot)
+    full_frame, *full_levels_and_patterns = prepare_signals(data)
+    start = snapshot.signal_start
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_array_equal(frame[column].to_numpy()[start:], full_frame[column].to_numpy()[start:])
+    support, resistance, patterns, inverted = levels_and_patterns
+    full_support, full_resistance, full_patterns, full_inverted = full_levels_and_patterns
+    assert support == [level for level in full_support if level[0] >= snapshot.cursor]
+    assert resistance == [level for level in full_resistance if level[0] >= snapshot.cursor]
+    assert patterns == [pattern for pattern in full_patterns if pattern[0] >= start]
+    assert inverted == [pattern for pattern in full_inverted if pattern[0] >= start]
+
+
+def test_chained_resumes_match_full_run():
+    data = generate_ohlcv(4000, seed=2)
+    expected = run_backtest(data, DEFAULT_PARAMS, NULL_JOURNAL)
+    snapshot = None
+    for end in (1500, 2300, 2301, 3700, 4000):
+        market_analyzer = run_backtest(data.iloc[:end], DEFAULT_PARAMS, NULL_JOURNAL, snapshot=snapshot)
+        snapshot = market_analyzer.snapshot()
+    assert market_analyzer.balance == expected.balance
+    np.testing.assert_array_equal(market_analyzer.transactions.records, expected.transactions.records)
@@ -0,0 +1,16 @@
+from backtest_utils import run_backtest
+from bench_utils import generate_ohlcv
+from journal_utils import NULL_JOURNAL, EventKind, TradeJournal
+
+
+def test_backtest_journal_is_opt_in():
+    data = generate_ohlcv(3000, seed=6)
+    assert run_backtest(data).journal is NULL_JOURNAL
+
+    journal = TradeJournal(capacity=16)
+    market_analyzer = run_backtest(data, journal=journal)
+    assert market_analyzer.journal is journal
+    assert journal.dropped == journal.count - 16 > 0
+    # Після переповнення лишаються останні записи: останній вихід - з останньої угоди
+    exits = journal.records(EventKind.exit)
+    assert exits[-1]['index'] == market_analyzer.transactions.column('exit_index')[-1]
@@ -0,0 +1,303 @@
+"""Оптимізовані шляхи проти початкових (baseline) реалізацій на фіксованому seed."""
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.signal import argrelextrema
+
+from backtest_utils import prepare_signals
+from bench_utils import generate_ohlcv
+from config import DEFAULT_PARAMS, StrategyParams
+from indicator_utils import IndicatorSet
+from journal_utils import NULL_JOURNAL
+from level_utils import calculate_support_resistance, stream_support_resistance, support_resistance_pyramid
+from pattern_utils import detect_all_head_and_shoulders
+from resample_utils import derived_timeframe, parse_timeframe, resample_ohlcv, update_resampled
+from storage_utils import CandleStore
+from utils import MarketAnalyzer, PatternChecker
+
+SEED = 21
+SYMBOL = 'BTC-USDT'
+
+
+@pytest.fixture(scope='module')
+def data() -> pd.DataFrame:
+    data = generate_ohlcv(6000, seed=SEED)
+    # Округлені ціни дають рівні сусідні значення, на яких нестрогі екстремуми й патерни легко зламати
+    data['Close'] = data['Close'].round(-1)
+    return data
+
+
+def baseline_levels(close: np.ndarray, window: int):
+    """calculate_support_resistance з baseline main.py: argrelextrema і мінімум (максимум) вікна."""
+    support = [
+        (index, close[max(index - window, 0):min(index + window, len(close))].min())
+        for index in argrelextrema(close, np.less, order=window)[0]
+    ]
+    resistance = [
+        (index, close[max(index - window, 0):min(index + window, len(close))].max())
+        for index in argrelextrema(close, np.greater, order=window)[0]
+    ]
+    return support, resistance
+
+
+def baseline_patterns(prices: np.ndarray, threshold: float, step: int):
+    """detect_all_head_and_shoulders з baseline main.py - цикл по всіх стартових індексах."""
+    patterns, inverted_patterns = [], []
+    for i in range(len(prices) - 5):
+        left, head, right = prices[i], prices[i + step], prices[i + 2 * step]
+        if left < head and right < head and abs(left - right) < threshold * head:
+            patterns.append((i, i + step, i + 2 * step))
+        if left > head and right > head and abs(left - right) < threshold * head:
+            inverted_patterns.append((i, i + step, i + 2 * step))
+    return patterns, inverted_patterns
+
+
+def baseline_rsi(close: pd.Series, window: int) -> pd.Series:
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+    return 100 - (100 / (1 + gain / loss))
+
+
+def baseline_pattern_found(index: int, pattern_list, window_extremum: int, step: int) -> bool:
+    return any(
+        (index + offset - step, index + offset, index + offset + step) in pattern_list
+        for offset in range(window_extremum + 1)
+    )
+
+
+class BaselineTrade:
+    """TradeExecutor з baseline utils.py без друку."""
+
+    def __init__(self, cost: float, direction: str, params: StrategyParams):
+        self.entry_price = cost
+        self.direction = direction
+        self.params = params
+        self.trailing_stop_loss = None
+        self.max_roi = 0
+        self.state = 'normal'
+
+    def roi(self, price: float) -> float:
+        if self.direction == 'long':
+            return (price - self.entry_price) / self.entry_price * 100
+        return (self.entry_price - price) / self.entry_price * 100
+
+    def update_state(self, price, rsi, long_ema, short_ema):
+        p = self.params
+        if self.direction == 'long':
+            if rsi > p.rsi_for_decrease_trailing_percent_on_long and price < short_ema:
+                self.state = 'decreased'
+            elif (p.rsi_for_decrease_trailing_percent_on_long > rsi > p.rsi_for_increase_trailing_percent_on_long
+                  and price > short_ema and price > long_ema):
+                self.state = 'increased'
+            else:
+                self.state = 'normal'
+        else:
+            if rsi < p.rsi_for_decrease_trailing_percent_on_short and price > short_ema:
+                self.state = 'decreased'
+            elif (p.rsi_for_decrease_trailing_percent_on_short < rsi < p.rsi_for_increase_trailing_percent_on_short
+                  and price < short_ema and price < long_ema):
+                self.state = 'increased'
+            else:
+                self.state = 'normal'
+
+    def update_trailing_stop_loss(self, roi, price, rsi, long_ema, short_ema):
+        p = self.params
+        self.update_state(price, rsi, long_ema, short_ema)
+        self.max_roi = max(self.max_roi, roi)
+        percent = p.trailing_stop_loss_percent
+        if self.state == 'increased':
+            percent *= 1 + p.trailing_stop_loss_percent_for_positive_filter / 100
+        if self.state == 'decreased':
+            percent *= 1 - p.trailing_stop_loss_percent_for_negative_filter / 100
+        trailing_percent = max(self.max_roi * (100 - percent) / 100, p.minimum_trailing_stop_loss_percent)
+        if self.direction == 'long':
+            self.trailing_stop_loss = self.entry_price * (1 + trailing_percent / 100)
+        else:
+            self.trailing_stop_loss = self.entry_price * (1 - trailing_percent / 100)
+
+
+def baseline_backtest(frame: pd.DataFrame, params: StrategyParams):
+    """MarketAnalyzer.analyze з baseline utils.py: рівні, патерни й свічки перебираються в лоб."""
+    # Колонки як масиви замість .iloc - ті самі значення, але без накладних витрат pandas на кожну свічку
+    close, rsi, long_ema, short_ema = (frame[name].to_numpy() for name in ('Close', 'RSI', 'LONG_EMA', 'SHORT_EMA'))
+    support, resistance = baseline_levels(close, params.window_extremum)
+    patterns, inverted_patterns = (
+        set(found) for found in baseline_patterns(
+            close, params.head_and_shoulders_threshold, params.step_for_head_and_shoulders
+        )
+    )
+    levels = sorted([(*s, 'sup') for s in support] + [(*r, 'res') for r in resistance])
+    balance, stake_multiplier, transactions = params.initial_balance, params.stake_multiplier_start, []
+    for index, _, level_type in levels:
+        pattern_list = inverted_patterns if level_type == 'sup' else patterns
+        if not baseline_pattern_found(index, pattern_list, params.window_extremum, params.step_for_head_and_shoulders):
+            continue
+        end = index + params.window_extremum
+        if end >= len(frame):
+            continue
+        cost = future_price = close[end]
+        future_index = end
+        stake = balance * params.percent_of_balance_for_bet / 100 * stake_multiplier
+        direction = 'long' if level_type == 'sup' else 'short'
+        if direction == 'long':
+            stop_loss = cost * (1 - params.percent_stop_loss / 100)
+            take_profit = cost * (1 + params.percent_take_profit / 100)
+        else:
+            stop_loss = cost * (1 + params.percent_stop_loss / 100)
+            take_profit = cost * (1 - params.percent_take_profit / 100)
+        trade = BaselineTrade(cost, direction, params)
+        for future_index in range(end + 1, len(frame)):
+            future_price = close[future_index]
+            roi = trade.roi(future_price)
+            indicators = (rsi[future_index], long_ema[future_index], short_ema[future_index])
+            if trade.trailing_stop_loss is not None:
+                hit = (future_price <= trade.trailing_stop_loss if direction == 'long'
+                       else future_price >= trade.trailing_stop_loss)
+                if hit:
+                    profit_or_loss = stake * roi / 100
+                    break
+            else:
+                if future_price <= stop_loss if direction == 'long' else future_price >= stop_loss:
+                    profit_or_loss = -stake * params.percent_stop_loss / 100
+                    break
+                elif future_price >= take_profit if direction == 'long' else future_price <= take_profit:
+                    trade.update_trailing_stop_loss(roi, future_price, *indicators)
+            if trade.trailing_stop_loss is not None:
+                trade.update_trailing_stop_loss(roi, future_price, *indicators)
+        else:
+            roi = trade.roi(future_price)
+            if direction == 'long':
+                profit_or_loss = stake * (future_price - cost) / cost
+            else:
+                profit_or_loss = stake * (cost - future_price) / cost
+        profit_or_loss -= stake / 100
+        balance += profit_or_loss
+        stake_multiplier = 1.0
+        transactions.append([(end, cost), (future_index, future_price, profit_or_loss, roi)])
+    return transactions, balance
+
+
+@pytest.mark.parametrize('window', [3, 5, 20])
+def test_level_detectors_match_argrelextrema(data, window):
+    close = data['Close'].to_numpy()
+    expected = baseline_levels(close, window)
+    assert calculate_support_resistance(data, window) == expected
+    assert support_resistance_pyramid(close, (3, 5, 20)).levels(window) == expected
+    streamed = list(stream_support_resistance(close.tolist(), window))
+    assert sorted((index, level) for kind, index, level in streamed if kind == 'sup') == expected[0]
+    assert sorted((index, level) for kind, index, level in streamed if kind == 'res') == expected[1]
+
+
+@pytest.mark.parametrize('step', [1, 2])
+def test_vectorized_patterns_match_loop(data, step):
+    prices = data['Close'].to_numpy()
+    assert detect_all_head_and_shoulders(prices, 0.01, step) == baseline_patterns(prices, 0.01, step)
+
+
+def test_pattern_index_matches_list_scan(data):
+    params = DEFAULT_PARAMS
+    close = data['Close'].to_numpy()
+    support, resistance = baseline_levels(close, params.window_extremum)
+    patterns, _ = detect_all_head_and_shoulders(close, 0.01, params.step_for_head_and_shoulders)
+    checker = PatternChecker(params.window_extremum, params.step_for_head_and_shoulders)
+    index = checker.build_index(patterns)
+    level_indices = [level[0] for level in support + resistance]
+    expected = [
+        baseline_pattern_found(level, patterns, params.window_extremum, params.step_for_head_and_shoulders)
+        for level in level_indices
+    ]
+    assert [checker.is_pattern_found(level, index) for level in level_indices] == expected
+    assert checker.find_levels_with_pattern(level_indices, index).tolist() == expected
+
+
+def test_incremental_indicators_match_pandas(data):
+    params = DEFAULT_PARAMS
+    close = data['Close']
+    expected = {
+        'RSI': baseline_rsi(close, params.window_rsi),
+        'SHORT_EMA': close.ewm(span=params.ema_short_period, adjust=False).mean(),
+        'LONG_EMA': close.ewm(span=params.ema_long_period, adjust=False).mean(),
+    }
+    actual = IndicatorSet.from_params(params).update_batch(close.to_numpy())
+    for name, values in expected.items():
+        np.testing.assert_array_equal(actual[name], values.to_numpy())
+
+
+@pytest.mark.parametrize('params', [
+    DEFAULT_PARAMS,
+    StrategyParams(window_extremum=5, step_for_head_and_shoulders=2, percent_take_profit=3, percent_stop_loss=4),
+])
+def test_simulation_matches_baseline_analyzer(data, params):
+    frame, support, resistance, patterns, inverted_patterns = prepare_signals(data, params)
+    market_analyzer = MarketAnalyzer(
+        support, resistance, patterns, inverted_patterns, params.window_extremum,
+        params.step_for_head_and_shoulders, frame, params, NULL_JOURNAL
+    )
+    market_analyzer.analyze()
+    expected_transactions, expected_balance = baseline_backtest(frame, params)
+    assert len(expected_transactions) > 10
+    assert [list(transaction) for transaction in market_analyzer.transactions] == expected_transactions
+    assert market_analyzer.balance == expected_balance
+
+
+class ListExchange:
+    """Біржа зі списку свічок: як справжня, віддає limit останніх свічок або свічки від since."""
+
+    id = 'list'
+
+    def __init__(self, candles):
+        self.candles = [list(candle) for candle in candles]
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params=None):
+        if since is None:
+            return self.candles[-limit:]
+        return [candle for candle in self.candles if candle[0] >= since][:limit]
+
+
+def test_store_refresh_overwrites_the_last_unclosed_candle(tmp_path):
+    duration = parse_timeframe('1h')
+    start = (int(time.time() * 1000) // duration - 300) * duration
+    candles = generate_ohlcv(200, seed=SEED, start_timestamp=start, interval_ms=duration).to_numpy()
+    exchange = ListExchange(candles[:120])
+    # Остання свічка ще формується: close і volume на біржі потім зміняться
+    exchange.candles[-1][4:] = [candles[119, 4] * 0.99, candles[119, 5] / 2]
+    store = CandleStore(str(tmp_path))
+    store.refresh(exchange, SYMBOL, '1h', 200)
+
+    exchange.candles = candles.tolist()
+    store.refresh(exchange, SYMBOL, '1h', 50)
+
+    # Те саме, що повністю завантажити свічки заново
+    np.testing.assert_array_equal(store.load(exchange.id, SYMBOL, '1h'), candles)
+
+
+def pandas_resample(candles: np.ndarray, timeframe: str) -> np.ndarray:
+    frame = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    frame.index = pd.to_datetime(frame['timestamp'], unit='ms')
+    rule = f'{parse_timeframe(timeframe) // 60_000}min'
+    resampled = frame.resample(rule).agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    ).dropna(subset=['open'])
+    timestamps = resampled.index.as_unit('ms').asi8.astype(float)
+    return np.column_stack((timestamps, resampled.to_numpy()))
+
+
+@pytest.mark.parametrize('timeframe', ['15m', '1h', '4h'])
+def test_resampling_matches_pandas(tmp_path, timeframe):
+    candles = generate_ohlcv(3000, seed=SEED, start_timestamp=1_600_000_000_000).to_numpy()
+    # Пропуски в базових свічках, як після простою біржі
+    candles = np.delete(candles, np.s_[700:760], axis=0)
+    expected = pandas_resample(candles, timeframe)
+    actual = resample_ohlcv(candles, timeframe)
+    np.testing.assert_array_equal(actual[:, :5], expected[:, :5])
+    np.testing.assert_allclose(actual[:, 5], expected[:, 5], rtol=1e-12)
+
+    # Інкрементальне оновлення похідного ряду дає те саме, що агрегування всієї історії
+    store = CandleStore(str(tmp_path))
+    for chunk in np.array_split(candles, 4):
+        store.write('bingx', SYMBOL, '1m', chunk)
+        update_resampled(store, 'bingx', SYMBOL, timeframe, '1m')
+    np.testing.assert_array_equal(store.load('bingx', SYMBOL, derived_timeframe(timeframe, '1m')), actual)
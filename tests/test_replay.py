@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from ccxt import ExchangeError
+
+import ccxt_utils
+from bench_utils import generate_ohlcv
+from config import SYNC_EXCHANGE_ID
+from replay_utils import ReplayExchange, replay_factories
+from storage_utils import CandleStore
+
+SYMBOL = 'BTC-USDT'
+TIMEFRAME = '1h'
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.write(SYNC_EXCHANGE_ID, SYMBOL, TIMEFRAME, generate_ohlcv(500, seed=4, interval_ms=3_600_000).to_numpy())
+    return store
+
+
+def failures(exchanges) -> list:
+    pattern = []
+    for exchange in exchanges:
+        try:
+            exchange.fetch_ohlcv(SYMBOL, TIMEFRAME, limit=10)
+            pattern.append(False)
+        except ExchangeError:
+            pattern.append(True)
+    return pattern
+
+
+def test_clients_from_factories_share_one_fault_sequence(store):
+    create_sync, _ = replay_factories(store.root, error_rate=0.5, seed=3)
+    # Клієнт на кожен запит, як у get_ohlcv_sync, має продовжувати послідовність, а не починати її знову
+    fresh_clients = failures(create_sync() for _ in range(40))
+    single_client = failures([ReplayExchange(SYNC_EXCHANGE_ID, store, error_rate=0.5, seed=3)] * 40)
+    assert fresh_clients == single_client
+    assert any(fresh_clients) and not all(fresh_clients)
+
+
+def test_sync_fetch_retries_injected_faults(store, monkeypatch):
+    monkeypatch.setattr(ccxt_utils, 'backoff_delay', lambda attempt: 0.0)
+    exchange = ReplayExchange(SYNC_EXCHANGE_ID, store, error_rate=0.3, seed=1)
+    pages = list(ccxt_utils.iter_ohlcv_history(exchange, SYMBOL, TIMEFRAME, 0, page_limit=50))
+    np.testing.assert_array_equal(np.concatenate(pages), store.load(SYNC_EXCHANGE_ID, SYMBOL, TIMEFRAME))
+    assert exchange.errors > 0
@@ -0,0 +1,38 @@
+import time
+
+import numpy as np
+
+from bench_utils import generate_ohlcv
+from replay_utils import ReplayExchange
+from resample_utils import derived_timeframe, get_resampled_frame, parse_timeframe, resample_ohlcv
+from storage_utils import CandleStore
+
+SYMBOL = 'BTC-USDT'
+
+
+def recent_candles(size: int, timeframe: str) -> np.ndarray:
+    """Свічки, остання з яких закрилася щойно, - щоб холодний старт завантажив їх з біржі."""
+    duration = parse_timeframe(timeframe)
+    start = (int(time.time() * 1000) // duration - size) * duration
+    return generate_ohlcv(size, seed=11, start_timestamp=start, interval_ms=duration).to_numpy()
+
+
+def test_cold_start_resampled_load_respects_limit_and_since(tmp_path):
+    source = CandleStore(str(tmp_path / 'source'))
+    base = recent_candles(4000, '15m')
+    source.write('bingx', SYMBOL, '15m', base)
+    expected = resample_ohlcv(base, '1h')
+
+    latest = get_resampled_frame(
+        SYMBOL, '1h', 100, '15m', store=CandleStore(str(tmp_path / 'latest')), exchange=ReplayExchange('bingx', source)
+    )
+    np.testing.assert_array_equal(latest.to_numpy(), expected[-100:])
+
+    # since старший за вікно limit: історія довантажується від since, а повертається все від since
+    since = expected[-300, 0]
+    store = CandleStore(str(tmp_path / 'since'))
+    frame = get_resampled_frame(
+        SYMBOL, '1h', 100, '15m', store=store, exchange=ReplayExchange('bingx', source), since=since
+    )
+    np.testing.assert_array_equal(frame.to_numpy(), expected[-300:])
+    assert store.count('bingx', SYMBOL, derived_timeframe('1h', '15m')) >= 300
@@ -0,0 +1,21 @@
+import dataclasses
+
+from backtest_utils import run_backtest, summarize_backtest
+from bench_utils import generate_ohlcv
+from config import DEFAULT_PARAMS
+from journal_utils import NULL_JOURNAL
+from trailing_utils import run_trailing_sweep
+
+
+def test_trailing_sweep_matches_backtest_summary_exactly():
+    data = generate_ohlcv(8000, seed=9)
+    grid = [
+        dataclasses.replace(DEFAULT_PARAMS, percent_stop_loss=stop_loss, percent_take_profit=take_profit)
+        for stop_loss, take_profit in ((1, 2), (2, 4), (3, 6))
+    ]
+    table = run_trailing_sweep(data, grid).set_index(['percent_stop_loss', 'percent_take_profit'])
+    for params in grid:
+        expected = summarize_backtest(run_backtest(data, params, NULL_JOURNAL))
+        row = table.loc[(params.percent_stop_loss, params.percent_take_profit)]
+        for name, value in expected.items():
+            assert row[name] == value, name
@@ -0,0 +1,262 @@
+from dataclasses import asdict
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest_utils import Entry, find_entries
+from config import StrategyParams
+from utils import EXIT_REASON_CODES, STATE_CODES, ExitReason, StateTrailingStopLoss
+
+# Параметри, від яких залежать входи: у всіх конфігурацій одного прогону вони мають збігатися
+SIGNAL_FIELDS = ('window_extremum', 'step_for_head_and_shoulders', 'head_and_shoulders_threshold', 'window_rsi',
+                 'ema_short_period', 'ema_long_period')
+# Параметри, які впливають лише на вихід з угоди і симулюються пакетно
+TRADE_FIELDS = ('percent_stop_loss', 'percent_take_profit', 'trailing_stop_loss_percent',
+                'trailing_stop_loss_percent_for_positive_filter', 'trailing_stop_loss_percent_for_negative_filter',
+                'rsi_for_increase_trailing_percent_on_long', 'rsi_for_decrease_trailing_percent_on_long',
+                'rsi_for_increase_trailing_percent_on_short', 'rsi_for_decrease_trailing_percent_on_short')
+
+STOP_LOSS = EXIT_REASON_CODES[ExitReason.stop_loss]
+TRAILING_STOP_LOSS = EXIT_REASON_CODES[ExitReason.trailing_stop_loss]
+END_OF_DATA = EXIT_REASON_CODES[ExitReason.end_of_data]
+NORMAL = STATE_CODES[StateTrailingStopLoss.normal]
+INCREASED = STATE_CODES[StateTrailingStopLoss.increased]
+DECREASED = STATE_CODES[StateTrailingStopLoss.decreased]
+
+# Обмеження на розмір матриці (конфігурації x свічки) при пошуку першого перетину
+MAX_CROSSING_CELLS = 1 << 22
+
+
+def params_matrix(params_list: Sequence[StrategyParams]) -> Dict[str, np.ndarray]:
+    """Колонки TRADE_FIELDS для списку конфігурацій: {назва параметра: масив довжиною K}."""
+    return {name: np.array([getattr(params, name) for params in params_list], dtype=float) for name in TRADE_FIELDS}
+
+
+def first_crossing_batch(
+    close: np.ndarray,
+    start: int,
+    direction: str,
+    stop_loss: np.ndarray,
+    take_profit: np.ndarray,
+    chunk_size: int = 256
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Пакетний find_first_crossing: для кожної пари (stop_loss[k], take_profit[k]) перший індекс >= start,
+    де ціна перетнула один з рівнів. Повертає (індекси, де -1 - перетину немає; чи це стоп-лос).
+    """
+    index = np.full(len(stop_loss), -1, dtype=np.int64)
+    is_stop_loss = np.zeros(len(stop_loss), dtype=bool)
+    pending = np.arange(len(stop_loss))
+    begin = start
+    while pending.size and begin < len(close):
+        end = min(begin + chunk_size, len(close))
+        prices = close[begin:end]
+        if direction == 'long':
+            stop_loss_hits = prices <= stop_loss[pending, None]
+            take_profit_hits = prices >= take_profit[pending, None]
+        else:
+            stop_loss_hits = prices >= stop_loss[pending, None]
+            take_profit_hits = prices <= take_profit[pending, None]
+        hits = stop_loss_hits | take_profit_hits
+        found = hits.any(axis=1)
+        rows = np.flatnonzero(found)
+        offsets = hits[rows].argmax(axis=1)
+        index[pending[rows]] = begin + offsets
+        is_stop_loss[pending[rows]] = stop_loss_hits[rows, offsets]
+        pending = pending[~found]
+        begin = end
+        chunk_size = min(chunk_size * 2, max(MAX_CROSSING_CELLS // max(pending.size, 1), 256))
+    return index, is_stop_loss
+
+
+def _trail_batch(
+    close: np.ndarray,
+    rsi: np.ndarray,
+    long_ema: np.ndarray,
+    short_ema: np.ndarray,
+    cost: float,
+    direction: str,
+    matrix: Dict[str, np.ndarray],
+    take_profit_index: np.ndarray,
+    exit_index: np.ndarray,
+    exit_reason: np.ndarray
+):
+    """
+    Фаза трейлінг стоп-лосса для конфігурацій, що дійшли до тейк-профіту на take_profit_index.
+
+    Стан TradeExecutor (max_roi, trailing_stop_loss, StateTrailingStopLoss) кожної конфігурації
+    тримається в масивах і оновлюється для всіх активних конфігурацій разом на кожній свічці,
+    тими самими операціями, що й TradeExecutor.update_trailing_stop_loss.
+    exit_index та exit_reason заповнюються на місці.
+    """
+    trailing_percent = matrix['trailing_stop_loss_percent']
+    minimum_percent = matrix['percent_take_profit'] * (100 - trailing_percent) / 100
+    positive_factor = 1 + matrix['trailing_stop_loss_percent_for_positive_filter'] / 100
+    negative_factor = 1 - matrix['trailing_stop_loss_percent_for_negative_filter'] / 100
+    if direction == 'long':
+        increase_rsi = matrix['rsi_for_increase_trailing_percent_on_long']
+        decrease_rsi = matrix['rsi_for_decrease_trailing_percent_on_long']
+    else:
+        increase_rsi = matrix['rsi_for_increase_trailing_percent_on_short']
+        decrease_rsi = matrix['rsi_for_decrease_trailing_percent_on_short']
+
+    max_roi = np.zeros(len(take_profit_index))
+    trailing_stop_loss = np.full(len(take_profit_index), np.nan)
+    state = np.full(len(take_profit_index), NORMAL, dtype=np.int8)
+    active = np.flatnonzero(take_profit_index >= 0)
+    for index in range(int(take_profit_index[active].min()) if active.size else len(close), len(close)):
+        lanes = active[take_profit_index[active] <= index]
+        if not lanes.size:
+            continue
+        price = close[index]
+        # Конфігурації, що вже у фазі трейлінгу, спершу перевіряють стоп
+        waiting = take_profit_index[lanes] < index
+        if direction == 'long':
+            hit = waiting & (price <= trailing_stop_loss[lanes])
+        else:
+            hit = waiting & (price >= trailing_stop_loss[lanes])
+        if hit.any():
+            exit_index[lanes[hit]] = index
+            exit_reason[lanes[hit]] = TRAILING_STOP_LOSS
+            active = np.setdiff1d(active, lanes[hit], assume_unique=True)
+            lanes = lanes[~hit]
+            if not active.size:
+                break
+
+        if direction == 'long':
+            roi = (price - cost) / cost * 100
+            decreased = (rsi[index] > decrease_rsi[lanes]) & (price < short_ema[index])
+            increased = (decrease_rsi[lanes] > rsi[index]) & (rsi[index] > increase_rsi[lanes]) & (
+                price > short_ema[index]) & (price > long_ema[index])
+        else:
+            roi = (cost - price) / cost * 100
+            decreased = (rsi[index] < decrease_rsi[lanes]) & (price > short_ema[index])
+            increased = (decrease_rsi[lanes] < rsi[index]) & (rsi[index] < increase_rsi[lanes]) & (
+                price < short_ema[index]) & (price < long_ema[index])
+        state[lanes] = np.where(decreased, DECREASED, np.where(increased, INCREASED, NORMAL))
+        max_roi[lanes] = np.maximum(max_roi[lanes], roi)
+
+        diff_percent = trailing_percent[lanes]
+        diff_percent = np.where(state[lanes] == INCREASED, diff_percent * positive_factor[lanes], diff_percent)
+        diff_percent = np.where(state[lanes] == DECREASED, diff_percent * negative_factor[lanes], diff_percent)
+        stop_percent = np.maximum(max_roi[lanes] * (100 - diff_percent) / 100, minimum_percent[lanes])
+        if direction == 'long':
+            trailing_stop_loss[lanes] = cost * (1 + stop_percent / 100)
+        else:
+            trailing_stop_loss[lanes] = cost * (1 - stop_percent / 100)
+
+
+def simulate_trade_batch(
+    close: np.ndarray,
+    rsi: np.ndarray,
+    long_ema: np.ndarray,
+    short_ema: np.ndarray,
+    entry_index: int,
+    direction: str,
+    matrix: Dict[str, np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    simulate_trade для всіх конфігурацій з matrix (див. params_matrix) за один прохід.
+
+    Повертає (індекс закриття, ROI, код причини закриття з EXIT_REASON_CODES) - масиви довжиною K.
+    """
+    count = len(matrix['percent_stop_loss'])
+    cost = close[entry_index]
+    if direction == 'long':
+        stop_loss = cost * (1 - matrix['percent_stop_loss'] / 100)
+        take_profit = cost * (1 + matrix['percent_take_profit'] / 100)
+    else:
+        stop_loss = cost * (1 + matrix['percent_stop_loss'] / 100)
+        take_profit = cost * (1 - matrix['percent_take_profit'] / 100)
+
+    exit_index = np.full(count, len(close) - 1, dtype=np.int64)
+    exit_reason = np.full(count, END_OF_DATA, dtype=np.int8)
+    crossing_index, is_stop_loss = first_crossing_batch(close, entry_index + 1, direction, stop_loss, take_profit)
+    stopped = (crossing_index >= 0) & is_stop_loss
+    exit_index[stopped] = crossing_index[stopped]
+    exit_reason[stopped] = STOP_LOSS
+
+    take_profit_index = np.where((crossing_index >= 0) & ~is_stop_loss, crossing_index, -1)
+    _trail_batch(close, rsi, long_ema, short_ema, cost, direction, matrix, take_profit_index, exit_index, exit_reason)
+
+    exit_index = np.maximum(exit_index, entry_index)
+    exit_price = close[exit_index]
+    roi = (exit_price - cost) / cost * 100 if direction == 'long' else (cost - exit_price) / cost * 100
+    return exit_index, roi, exit_reason
+
+
+def simulate_trades_batch(
+    close: np.ndarray,
+    rsi: np.ndarray,
+    long_ema: np.ndarray,
+    short_ema: np.ndarray,
+    entries: Sequence[Entry],
+    matrix: Dict[str, np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """simulate_trade_batch для кожного входу; результати - масиви форми (угоди, конфігурації)."""
+    count = len(matrix['percent_stop_loss'])
+    exit_index = np.empty((len(entries), count), dtype=np.int64)
+    roi = np.empty((len(entries), count))
+    exit_reason = np.empty((len(entries), count), dtype=np.int8)
+    for row, (entry_index, direction) in enumerate(entries):
+        exit_index[row], roi[row], exit_reason[row] = simulate_trade_batch(
+            close, rsi, long_ema, short_ema, entry_index, direction, matrix
+        )
+    return exit_index, roi, exit_reason
+
+
+def run_trailing_sweep(data: pd.DataFrame, params_list: Sequence[StrategyParams]) -> pd.DataFrame:
+    """
+    Аналог run_sweep для параметрів виходу з угоди (TRADE_FIELDS) без окремого бектесту на кожну конфігурацію.
+
+    Входи рахуються один раз, тому параметри SIGNAL_FIELDS у всіх конфігурацій мають збігатися.
+    Баланс кожної конфігурації рахується так само, як у MarketAnalyzer (послідовно, з комісією).
+    Повертає таблицю в тому ж форматі, що й run_sweep.
+    """
+    params_list = list(params_list)
+    base = params_list[0]
+    for params in params_list:
+        different = [name for name in SIGNAL_FIELDS if getattr(params, name) != getattr(base, name)]
+        if different:
+            raise ValueError(f'Параметри сигналів мають бути однаковими для всіх конфігурацій: {different}')
+
+    frame, entries = find_entries(data, base)
+    close = frame['Close'].to_numpy(dtype=float)
+    rsi, long_ema, short_ema = (frame[name].to_numpy(dtype=float) for name in ('RSI', 'LONG_EMA', 'SHORT_EMA'))
+    matrix = params_matrix(params_list)
+    exit_index, roi, exit_reason = simulate_trades_batch(close, rsi, long_ema, short_ema, entries, matrix)
+
+    initial_balance = np.array([params.initial_balance for params in params_list], dtype=float)
+    stake_multiplier = np.array([params.stake_multiplier_start for params in params_list], dtype=float)
+    percent_of_balance = np.array([params.percent_of_balance_for_bet for params in params_list], dtype=float)
+    balance = initial_balance.copy()
+    for row, (entry_index, direction) in enumerate(entries):
+        cost = close[entry_index]
+        exit_price = close[exit_index[row]]
+        stake_amount = balance * percent_of_balance / 100 * stake_multiplier
+        if direction == 'long':
+            closed = stake_amount * (exit_price - cost) / cost
+        else:
+            closed = stake_amount * (cost - exit_price) / cost
+        profit_or_loss = np.where(
+            exit_reason[row] == STOP_LOSS, -stake_amount * matrix['percent_stop_loss'] / 100,
+            np.where(exit_reason[row] == TRAILING_STOP_LOSS, stake_amount * roi[row] / 100, closed)
+        )
+        balance += profit_or_loss - stake_amount / 100
+        stake_multiplier = np.ones_like(stake_multiplier)
+
+    results: List[Dict] = []
+    for column, params in enumerate(params_list):
+        # Суцільна копія колонки: numpy підсумовує її так само, як TradeRecords.stats() у run_sweep
+        rois = np.ascontiguousarray(roi[:, column])
+        results.append({
+            **asdict(params),
+            'final_balance': float(balance[column]),
+            'trades': len(rois),
+            'wins': int((rois > 0).sum()),
+            'losses': int((rois < 0).sum()),
+            'roi_sum': float(rois.sum()),
+        })
+    table = pd.DataFrame(results)
+    return table.sort_values(['final_balance', 'wins', 'roi_sum'], ascending=False).reset_index(drop=True)
@@ -1,17 +1,22 @@
+import bisect
 from enum import Enum
-from typing import List, Tuple
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
 import pandas as pd
 
-from config import INITIAL_BALANCE, STAKE_MULTIPLIER_START, PERCENT_OF_BALANCE_FOR_BET, PERCENT_TAKE_PROFIT, \
-    PERCENT_STOP_LOSS, TRAILING_STOP_LOSS_PERCENT, TRAILING_STOP_LOSS_PERCENT_FOR_POSITIVE_FILTER, \
-    TRAILING_STOP_LOSS_PERCENT_FOR_NEGATIVE_FILTER, RSI_FOR_INCREASE_TRAILING_PERCENT_ON_LONG, \
-    RSI_FOR_CLOSING_LONG, RSI_FOR_CLOSING_SHORT, RSI_FOR_DECREASE_TRAILING_PERCENT_ON_LONG, \
-    RSI_FOR_DECREASE_TRAILING_PERCENT_ON_SHORT, RSI_FOR_INCREASE_TRAILING_PERCENT_ON_SHORT
+from cache_utils import fingerprint
+from checkpoint_utils import PENDING_TRADE_DTYPE, AnalyzerSnapshot, signal_start
+from config import DEFAULT_PARAMS, StrategyParams
+from indicator_utils import IndicatorSet
+from journal_utils import DIRECTIONS, NULL_JOURNAL, EventKind, EventLevel, TradeJournal
+from profile_utils import get_profiler
+from records_utils import TradeRecords
 
 Level = Tuple[int, float, str]
 Pattern = Tuple[int, int, int]
 
-MINIMUM_TRAILING_STOP_LOSS_PERCENT = PERCENT_TAKE_PROFIT * (100 - TRAILING_STOP_LOSS_PERCENT) / 100
+MINIMUM_TRAILING_STOP_LOSS_PERCENT = DEFAULT_PARAMS.minimum_trailing_stop_loss_percent
 
 
 class StateTrailingStopLoss(Enum):
@@ -20,32 +25,79 @@ class StateTrailingStopLoss(Enum):
     decreased = 'decreased'
 
 
+class ExitReason(Enum):
+    stop_loss = 'stop_loss'
+    trailing_stop_loss = 'trailing_stop_loss'
+    end_of_data = 'end_of_data'
+
+
+# Коди станів і причин закриття для записів TradeJournal
+STATE_CODES = {state: code for code, state in enumerate(StateTrailingStopLoss)}
+EXIT_REASON_CODES = {reason: code for code, reason in enumerate(ExitReason)}
+
+
+class PatternIndex:
+    """
+    Індекс патернів "Голова та плечі" у вигляді бітової карти за індексом голови.
+
+    Містить лише патерни з кроком PatternChecker, адже тільки вони можуть збігтися
+    з кортежем, який перевіряє is_pattern_found. Префіксні суми дозволяють відповісти,
+    чи є голова у вікні [index, index + width], за O(1) і векторно для багатьох вікон.
+    """
+
+    def __init__(self, pattern_list: List[Pattern], step_for_head_and_shoulders: int):
+        heads = [
+            head for left, head, right in pattern_list
+            if head - left == step_for_head_and_shoulders and right - head == step_for_head_and_shoulders
+        ]
+        self.heads = np.zeros(max(heads) + 1 if heads else 0, dtype=bool)
+        self.heads[heads] = True
+        self._cumulative = np.concatenate(([0], np.cumsum(self.heads)))
+
+    def __contains__(self, head: int) -> bool:
+        return 0 <= head < len(self.heads) and bool(self.heads[head])
+
+    def count_in_window(self, starts, width: int) -> np.ndarray:
+        """Кількість голів у вікнах [start, start + width] для кожного start."""
+        starts = np.asarray(starts, dtype=np.int64)
+        size = len(self.heads)
+        upper = np.clip(starts + width + 1, 0, size)
+        lower = np.clip(starts, 0, size)
+        return self._cumulative[upper] - self._cumulative[lower]
+
+
 class PatternChecker:
     def __init__(self, window_extremum: int, step_for_head_and_shoulders: int):
         self.window_extremum = window_extremum
         self.step_for_head_and_shoulders = step_for_head_and_shoulders
 
-    def is_pattern_found(self, index: int, pattern_list: List[Pattern]) -> bool:
-        for offset in range(self.window_extremum + 1):
-            extremum_index = index + offset
-            pattern_to_check = (
-                extremum_index - self.step_for_head_and_shoulders,
-                extremum_index,
-                extremum_index + self.step_for_head_and_shoulders
-            )
-            if pattern_to_check in pattern_list:
-                return True
-        return False
+    def build_index(self, pattern_list: List[Pattern]) -> PatternIndex:
+        return PatternIndex(pattern_list, self.step_for_head_and_shoulders)
+
+    def _as_index(self, patterns: Union[List[Pattern], PatternIndex]) -> PatternIndex:
+        return patterns if isinstance(patterns, PatternIndex) else self.build_index(patterns)
+
+    def is_pattern_found(self, index: int, patterns: Union[List[Pattern], PatternIndex]) -> bool:
+        """Перевіряє, чи є патерн з головою в межах вікна екстремуму [index, index + window_extremum]."""
+        return bool(self._as_index(patterns).count_in_window([index], self.window_extremum)[0])
+
+    def find_levels_with_pattern(self, level_indices, patterns: Union[List[Pattern], PatternIndex]) -> np.ndarray:
+        """Векторна версія is_pattern_found для всіх рівнів одразу."""
+        return self._as_index(patterns).count_in_window(level_indices, self.window_extremum) > 0
 
 
 class TradeExecutor:
-    def __init__(self, stake_amount, cost, direction):
+    def __init__(self, stake_amount, cost, direction, params: StrategyParams = DEFAULT_PARAMS,
+                 journal: TradeJournal = NULL_JOURNAL, entry_index: int = -1):
+        self.params = params
+        self.journal = journal
+        self.entry_index = entry_index
         self.stake_amount = stake_amount
         self.entry_price = cost
         self.direction = direction
         self.trailing_stop_loss = None
         self.max_roi = 0
-        self.trailing_stop_loss_percent = TRAILING_STOP_LOSS_PERCENT
+        self.trailing_stop_loss_percent = params.trailing_stop_loss_percent
         self.state_trailing_stop_loss = StateTrailingStopLoss.normal
 
     def calculate_roi(self, current_price):
@@ -55,71 +107,74 @@ class TradeExecutor:
         elif self.direction == 'short':
             return (self.entry_price - current_price) / self.entry_price * 100
 
-    def update_trailing_stop_loss(self, roi, price, rsi, long_ema, short_ema):
+    def update_trailing_stop_loss(self, roi, price, rsi, long_ema, short_ema, index: int = -1):
         """Оновлення трейлінг стоп-лосса."""
-        self.update_state_trailing_stop_loss(price, rsi, long_ema, short_ema)
+        self.update_state_trailing_stop_loss(price, rsi, long_ema, short_ema, index)
         self.max_roi = max(self.max_roi, roi)
 
         diff_trailing_stop_loss_percent = self.trailing_stop_loss_percent
         if self.state_trailing_stop_loss == StateTrailingStopLoss.increased:
-            diff_trailing_stop_loss_percent *= 1 + TRAILING_STOP_LOSS_PERCENT_FOR_POSITIVE_FILTER / 100
+            diff_trailing_stop_loss_percent *= 1 + self.params.trailing_stop_loss_percent_for_positive_filter / 100
         if self.state_trailing_stop_loss == StateTrailingStopLoss.decreased:
-            diff_trailing_stop_loss_percent *= 1 - TRAILING_STOP_LOSS_PERCENT_FOR_NEGATIVE_FILTER / 100
+            diff_trailing_stop_loss_percent *= 1 - self.params.trailing_stop_loss_percent_for_negative_filter / 100
 
         trailing_stop_loss_percent = max(
             # self.max_roi * (100 - TRAILING_STOP_LOSS_PERCENT) / 100,
             self.max_roi * (100 - diff_trailing_stop_loss_percent) / 100,
-            MINIMUM_TRAILING_STOP_LOSS_PERCENT
+            self.params.minimum_trailing_stop_loss_percent
         )
         if self.direction == 'long':
             self.trailing_stop_loss = self.entry_price * (1 + trailing_stop_loss_percent / 100)
         elif self.direction == 'short':
             self.trailing_stop_loss = self.entry_price * (1 - trailing_stop_loss_percent / 100)
-        print(self.max_roi, self.trailing_stop_loss_percent, diff_trailing_stop_loss_percent,
-        # print(self.max_roi, self.trailing_stop_loss_percent, TRAILING_STOP_LOSS_PERCENT,
-              trailing_stop_loss_percent, self.trailing_stop_loss)
+        if self.journal.enabled:
+            self.journal.record(
+                EventKind.trailing_update, EventLevel.debug, index, self.entry_index, self.direction,
+                price=price, roi=self.max_roi, stop=self.trailing_stop_loss, aux=trailing_stop_loss_percent
+            )
 
-    def update_state_trailing_stop_loss(self, price, rsi, long_ema, short_ema):
+    def update_state_trailing_stop_loss(self, price, rsi, long_ema, short_ema, index: int = -1):
+        params = self.params
         if self.direction == 'long':
             if (
-                rsi > RSI_FOR_DECREASE_TRAILING_PERCENT_ON_LONG
+                rsi > params.rsi_for_decrease_trailing_percent_on_long
                 and price < short_ema
             ):
-                if self.state_trailing_stop_loss != StateTrailingStopLoss.decreased:
-                    print(f'trailing_stop_loss_percent знизився на {TRAILING_STOP_LOSS_PERCENT_FOR_NEGATIVE_FILTER}%!')
-                    self.state_trailing_stop_loss = StateTrailingStopLoss.decreased
+                self._set_state_trailing_stop_loss(StateTrailingStopLoss.decreased, price, index)
             elif (
-                RSI_FOR_DECREASE_TRAILING_PERCENT_ON_LONG > rsi > RSI_FOR_INCREASE_TRAILING_PERCENT_ON_LONG
+                params.rsi_for_decrease_trailing_percent_on_long > rsi
+                > params.rsi_for_increase_trailing_percent_on_long
                 and price > short_ema
                 and price > long_ema
             ):
-                if self.state_trailing_stop_loss != StateTrailingStopLoss.increased:
-                    print(
-                        f'trailing_stop_loss_percent збільшився на {TRAILING_STOP_LOSS_PERCENT_FOR_POSITIVE_FILTER}%!')
-                    self.state_trailing_stop_loss = StateTrailingStopLoss.increased
-            elif self.state_trailing_stop_loss != StateTrailingStopLoss.normal:
-                print(f'trailing_stop_loss_percent звичайний!')
-                self.state_trailing_stop_loss = StateTrailingStopLoss.normal
+                self._set_state_trailing_stop_loss(StateTrailingStopLoss.increased, price, index)
+            else:
+                self._set_state_trailing_stop_loss(StateTrailingStopLoss.normal, price, index)
         if self.direction == 'short':
             if (
-                rsi < RSI_FOR_DECREASE_TRAILING_PERCENT_ON_SHORT
+                rsi < params.rsi_for_decrease_trailing_percent_on_short
                 and price > short_ema
             ):
-                if self.state_trailing_stop_loss != StateTrailingStopLoss.decreased:
-                    print(f'trailing_stop_loss_percent знизився на {TRAILING_STOP_LOSS_PERCENT_FOR_NEGATIVE_FILTER}%!')
-                    self.state_trailing_stop_loss = StateTrailingStopLoss.decreased
+                self._set_state_trailing_stop_loss(StateTrailingStopLoss.decreased, price, index)
             elif (
-                RSI_FOR_DECREASE_TRAILING_PERCENT_ON_SHORT < rsi < RSI_FOR_INCREASE_TRAILING_PERCENT_ON_SHORT
+                params.rsi_for_decrease_trailing_percent_on_short < rsi
+                < params.rsi_for_increase_trailing_percent_on_short
                 and price < short_ema
                 and price < long_ema
             ):
-                if self.state_trailing_stop_loss != StateTrailingStopLoss.increased:
-                    print(
-                        f'trailing_stop_loss_percent збільшився на {TRAILING_STOP_LOSS_PERCENT_FOR_POSITIVE_FILTER}%!')
-                    self.state_trailing_stop_loss = StateTrailingStopLoss.increased
-            elif self.state_trailing_stop_loss != StateTrailingStopLoss.normal:
-                print(f'trailing_stop_loss_percent звичайний!')
-                self.state_trailing_stop_loss = StateTrailingStopLoss.normal
+                self._set_state_trailing_stop_loss(StateTrailingStopLoss.increased, price, index)
+            else:
+                self._set_state_trailing_stop_loss(StateTrailingStopLoss.normal, price, index)
+
+    def _set_state_trailing_stop_loss(self, state: StateTrailingStopLoss, price, index: int):
+        if self.state_trailing_stop_loss == state:
+            return
+        self.state_trailing_stop_loss = state
+        if self.journal.enabled:
+            self.journal.record(
+                EventKind.trailing_state, EventLevel.info, index, self.entry_index, self.direction,
+                price=price, state=STATE_CODES[state]
+            )
 
     def is_stop_loss_hit(self, current_price):
         """Перевірка, чи досягнуто стоп-лос."""
@@ -137,9 +192,150 @@ class TradeExecutor:
 
     def is_close_position(self, rsi):
         if self.direction == 'short':
-            return rsi > RSI_FOR_CLOSING_LONG
+            return rsi > self.params.rsi_for_closing_long
         if self.direction == 'long':
-            return rsi < RSI_FOR_CLOSING_SHORT
+            return rsi < self.params.rsi_for_closing_short
+
+
+def find_first_crossing(
+    close: np.ndarray,
+    start: int,
+    direction: str,
+    stop_loss: float,
+    take_profit: float,
+    chunk_size: int = 256
+) -> Tuple[Optional[int], bool]:
+    """
+    Шукає перший індекс >= start, де ціна перетнула стоп-лос або тейк-профіт.
+
+    Пошук векторний, блоками зростаючого розміру, щоб не сканувати весь хвіст масиву
+    для угод, які закриваються швидко. Повертає (індекс, чи це стоп-лос) або (None, False).
+    """
+    begin = start
+    while begin < len(close):
+        end = min(begin + chunk_size, len(close))
+        prices = close[begin:end]
+        if direction == 'long':
+            stop_loss_hits = prices <= stop_loss
+            take_profit_hits = prices >= take_profit
+        else:
+            stop_loss_hits = prices >= stop_loss
+            take_profit_hits = prices <= take_profit
+        hits = np.flatnonzero(stop_loss_hits | take_profit_hits)
+        if hits.size:
+            offset = hits[0]
+            return begin + int(offset), bool(stop_loss_hits[offset])
+        begin = end
+        chunk_size *= 2
+    return None, False
+
+
+def simulate_trade(
+    executor: 'TradeExecutor',
+    close: np.ndarray,
+    rsi: np.ndarray,
+    long_ema: np.ndarray,
+    short_ema: np.ndarray,
+    end_level_index: int,
+    stop_loss: float,
+    take_profit: float,
+    start: Optional[int] = None
+) -> Tuple[int, ExitReason]:
+    """
+    Симулює угоду від end_level_index на суцільних масивах.
+
+    До тейк-профіту шукається лише перший перетин рівнів, покроково обробляється
+    тільки фаза трейлінг стоп-лосса. start - перша свічка для обробки, якщо угоду продовжують
+    зі збереженого стану executor. Повертає індекс закриття та його причину.
+    """
+    start = end_level_index + 1 if start is None else start
+    if executor.trailing_stop_loss is None:
+        take_profit_index, is_stop_loss = find_first_crossing(
+            close, start, executor.direction, stop_loss, take_profit
+        )
+        if take_profit_index is None:
+            return len(close) - 1, ExitReason.end_of_data
+        if is_stop_loss:
+            return take_profit_index, ExitReason.stop_loss
+
+        price = close[take_profit_index]
+        roi = executor.calculate_roi(price)
+        if executor.journal.enabled:
+            executor.journal.record(
+                EventKind.take_profit, EventLevel.info, take_profit_index, executor.entry_index, executor.direction,
+                price=price, roi=roi
+            )
+        executor.update_trailing_stop_loss(
+            roi, price, rsi[take_profit_index], long_ema[take_profit_index], short_ema[take_profit_index],
+            take_profit_index
+        )
+        start = take_profit_index + 1
+
+    # Фаза трейлінг стоп-лосса: стан залежить від попередніх свічок, тому йдемо покроково
+    tail = slice(start, len(close))
+    for future_index, price, rsi_value, long_ema_value, short_ema_value in zip(
+        range(tail.start, tail.stop),
+        close[tail].tolist(), rsi[tail].tolist(), long_ema[tail].tolist(), short_ema[tail].tolist()
+    ):
+        exit_reason = step_trade(
+            executor, price, rsi_value, long_ema_value, short_ema_value, stop_loss, take_profit, future_index
+        )
+        if exit_reason is not None:
+            return future_index, exit_reason
+    return len(close) - 1, ExitReason.end_of_data
+
+
+def step_trade(
+    executor: 'TradeExecutor',
+    price: float,
+    rsi: float,
+    long_ema: float,
+    short_ema: float,
+    stop_loss: float,
+    take_profit: float,
+    index: int = -1
+) -> Optional[ExitReason]:
+    """Обробляє одну нову свічку відкритої угоди. Повертає причину закриття або None."""
+    roi = executor.calculate_roi(price)
+    if executor.trailing_stop_loss is None:
+        if price <= stop_loss if executor.direction == 'long' else price >= stop_loss:
+            return ExitReason.stop_loss
+        if not executor.is_take_profit_hit(price, take_profit):
+            return None
+        if executor.journal.enabled:
+            executor.journal.record(
+                EventKind.take_profit, EventLevel.info, index, executor.entry_index, executor.direction,
+                price=price, roi=roi
+            )
+    elif executor.is_stop_loss_hit(price):
+        return ExitReason.trailing_stop_loss
+    executor.update_trailing_stop_loss(roi, price, rsi, long_ema, short_ema, index)
+    return None
+
+
+def trade_bounds(cost: float, direction: str, params: StrategyParams = DEFAULT_PARAMS) -> Tuple[float, float]:
+    """Стоп-лос і тейк-профіт для угоди, відкритої за ціною cost."""
+    if direction == 'long':
+        return cost * (1 - params.percent_stop_loss / 100), cost * (1 + params.percent_take_profit / 100)
+    return cost * (1 + params.percent_stop_loss / 100), cost * (1 - params.percent_take_profit / 100)
+
+
+def calculate_profit_or_loss(executor: 'TradeExecutor', exit_reason: ExitReason, exit_price: float) -> float:
+    """Прибуток або збиток закритої угоди з урахуванням комісії."""
+    stake_amount = executor.stake_amount
+    cost = executor.entry_price
+    if exit_reason == ExitReason.stop_loss:
+        profit_or_loss = -stake_amount * executor.params.percent_stop_loss / 100
+    elif exit_reason == ExitReason.trailing_stop_loss:
+        profit_or_loss = stake_amount * executor.calculate_roi(exit_price) / 100
+    else:
+        profit_or_loss = stake_amount * (
+            exit_price - cost) / cost if executor.direction == 'long' else stake_amount * (
+            cost - exit_price) / cost
+
+    transaction_fee = stake_amount / 100
+    # transaction_fee = 0
+    return profit_or_loss - transaction_fee
 
 
 class MarketAnalyzer:
@@ -151,110 +347,228 @@ class MarketAnalyzer:
         inverted_patterns: List[Pattern],
         window_extremum: int,
         step_for_head_and_shoulders: int,
-        data: pd.DataFrame
+        data: pd.DataFrame,
+        params: StrategyParams = DEFAULT_PARAMS,
+        journal: Optional[TradeJournal] = None
     ):
-        self.balance = INITIAL_BALANCE
+        self.params = params
+        # Журнал вмикають явно (TradeJournal): кільцевий буфер займає пам'ять і на довгій історії
+        # перезаписує найстаріші події
+        self.journal = journal if journal is not None else NULL_JOURNAL
+        self.balance = params.initial_balance
         self.last_cost = 0.0
         self.last_level = None
-        self.stake_multiplier = STAKE_MULTIPLIER_START
-        self.percent_of_balance_for_bet = PERCENT_OF_BALANCE_FOR_BET
+        self.stake_multiplier = params.stake_multiplier_start
+        self.percent_of_balance_for_bet = params.percent_of_balance_for_bet
         self.data = data
+        # Колонки беремо один раз як суцільні масиви, щоб не звертатися до .iloc у циклах
+        self.close = self._column('Close')
+        self.rsi = self._column('RSI')
+        self.long_ema = self._column('LONG_EMA')
+        self.short_ema = self._column('SHORT_EMA')
+        self.timestamps = self._column('timestamp') if 'timestamp' in data else None
 
         self.patterns = patterns
         self.inverted_patterns = inverted_patterns
         self.pattern_checker = PatternChecker(window_extremum, step_for_head_and_shoulders)
+        self.pattern_index = self.pattern_checker.build_index(patterns)
+        self.inverted_pattern_index = self.pattern_checker.build_index(inverted_patterns)
 
         self.levels: List[Level] = sorted(
             [(*s, 'sup') for s in support_levels] + [(*r, 'res') for r in resistance_levels]
         )
-        self.transactions = []
-
-    def analyze(self):
-        for level in self.levels:
+        self.transactions = TradeRecords()
+        self._reset_checkpoint()
+
+    def _column(self, name: str) -> np.ndarray:
+        return np.ascontiguousarray(self.data[name], dtype=float)
+
+    def analyze(self, snapshot: Optional[AnalyzerSnapshot] = None):
+        """
+        Обробляє всі рівні. Зі snapshot (знімок analyze() на початку цієї ж історії) стан відновлюється,
+        і обробляються лише рівні з snapshot.cursor: угоди з pending продовжуються з нових свічок,
+        а решта рівнів симулюється від входу. Сигнали для цього потрібні лише з snapshot.signal_start
+        (див. backtest_utils.resume_signals).
+        """
+        self._reset_checkpoint()
+        start = self._restore(snapshot) if snapshot is not None else 0
+        for level in self.levels[start:]:
             if level[2] == 'sup':
-                self._process_level(level, self.inverted_patterns)
+                self._process_level(level, self.inverted_pattern_index)
             elif level[2] == 'res':
-                self._process_level(level, self.patterns)
-        print(f'Баланс = {self.balance:.2f}')
+                self._process_level(level, self.pattern_index)
         return self.transactions
 
-    def _process_level(self, level: Level, pattern_list: List[Pattern]):
-        index, _, level_type = level
+    def _reset_checkpoint(self):
+        # Стан на першому рівні, результат якого ще може змінитися з новими свічками
+        self._cursor: Optional[Tuple] = None
+        self._pending: List[Tuple] = []
+        self._resumed = {}
+        self._resumed_from = 0
+        self._restored: Optional[AnalyzerSnapshot] = None
+
+    def _mark_unsettled(self, level: Level):
+        if self._cursor is None:
+            self._cursor = (level[0], self.balance, self.stake_multiplier, self.last_cost, self.last_level,
+                            len(self.transactions))
+
+    def _is_pattern_final(self, index: int) -> bool:
+        """Чи можуть нові свічки додати патерн у вікно рівня (праве плече голови має бути в даних)."""
+        horizon = max(self.pattern_checker.step_for_head_and_shoulders, 5)
+        return index + self.pattern_checker.window_extremum + horizon < len(self.close)
+
+    def snapshot(self) -> AnalyzerSnapshot:
+        """
+        Компактний знімок стану після analyze() для продовження на довшій історії.
+
+        Стан індикаторів на останній свічці береться зі знімка, з якого продовжено analyze(),
+        і оновлюється лише новими свічками; без нього IndicatorSet проходить усю історію.
+        """
+        restored = self._restored
+        if self._cursor is None:
+            # Усі рівні остаточні, а нові можуть з'явитися лише правіше за останній
+            cursor = self.levels[-1][0] + 1 if self.levels else 0
+            if restored is not None:
+                cursor = max(cursor, restored.cursor)
+            settled = (cursor, self.balance, self.stake_multiplier, self.last_cost, self.last_level,
+                       len(self.transactions))
+        else:
+            settled = self._cursor
+        cursor, balance, stake_multiplier, last_cost, last_level, trades = settled
+        start = signal_start(
+            int(cursor), self.pattern_checker.window_extremum, self.pattern_checker.step_for_head_and_shoulders
+        )
+        if restored is None:
+            indicators = IndicatorSet.from_params(self.params)
+            indicators.update_batch(self.close)
+        else:
+            indicators = IndicatorSet.from_state(restored.indicator_state)
+            indicators.update_batch(self.close[restored.candles:])
+        return AnalyzerSnapshot(
+            candles=len(self.close),
+            first_timestamp=float(self.timestamps[0]) if self.timestamps is not None and len(self.close) else np.nan,
+            signal_start=start,
+            close_fingerprint=fingerprint(self.close[start:]),
+            params=self.params,
+            cursor=int(cursor),
+            balance=float(balance),
+            stake_multiplier=float(stake_multiplier),
+            last_cost=float(last_cost),
+            last_level=last_level,
+            transactions=self.transactions.records[:trades].copy(),
+            pending=np.array(self._pending, dtype=PENDING_TRADE_DTYPE),
+            indicators=np.column_stack((self.rsi[start:], self.short_ema[start:], self.long_ema[start:])),
+            indicator_state=indicators.get_state(),
+        )
 
-        print(f"\nОбробка рівня: Індекс = {index}, Тип = {level_type}")
+    def _restore(self, snapshot: AnalyzerSnapshot) -> int:
+        """Відновлює стан зі знімка і повертає позицію першого рівня, який треба обробити."""
+        if not snapshot.matches(self.close, self.params):
+            raise ValueError('Знімок зроблено на інших даних або з іншими параметрами')
+        self.balance = snapshot.balance
+        self.stake_multiplier = snapshot.stake_multiplier
+        self.last_cost = snapshot.last_cost
+        self.last_level = snapshot.last_level
+        self.transactions = TradeRecords.from_records(snapshot.transactions)
+        states = list(StateTrailingStopLoss)
+        reasons = list(ExitReason)
+        for record in snapshot.pending:
+            direction = 'long' if record['direction'] > 0 else 'short'
+            executor = TradeExecutor(0.0, float(record['entry_price']), direction, self.params, self.journal,
+                                     int(record['entry_index']))
+            if not np.isnan(record['trailing_stop_loss']):
+                executor.trailing_stop_loss = float(record['trailing_stop_loss'])
+            executor.max_roi = float(record['max_roi'])
+            executor.state_trailing_stop_loss = states[record['state']]
+            exit_ = None if record['exit_index'] < 0 else (int(record['exit_index']), reasons[record['exit_reason']])
+            self._resumed[int(record['level_index'])] = (executor, exit_)
+        self._resumed_from = snapshot.candles
+        self._restored = snapshot
+        return bisect.bisect_left(self.levels, (snapshot.cursor,))
+
+    def _process_level(self, level: Level, pattern_index: PatternIndex):
+        index, level_price, level_type = level
+        pattern_found = self.pattern_checker.is_pattern_found(index, pattern_index)
+        if self.journal.enabled:
+            self.journal.record(
+                EventKind.level, EventLevel.debug, index, direction='long' if level_type == 'sup' else 'short',
+                price=level_price, state=int(pattern_found)
+            )
 
-        if self.pattern_checker.is_pattern_found(index, pattern_list):
+        if pattern_found:
             end_level_index = index + self.pattern_checker.window_extremum
             self._execute_trade(level, end_level_index)
+        elif not self._is_pattern_final(index):
+            self._mark_unsettled(level)
 
     def _execute_trade(self, level: Level, end_level_index: int):
-        if not (0 <= end_level_index < len(self.data)):
-            print(f"Некоректний індекс екстремуму: {end_level_index}, пропускаємо.")
+        if not (0 <= end_level_index < len(self.close)):
+            if self.journal.enabled:
+                self.journal.record(EventKind.skipped, EventLevel.warning, end_level_index, price=level[1])
+            self._mark_unsettled(level)
             return
 
-        cost = self.data['Close'].iloc[end_level_index]
-        future_price = self.data['Close'].iloc[end_level_index]
-        print(f"Ціна на кінці рівня (індекс {end_level_index}): {cost:.2f}")
+        cost = self.close[end_level_index]
 
         stake_amount = self.balance * self.percent_of_balance_for_bet / 100 * self.stake_multiplier
         direction = 'long' if level[2] == 'sup' else 'short'
 
-        stop_loss = cost * (1 - PERCENT_STOP_LOSS / 100) if direction == 'long' else cost * (
-            1 + PERCENT_STOP_LOSS / 100)
-        take_profit = cost * (1 + PERCENT_TAKE_PROFIT / 100) if direction == 'long' else cost * (
-            1 - PERCENT_TAKE_PROFIT / 100)
-
-        print(f"Стоп-лос: {stop_loss:.2f}, Тейк-профіт: {take_profit:.2f}")
-
-        executor = TradeExecutor(stake_amount, cost, direction)
-
-        for future_index in range(end_level_index + 1, len(self.data)):
-            future_price = self.data['Close'].iloc[future_index]
-            roi = executor.calculate_roi(future_price)
-            rsi = self.data['RSI'].iloc[future_index]
-            long_ema = self.data['LONG_EMA'].iloc[future_index]
-            short_ema = self.data['SHORT_EMA'].iloc[future_index]
-
-            if executor.trailing_stop_loss is not None:
-                # if executor.is_close_position(rsi):
-                #     profit_or_loss = stake_amount * roi / 100
-                #     print(
-                #         f"Закриваємо через {rsi=} на індексі {future_index}. Ціна: {future_price:.2f}, ROI: {roi:.2f}%")
-                #     break
-
-                if executor.is_stop_loss_hit(future_price):
-                    profit_or_loss = stake_amount * roi / 100
-                    print(
-                        f"Трейлінг стоп-лос досягнуто на індексі {future_index}. Ціна: {future_price:.2f}, ROI: {roi:.2f}%")
-                    break
-            else:
-                if future_price <= stop_loss if direction == 'long' else future_price >= stop_loss:
-                    profit_or_loss = -stake_amount * PERCENT_STOP_LOSS / 100
-                    print(f"Стоп-лос досягнуто на індексі {future_index}. Ціна: {future_price:.2f}. ROI: {roi:.2f}%")
-                    break
-                elif executor.is_take_profit_hit(future_price, take_profit):
-                    print(
-                        f"Тейк-профіт досягнуто на індексі {future_index}. Ціна: {future_price:.2f}, ROI: {roi:.2f}%")
-                    executor.update_trailing_stop_loss(roi, future_price, rsi, long_ema, short_ema)
-
-            if executor.trailing_stop_loss is not None:
-                executor.update_trailing_stop_loss(roi, future_price, rsi, long_ema, short_ema)
-
+        stop_loss, take_profit = trade_bounds(cost, direction, self.params)
+
+        resumed = self._resumed.pop(level[0], None)
+        if resumed is None:
+            if self.journal.enabled:
+                self.journal.record(
+                    EventKind.entry, EventLevel.info, end_level_index, end_level_index, direction,
+                    price=cost, amount=stake_amount, stop=stop_loss, aux=take_profit
+                )
+            executor = TradeExecutor(stake_amount, cost, direction, self.params, self.journal, end_level_index)
+            exit_ = None
+        else:
+            # Угода зі знімка: шлях продовжується з першої нової свічки, ставка - з поточного балансу
+            executor, exit_ = resumed
+            executor.stake_amount = stake_amount
+        if exit_ is None:
+            future_index, exit_reason = simulate_trade(
+                executor, self.close, self.rsi, self.long_ema, self.short_ema, end_level_index, stop_loss,
+                take_profit, None if resumed is None else self._resumed_from
+            )
         else:
-            roi = executor.calculate_roi(future_price)
-            print(f"Стоп-лос і тейк-профіт не досягнуті. Трейд закрито за останньою ціною. ROI: {roi:.2f}%")
-            profit_or_loss = stake_amount * (
-                future_price - cost) / cost if direction == 'long' else stake_amount * (
-                cost - future_price) / cost
-
-        transaction_fee = stake_amount / 100
-        # transaction_fee = 0
-        profit_or_loss -= transaction_fee
+            future_index, exit_reason = exit_
+        # Якщо після рівня немає жодної свічки, угода закривається за ціною входу
+        future_index = max(future_index, end_level_index)
+        if exit_reason == ExitReason.end_of_data:
+            self._mark_unsettled(level)
+        if self._cursor is not None:
+            is_open = exit_reason == ExitReason.end_of_data
+            self._pending.append((
+                level[0], end_level_index, DIRECTIONS[direction], cost,
+                np.nan if executor.trailing_stop_loss is None else executor.trailing_stop_loss, executor.max_roi,
+                STATE_CODES[executor.state_trailing_stop_loss], -1 if is_open else future_index,
+                EXIT_REASON_CODES[exit_reason]
+            ))
+        profiler = get_profiler()
+        if profiler.enabled:
+            profiler.count('trades')
+            profiler.count('candles_in_trades', future_index - end_level_index)
+        future_price = self.close[future_index]
+        roi = executor.calculate_roi(future_price)
+
+        profit_or_loss = calculate_profit_or_loss(executor, exit_reason, future_price)
         self.balance += profit_or_loss
-        print(f"Результат трейду: {'Прибуток' if profit_or_loss > 0 else 'Збиток'} {profit_or_loss:.2f}")
-        print(f"Оновлений баланс: {self.balance:.2f}")
+        if self.journal.enabled:
+            self.journal.record(
+                EventKind.exit, EventLevel.info, future_index, end_level_index, direction,
+                price=future_price, roi=roi, amount=profit_or_loss, aux=self.balance,
+                state=EXIT_REASON_CODES[exit_reason]
+            )
 
         self.last_cost = cost
         self.last_level = level[2]
         self.stake_multiplier = 1.0
-        self.transactions.append([(end_level_index, cost), (future_index, future_price, profit_or_loss, roi)])
+        entry_time, exit_time = (np.nan, np.nan) if self.timestamps is None else (
+            self.timestamps[end_level_index], self.timestamps[future_index])
+        self.transactions.append(
+            end_level_index, future_index, cost, future_price, direction, stake_amount, profit_or_loss, roi,
+            EXIT_REASON_CODES[exit_reason], entry_time, exit_time
+        )